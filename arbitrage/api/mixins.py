@@ -2,10 +2,14 @@ import logging
 import os
 import psutil
 import sys
+import time
 
 from crypto_bot.management.commands.feed_exchange_history import Command
 
 from django.conf import settings
+from rest_framework.response import Response
+
+from arbitrage.jobs import JobClient, JobServiceUnavailableError
 
 
 logger = logging.getLogger(__name__)
@@ -112,24 +116,105 @@ class BackTestingMixin(object):
 
     command_obj = Command()
 
-    def load_data(self, option, **params):
+    def load_data(self, option, progress=None, **params):
         """
         loads the data by default to the database and returns the
         values provided
         :param option: string, basically the supported options
+        :param progress: function(done, total) told about the pages of
+        candles fetched by list_exchange_trade_pair_ohlcv
         :param params: the params required for the command to provide the data
         :return: list
         """
-        list_exchanges = self.command_obj.list_exchanges
+        if option == "list_exchange_trade_pair_ohlcv":
+            params["progress"] = progress
+        if option == "list_exchanges":
+            return self.command_obj.list_exchanges()
+
         ltpbe = self.command_obj.list_trade_pairs_by_exchange
         lgtpo = self.command_obj.list_general_trade_pair_ohlcv
         letpo = self.command_obj.list_exchange_trade_pair_ohlcv
 
         available_options = {
-            "list_exchanges": list_exchanges,
             "list_trade_pair_by_exchange": ltpbe,
             "list_general_trade_pair_ohlcv": lgtpo,
             "list_exchange_trade_pair_ohlcv": letpo,
         }
 
         return available_options[option](params)
+
+
+class JobMixin(object):
+    """
+    runs the work of the view in the worker pool of manage.py startjobs
+    instead of spawning a process per request.
+    """
+
+    job_client = JobClient()
+    job_statuses = {
+        "done": 200,
+        "pending": 202,
+        "error": 400,
+        "unknown": 404,
+        "unavailable": 503,
+    }
+
+    def run_job(self, name, *args):
+        """
+        :param name: str: a job of arbitrage.jobs.JOBS
+        :param args: str: arguments of the job
+        :return: dict: the job, pending if it took over JOBS_WAIT_TIMEOUT
+        """
+        return self.run_jobs([(name, *args)])[0]
+
+    def run_jobs(self, jobs):
+        """
+        runs the jobs at the same time and waits for all of them at most
+        JOBS_WAIT_TIMEOUT seconds
+        :param jobs: list of tuples (name, *args)
+        :return: list of dict
+        """
+        try:
+            submitted = [self.submit_job(job) for job in jobs]
+            deadline = time.monotonic() + settings.JOBS_WAIT_TIMEOUT
+            return [
+                self.job_client.result(
+                    job, max(deadline - time.monotonic(), 0)
+                )
+                if isinstance(job, str)
+                else job
+                for job in submitted
+            ]
+        except JobServiceUnavailableError as error:
+            logger.error(str(error))
+            return [{"status": "unavailable", "error": str(error)}] * len(jobs)
+
+    def submit_job(self, job):
+        """
+        :param job: tuple (name, *args)
+        :return: str: the job id, or dict: the error job when the job
+        server refused it
+        """
+        try:
+            return self.job_client.submit(*job)
+        except ValueError as error:
+            logger.error(str(error))
+            return {"status": "error", "error": str(error)}
+
+    def job_response(self, job, transform=None):
+        """
+        :param job: dict
+        :param transform: function applied to the result of a done job
+        :return: Response
+        """
+        status = self.job_statuses[job["status"]]
+        if job["status"] == "done":
+            result = job["result"]
+            return Response(
+                {"data": transform(result) if transform else result},
+                status=status,
+            )
+        return Response(
+            {key: value for key, value in job.items() if key != "result"},
+            status=status,
+        )
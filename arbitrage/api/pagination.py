@@ -0,0 +1,77 @@
+import base64
+import datetime
+import json
+
+from django.db.models import Q
+
+
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(recorded_date: datetime.datetime, pk: int) -> str:
+    """
+    opaque cursor pointing after the row with this date and pk
+    :param recorded_date: datetime
+    :param pk: int
+    :return: str
+    """
+    raw = json.dumps([recorded_date.isoformat(), pk])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """
+    :param cursor: str: made by encode_cursor
+    :return: tuple of datetime, int
+    """
+    try:
+        recorded_date, pk = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.datetime.fromisoformat(recorded_date), int(pk)
+    except (ValueError, TypeError) as error:
+        raise InvalidCursorError(f"Invalid cursor {cursor}") from error
+
+
+def keyset_page(
+    queryset,
+    limit: int,
+    cursor: str = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    field: str = "recorded_date",
+):
+    """
+    newest first page of the rows of a values() queryset.
+
+    instead of an offset the cursor keeps the (date, pk) of the last row
+    sent and the next page starts right after it, so every page is a
+    range read of the (-date, -pk) index no matter how deep it is, and
+    rows inserted meanwhile don't shift the pages.
+    :param queryset: values() queryset including field and id
+    :param limit: int: rows per page
+    :param cursor: str: the next cursor of the previous page
+    :param since: datetime: rows recorded from it on
+    :param until: datetime: rows recorded before it
+    :param field: str: the date field the rows are sorted by
+    :return: tuple of list of dict, next cursor or None on the last page
+    """
+    if since is not None:
+        queryset = queryset.filter(**{f"{field}__gte": since})
+    if until is not None:
+        queryset = queryset.filter(**{f"{field}__lt": until})
+    if cursor:
+        recorded_date, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f"{field}__lt": recorded_date})
+            | Q(**{field: recorded_date, "id__lt": pk})
+        )
+
+    # one extra row tells if there is a next page
+    rows = list(queryset.order_by(f"-{field}", "-id")[: limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1][field], rows[-1]["id"])
@@ -1,6 +1,7 @@
 import datetime
 
 from rest_framework import serializers
+from arbitrage.api.pagination import MAX_PAGE_SIZE
 from arbitrage.models import Exchange
 
 
@@ -18,6 +19,9 @@ class HistoricalDataSerializer(serializers.Serializer):
     start_date = serializers.DateField(required=True)
     end_date = serializers.DateField(required=True)
     option = serializers.CharField(required=True)
+    exchange = serializers.CharField(required=False)
+    granularity = serializers.CharField(required=False, default="1d")
+    currency = serializers.CharField(required=False, default="usd")
 
     def clean_option(self, value):
         available_options = {
@@ -48,6 +52,41 @@ class HistoricalDataSerializer(serializers.Serializer):
         return data
 
 
+class SpreadPageSerializer(serializers.Serializer):
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(required=False)
+    limit = serializers.IntegerField(
+        required=False, min_value=1, max_value=MAX_PAGE_SIZE
+    )
+
+
+EXCHANGE_VALUES = ["name", "currency_pair", "last_ask_price", "last_bid_price"]
+
+
+def exchange_values(*relations):
+    """
+    the values() lookups of the serialize_change fields of each relation
+    :param relations: str: e.g. xchange_buy
+    :return: list of str
+    """
+    return [
+        f"{relation}__{field}"
+        for relation in relations
+        for field in EXCHANGE_VALUES
+    ]
+
+
+def serialize_change_values(row, relation):
+    """
+    serialize_change of a row read with exchange_values
+    :param row: dict
+    :param relation: str
+    :return: dict
+    """
+    return {field: row[f"{relation}__{field}"] for field in EXCHANGE_VALUES}
+
+
 def serialize_change(exchange):
     return {
         "name": exchange.name,
@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+from typing import Optional, Set, Union
+from urllib.parse import parse_qs
+
+from arbitrage.bus import LocalBus, UnixBus, get_bus
+
+
+logger = logging.getLogger(__name__)
+
+
+SPREAD_STREAM_PATH = "/api/v1/arbitrage/spreads/stream"
+KEEPALIVE_INTERVAL = 15  # seconds
+SUBSCRIPTION_QUEUE_SIZE = 100
+SPREAD_TOPICS = {"inter", "tri"}
+
+
+class Subscription:
+    """
+    spreads a client of the stream wants: the message types, the
+    currency pairs (inter spreads by pair, tri spreads by any of their
+    symbols) and the minimum spread, None means any.
+    """
+
+    def __init__(
+        self,
+        types: Optional[Set[str]] = None,
+        currency_pairs: Optional[Set[str]] = None,
+        threshold: Optional[float] = None,
+        queue_size: int = SUBSCRIPTION_QUEUE_SIZE,
+    ):
+        self.types = types
+        self.currency_pairs = currency_pairs
+        self.threshold = threshold
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, message_type: str, spread: dict) -> bool:
+        if self.threshold is not None and spread["spread"] < self.threshold:
+            return False
+        if self.currency_pairs is None:
+            return True
+        if message_type == "inter":
+            return spread["currency_pair"] in self.currency_pairs
+        return not self.currency_pairs.isdisjoint(spread["symbols"])
+
+    def offer(self, message: dict):
+        """
+        queues the spreads of the message this client wants, when the
+        client doesn't keep up the oldest message is dropped.
+        :param message: dict
+        :return: None
+        """
+        if self.types is not None and message["type"] not in self.types:
+            return
+        spreads = [
+            spread
+            for spread in message["spreads"]
+            if self.matches(message["type"], spread)
+        ]
+        if not spreads:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(dict(message, spreads=spreads))
+
+
+class SpreadHub:
+    """
+    hands the spreads the market data bus receives to the subscriptions
+    of the clients connected to this process. the bus calls back from
+    its own thread, the messages are passed to the event loop.
+
+    given a path (LIVE_SPREADS_DIR) instead of a bus, the hub receives
+    on a unix socket of its own there.
+    """
+
+    def __init__(self, bus: Union[str, LocalBus]):
+        self._owns_bus = not isinstance(bus, LocalBus)
+        if self._owns_bus:
+            bus = UnixBus(bus, name="web")
+        self.bus = bus
+        self.subscriptions: Set[Subscription] = set()
+        self._loop = None
+
+    def start(self):
+        """
+        subscribes to the bus, called from the running event loop
+        :return: None
+        """
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.bus.subscribe(self._receive)
+        if self._owns_bus:
+            self.bus.start()
+
+    def stop(self):
+        self.bus.unsubscribe(self._receive)
+        if self._owns_bus:
+            self.bus.stop()
+        self._loop = None
+
+    def _receive(self, message: dict):
+        if message["topic"] not in SPREAD_TOPICS:
+            return
+        loop = self._loop
+        if loop is not None:
+            loop.call_soon_threadsafe(
+                self.publish, dict(message["data"], type=message["topic"])
+            )
+
+    def publish(self, message: dict):
+        for subscription in list(self.subscriptions):
+            subscription.offer(message)
+
+    def subscribe(self, **filters) -> Subscription:
+        """
+        :param filters: types, currency_pairs, threshold of Subscription
+        :return: Subscription
+        """
+        subscription = Subscription(**filters)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.discard(subscription)
+
+
+_hub = None
+
+
+def get_hub() -> SpreadHub:
+    global _hub
+    if _hub is None:
+        _hub = SpreadHub(get_bus())
+    _hub.start()
+    return _hub
+
+
+def authenticate(token: Optional[str]) -> bool:
+    """
+    EventSource can't send headers, the jwt access token comes in the
+    token query param
+    :param token: str
+    :return: bool
+    """
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    if not token:
+        return False
+    try:
+        AccessToken(token)
+    except TokenError:
+        return False
+    return True
+
+
+def parse_filters(query_string: bytes) -> dict:
+    """
+    ?type=inter&currency_pair=BTC/USD,ETH/USD&threshold=20, the params
+    can be repeated
+    :param query_string: bytes
+    :return: dict: the filters of Subscription
+    :raises ValueError: the threshold isn't a number
+    """
+    query = parse_qs(query_string.decode())
+
+    def values(name):
+        if name not in query:
+            return None
+        return {
+            value
+            for param in query[name]
+            for value in param.split(",")
+            if value
+        }
+
+    threshold = query.get("threshold")
+    return {
+        "types": values("type"),
+        "currency_pairs": values("currency_pair"),
+        "threshold": float(threshold[0]) if threshold else None,
+    }
+
+
+async def _respond(send, status: int, body: dict):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json")],
+        }
+    )
+    await send(
+        {"type": "http.response.body", "body": json.dumps(body).encode()}
+    )
+
+
+async def _wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def spread_stream(scope, receive, send):
+    """
+    ASGI app streaming the spreads of the monitors as server-sent
+    events, one event per batch: "event: inter|tri" with the message of
+    bus message as data, filtered for the client.
+    """
+    query = parse_qs(scope["query_string"].decode())
+    if not authenticate(query.get("token", [None])[0]):
+        await _respond(send, 401, {"status": "unauthorized"})
+        return
+    try:
+        filters = parse_filters(scope["query_string"])
+    except ValueError:
+        await _respond(
+            send, 400, {"status": {"threshold": ["Not a number"]}}
+        )
+        return
+
+    hub = get_hub()
+    subscription = hub.subscribe(**filters)
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            }
+        )
+        while True:
+            received = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                [received, disconnected],
+                timeout=KEEPALIVE_INTERVAL,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if received not in done:
+                received.cancel()
+            if disconnected in done:
+                break
+            if received in done:
+                message = received.result()
+                body = (
+                    f"event: {message['type']}\n"
+                    f"data: {json.dumps(message)}\n\n"
+                )
+            else:
+                # keeps proxies from closing an idle connection
+                body = ": keep-alive\n\n"
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": body.encode(),
+                    "more_body": True,
+                }
+            )
+    finally:
+        hub.unsubscribe(subscription)
+        disconnected.cancel()
@@ -1,19 +1,24 @@
 import pdb
+import datetime
 import logging
 import json
-import subprocess
 import requests
 
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from arbitrage.bus import get_bus
 from arbitrage.models import Spread, Tri_Spread
-from arbitrage.api.mixins import MonitorMixin, BackTestingMixin
+from arbitrage.api.mixins import BackTestingMixin, JobMixin, MonitorMixin
+from arbitrage.jobs import JobServiceUnavailableError
+from arbitrage.api.pagination import InvalidCursorError, keyset_page
 from .serializers import (
     ActionSerialier,
     HistoricalDataSerializer,
-    serialize_change,
+    SpreadPageSerializer,
+    exchange_values,
+    serialize_change_values,
 )
 
 
@@ -25,58 +30,128 @@ logger = logging.getLogger(__name__)
 # ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~
 
 
-class TriSpread(APIView):
-    permission_classes = [IsAuthenticated]
+class SpreadPageMixin(object):
+    """
+    keyset pagination of the spread endpoints, newest first.
 
-    def get(self, request, *args, **kwargs):
+    query params: since and until (datetimes), limit (rows per page) and
+    cursor (the next value of the previous page). the rows are read with
+    values(), joining the exchanges in the same query.
+    """
+
+    page_size = 50
+
+    def get_page(self, request, queryset):
+        serializer = SpreadPageSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({"status": serializer.errors}, status=400)
+        data = serializer.validated_data
         try:
-            tri_spreads = []
-            for spread in Tri_Spread.objects.all().order_by("-recorded_date"):
-                tri_xchange_buy1 = spread.tri_xchange_buy1
-                tri_xchange_buy2 = spread.tri_xchange_buy2
-                tri_xchange_sell = spread.tri_xchange_sell
-                tri_spreads.append(
-                    {
-                        "id": spread.pk,
-                        "tri_exchange_buy1_id": spread.tri_exchange_buy1_id,
-                        "tri_exchange_sell_id": spread.tri_exchange_sell_id,
-                        "tri_exchange_buy2_id": spread.tri_exchange_buy2_id,
-                        "tri_xchange_buy1": serialize_change(tri_xchange_buy1),
-                        "tri_xchange_buy2": serialize_change(tri_xchange_buy2),
-                        "tri_xchange_sell": serialize_change(tri_xchange_sell),
-                        "recorded_date": spread.recorded_date,
-                        "tri_spread": spread.tri_spread,
-                    }
-                )
+            rows, next_cursor = keyset_page(
+                queryset,
+                limit=data.get("limit", self.page_size),
+                cursor=data.get("cursor"),
+                since=data.get("since"),
+                until=data.get("until"),
+            )
+            result = [self.serialize(row) for row in rows]
+        except InvalidCursorError as error:
+            return Response({"status": {"cursor": [str(error)]}}, status=400)
         except Exception as error:
             logger.exception(str(error))
             return Response({"status": "error"}, status=400)
-        return Response({"data": tri_spreads}, status=200)
+        return Response({"data": result, "next": next_cursor}, status=200)
+
+    def serialize(self, row):
+        raise NotImplementedError
 
 
-class InterSpread(APIView):
+class TriSpread(SpreadPageMixin, APIView):
     permission_classes = [IsAuthenticated]
+    page_size = 100
 
     def get(self, request, *args, **kwargs):
-        try:
-            spreads = []
-            for spread in Spread.objects.all().order_by("-recorded_date")[:5]:
-                exchange_buy = spread.xchange_buy
-                exchange_sell = spread.xchange_sell
-                value = {
-                    "id": spread.pk,
-                    "inter_xchange_buy1": serialize_change(exchange_buy),
-                    "inter_xchange_sell": serialize_change(exchange_sell),
-                    "recorded_date": spread.recorded_date.ctime(),
-                    "inter_spread": spread.spread,
-                    "profit": int(spread.spread) > 0,
-                }
-                spreads.append(value)
-        except Exception as error:
-            pdb.set_trace()
-            logger.exception(str(error))
-            return Response({"status": "error"}, status=400)
-        return Response({"data": spreads}, status=200)
+        queryset = Tri_Spread.objects.values(
+            "id",
+            "tri_exchange_buy1_id",
+            "tri_exchange_sell_id",
+            "tri_exchange_buy2_id",
+            "recorded_date",
+            "tri_spread",
+            *exchange_values(
+                "tri_xchange_buy1", "tri_xchange_buy2", "tri_xchange_sell"
+            ),
+        )
+        return self.get_page(request, queryset)
+
+    def serialize(self, row):
+        return {
+            "id": row["id"],
+            "tri_exchange_buy1_id": row["tri_exchange_buy1_id"],
+            "tri_exchange_sell_id": row["tri_exchange_sell_id"],
+            "tri_exchange_buy2_id": row["tri_exchange_buy2_id"],
+            "tri_xchange_buy1": serialize_change_values(
+                row, "tri_xchange_buy1"
+            ),
+            "tri_xchange_buy2": serialize_change_values(
+                row, "tri_xchange_buy2"
+            ),
+            "tri_xchange_sell": serialize_change_values(
+                row, "tri_xchange_sell"
+            ),
+            "recorded_date": row["recorded_date"],
+            "tri_spread": row["tri_spread"],
+        }
+
+
+class InterSpread(SpreadPageMixin, APIView):
+    permission_classes = [IsAuthenticated]
+    # the latest spreads the dashboard shows
+    page_size = 5
+
+    def get(self, request, *args, **kwargs):
+        queryset = Spread.objects.values(
+            "id",
+            "recorded_date",
+            "spread",
+            *exchange_values("xchange_buy", "xchange_sell"),
+        )
+        return self.get_page(request, queryset)
+
+    def serialize(self, row):
+        return {
+            "id": row["id"],
+            "inter_xchange_buy1": serialize_change_values(row, "xchange_buy"),
+            "inter_xchange_sell": serialize_change_values(
+                row, "xchange_sell"
+            ),
+            "recorded_date": row["recorded_date"].ctime(),
+            "inter_spread": row["spread"],
+            "profit": int(row["spread"]) > 0,
+        }
+
+
+class LiveMarketData(APIView):
+    """
+    latest quotes and spreads the monitors published to the market data
+    bus, read from memory without touching the database. a part is None
+    until its monitor publishes once after this process started.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        bus = get_bus()
+        inter, tri = bus.latest("inter"), bus.latest("tri")
+        data = {
+            "inter": inter["data"] if inter else None,
+            "tri": tri["data"] if tri else None,
+            "quotes": {
+                topic[len("quotes."):]: message["data"]
+                for topic, message in bus.snapshot("quotes.").items()
+            },
+        }
+        return Response({"data": data}, status=200)
 
 
 # ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~
@@ -147,93 +222,93 @@ class InterExchangeMonitor(APIView, MonitorMixin):
 # ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~
 
 
-class ExchangeHistoricalDataView(APIView, BackTestingMixin):
+class ExchangeHistoricalDataView(APIView, JobMixin):
+    """
+    loads the data in the worker pool, the request waits for it at most
+    JOBS_WAIT_TIMEOUT and otherwise answers with the job id to poll at
+    jobs/<job_id> for the progress and the result. identical requests
+    share the same job and its result is cached for JOBS_CACHE_TTL.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        resulting_data = {}
         serializer = HistoricalDataSerializer(data=request.data)
-        if serializer.is_valid():
-            option = serializer.data.get("option")
+        if not serializer.is_valid():
+            return Response({"error": serializer.errors}, status=400)
+
+        option = serializer.data.get("option")
+        start_date = serializer.validated_data["start_date"]
+        end_date = serializer.validated_data["end_date"]
+        trade_pair = serializer.data.get("trade_pair")
+        # the params each option of feed_exchange_history takes
+        params = {}
+        if option == "list_trade_pair_by_exchange":
+            params = dict(exchange=serializer.data.get("exchange"))
+        elif option == "list_general_trade_pair_ohlcv":
             params = dict(
-                start_date=serializer.data.get("start_date"),
-                end_date=serializer.data.get("end_date"),
-                trade_pair=serializer.data.get("trade_pair"),
-                option=serializer.data.get("option"),
+                coin_id=trade_pair,
+                currency=serializer.data.get("currency"),
+                since=datetime.datetime.combine(
+                    start_date, datetime.time()
+                ).timestamp(),
+                limit=datetime.datetime.combine(
+                    end_date, datetime.time()
+                ).timestamp(),
                 commit=True,
+                cache=False,
+            )
+        elif option == "list_exchange_trade_pair_ohlcv":
+            params = dict(
+                # as the command line: BTC/USDT -> ["BTC", "USDT"]
+                trade_pair=trade_pair.split("/")[0:2],
+                exchange=serializer.data.get("exchange"),
+                granularity=serializer.data.get("granularity"),
+                time_frame=f"{start_date:%d%m%Y}/{end_date:%d%m%Y}",
+                commit=True,
+                cache=False,
             )
-            if option == "list_general_trade_pair_ohlcv":
-                params["coin_id"] = params["trade_pair"]
 
-            result, resulting_data = self.load_data(option=option, **params)
-            if result:
-                return Response(data={"data": resulting_data}, status=200)
-        return Response({"error": resulting_data}, status=400)
+        return self.job_response(
+            self.run_job("historical_data", option, params)
+        )
 
 
-class FeedExchangeListExchanges(APIView, BackTestingMixin):
+class FeedExchangeListExchanges(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        with subprocess.Popen(
-            [
-                'python3',
-                'manage.py',
-                'feed_exchange_history',
-                '--list_exchanges',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8').split("\n")
-
-        return Response(
-            data={
-                "data": t2
-            },
-            status=200
+        return self.job_response(
+            self.run_job("feed_exchange_history", "--list_exchanges"),
+            lambda output: output.split("\n"),
         )
 
 
-class FeedExchangeListTradePairs(APIView, BackTestingMixin):
+class FeedExchangeListTradePairs(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        res = []
-        with subprocess.Popen(
+        job = self.run_job("feed_exchange_history", "--list_exchanges")
+        if job["status"] != "done":
+            return self.job_response(job)
+
+        # one job per exchange, run at the same time
+        jobs = self.run_jobs(
             [
-                'python3',
-                'manage.py',
-                'feed_exchange_history',
-                '--list_exchanges',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8')
-            t20 = json.loads(t2)
-
-        for t3 in t20:
-            with subprocess.Popen(
-                [
-                    'python3',
-                    'manage.py',
-                    'feed_exchange_history',
-                    '--list_trade_pairs',
-                    '--exchange',
-                    t3,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            ) as p:
-                t1 = p.communicate()
-                t2 = t1[0].decode('utf-8')
-                res.append(
-                    json.loads(t2)
+                (
+                    "feed_exchange_history",
+                    "--list_trade_pairs",
+                    "--exchange",
+                    exchange,
                 )
+                for exchange in json.loads(job["result"])
+            ]
+        )
+        for job in jobs:
+            if job["status"] != "done":
+                return self.job_response(job)
 
+        res = [json.loads(job["result"]) for job in jobs]
         return Response(
             data={
                 "data": json.dumps(res, indent=4)
@@ -242,105 +317,78 @@ class FeedExchangeListTradePairs(APIView, BackTestingMixin):
         )
 
 
-class FeedExchangeListGeneralTradePairOHLCV(APIView, BackTestingMixin):
+class FeedExchangeListGeneralTradePairOHLCV(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        with subprocess.Popen(
-            [
-                'python3',
-                'manage.py',
-                'feed_exchange_history',
-                '--list_general_trade_pair_ohlcv',
-                '--currency',
-                'usd',
-                '--coin_id',
-                'ethereum',
-                '--since',
-                '1602219600',
-                '--limit',
-                '1612591200',
-                '--commit',
-                'false',
-                '--cache',
-                'false',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8')
-
-        return Response(
-            data={
-                "data": t2
-            },
-            status=200
+        return self.job_response(
+            self.run_job(
+                "feed_exchange_history",
+                "--list_general_trade_pair_ohlcv",
+                "--currency",
+                "usd",
+                "--coin_id",
+                "ethereum",
+                "--since",
+                "1602219600",
+                "--limit",
+                "1612591200",
+                "--commit",
+                "false",
+                "--cache",
+                "false",
+            )
         )
 
 
-class FeedExchangeListExchangeTradePairOHLCV(APIView, BackTestingMixin):
+class FeedExchangeListExchangeTradePairOHLCV(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        t4 = ''
+        job = self.run_job("feed_exchange_history", "--list_exchanges")
+        if job["status"] != "done":
+            return self.job_response(job)
+        exchanges = json.loads(job["result"])
 
-        with subprocess.Popen(
+        trade_pairs = self.run_jobs(
             [
-                'python3',
-                'manage.py',
-                'feed_exchange_history',
-                '--list_exchanges',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8')
-            t20 = json.loads(t2)
-
-        for t3 in t20:
-            with subprocess.Popen(
-                [
-                    'python3',
-                    'manage.py',
-                    'feed_exchange_history',
-                    '--list_trade_pairs',
-                    '--exchange',
-                    t3,
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            ) as p:
-                t1 = p.communicate()
-                t2 = t1[0].decode('utf-8')
-                t5 = json.loads(t2)[0]
-
-            with subprocess.Popen(
-                [
-                    'python3',
-                    'manage.py',
-                    'feed_exchange_history',
-                    '--list_exchange_trade_pair_ohlcv',
-                    '--trade_pair',
-                    t5,
-                    '--exchange',
-                    t3,
-                    '--time_frame',
-                    '01012020/01012021',
-                    '--granularity',
-                    '1d',
-                ],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            ) as p:
-                t1 = p.communicate()
-                t2 = t1[0].decode('utf-8')
-                t4 += t2
+                (
+                    "feed_exchange_history",
+                    "--list_trade_pairs",
+                    "--exchange",
+                    exchange,
+                )
+                for exchange in exchanges
+            ]
+        )
+        for job in trade_pairs:
+            if job["status"] != "done":
+                return self.job_response(job)
+
+        jobs = self.run_jobs(
+            [
+                (
+                    "feed_exchange_history",
+                    "--list_exchange_trade_pair_ohlcv",
+                    "--trade_pair",
+                    json.loads(job["result"])[0],
+                    "--exchange",
+                    exchange,
+                    "--time_frame",
+                    "01012020/01012021",
+                    "--granularity",
+                    "1d",
+                )
+                for exchange, job in zip(exchanges, trade_pairs)
+            ]
+        )
+        for job in jobs:
+            if job["status"] != "done":
+                return self.job_response(job)
 
         return Response(
             data={
-                "data": t4
+                "data": "".join(job["result"] for job in jobs)
             },
             status=200
         )
@@ -433,50 +481,34 @@ class HummingbotStop(APIView):
         )
 
 
-class BacktestV1(APIView, BackTestingMixin):
+class BacktestV1(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        with subprocess.Popen(
-            [
-                'python3',
-                'scripts/backtest.py',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8')
-
-        return Response(
-            data={
-                "data": t2
-            },
-            status=200
-        )
+        return self.job_response(self.run_job("backtest_v1"))
 
 
-class BacktestV2(APIView, BackTestingMixin):
+class BacktestV2(APIView, JobMixin):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
-        with subprocess.Popen(
-            [
-                'python3',
-                'scripts/backtest_v2.py',
-            ],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        ) as p:
-            t1 = p.communicate()
-            t2 = t1[0].decode('utf-8')
+        return self.job_response(self.run_job("backtest_v2"))
 
-        return Response(
-            data={
-                "data": t2
-            },
-            status=200
-        )
+
+class JobResult(APIView, JobMixin):
+    """
+    result of a job that took longer than JOBS_WAIT_TIMEOUT, the views
+    running jobs answered with its job_id.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        try:
+            job = self.job_client.result(job_id)
+        except JobServiceUnavailableError as error:
+            job = {"status": "unavailable", "error": str(error)}
+        return self.job_response(job)
 
 
 class GetAvailableExchanges(APIView, BackTestingMixin):
@@ -0,0 +1,228 @@
+"""
+publish/subscribe channel for the market data of the monitors.
+
+the monitors run in their own processes (manage.py startmonitor), they
+publish quotes and spreads as messages {"topic": str, "timestamp":
+float, "data": dict}. the consumers (the web workers, the live stream)
+keep the last message of every topic, so reading the current state never
+touches the database.
+
+UnixBus delivers the messages between processes as json datagrams over
+the unix sockets of a directory, without a broker: each consumer process
+binds one socket there and the publishers send every message to all of
+them. LocalBus delivers them inside the process, it's the stand-in used
+by the tests and by consumers living in the monitor process.
+"""
+import errno
+import json
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# bigger messages are dropped by the kernel (net.core.wmem_max)
+MAX_MESSAGE_SIZE = 1 << 20
+
+Message = dict
+
+
+class LocalBus:
+    def __init__(self):
+        self._latest: Dict[str, Message] = {}
+        self._subscribers: List[Callable[[Message], None]] = []
+        self._lock = threading.Lock()
+
+    def publish(self, topic: str, data: dict):
+        """
+        :param topic: str: e.g. inter, tri, quotes.Gdax
+        :param data: dict: json serializable
+        :return: None
+        """
+        self._deliver({"topic": topic, "timestamp": time.time(), "data": data})
+
+    def _deliver(self, message: Message):
+        with self._lock:
+            self._latest[message["topic"]] = message
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(message)
+            except Exception as error:
+                logger.exception(str(error))
+
+    def subscribe(self, callback: Callable[[Message], None]):
+        """
+        calls back with every message received from now on, in the thread
+        receiving them
+        :param callback: function(message)
+        :return: None
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Message], None]):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def latest(self, topic: str) -> Optional[Message]:
+        """
+        :param topic: str
+        :return: the last message of the topic, None if there's none yet
+        """
+        with self._lock:
+            return self._latest.get(topic)
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Message]:
+        """
+        :param prefix: str: e.g. quotes.
+        :return: dict topic -> last message of the topics with the prefix
+        """
+        with self._lock:
+            return {
+                topic: message
+                for topic, message in self._latest.items()
+                if topic.startswith(prefix)
+            }
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+class UnixBus(LocalBus):
+    """
+    publish sends the message to every socket (*.sock) in path, start
+    binds the socket of this process there and receives the messages in a
+    background thread. publishing never blocks: a consumer that is too
+    slow misses the message and the sockets of the consumers that exited
+    without removing them are deleted.
+    """
+
+    def __init__(self, path: str, name: str = "bus"):
+        super().__init__()
+        self.path = str(path)
+        self.socket_path = os.path.join(
+            self.path, f"{name}-{os.getpid()}.sock"
+        )
+        self.sent = 0
+        self.dropped = 0
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        self._receiver = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def receivers(self) -> List[str]:
+        try:
+            return [
+                entry.path
+                for entry in os.scandir(self.path)
+                if entry.name.endswith(".sock")
+            ]
+        except FileNotFoundError:
+            return []
+
+    def publish(self, topic: str, data: dict):
+        message = {"topic": topic, "timestamp": time.time(), "data": data}
+        encoded = json.dumps(message).encode()
+        for receiver in self.receivers():
+            try:
+                self._sender.sendto(encoded, receiver)
+                self.sent += 1
+            except ConnectionRefusedError:
+                # the consumer that bound it exited without removing it
+                self._remove(receiver)
+            except FileNotFoundError:
+                pass
+            except BlockingIOError:
+                self.dropped += 1
+            except OSError as error:
+                if error.errno != errno.EMSGSIZE:
+                    raise
+                self.dropped += 1
+                logger.warning(
+                    f"{len(encoded)} bytes {topic} message is too big."
+                )
+
+    @staticmethod
+    def _remove(receiver: str):
+        try:
+            os.unlink(receiver)
+        except OSError:
+            pass
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        binds the socket of this process and receives in a thread
+        :return: None
+        """
+        if self.is_running:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self._remove(self.socket_path)
+        self._receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._receiver.bind(self.socket_path)
+        # wakes up to see if the bus was stopped
+        self._receiver.settimeout(0.5)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._receive, name="market-bus", daemon=True
+        )
+        self._thread.start()
+
+    def _receive(self):
+        while not self._stop.is_set():
+            try:
+                data = self._receiver.recv(MAX_MESSAGE_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                # closed by stop
+                return
+            try:
+                message = json.loads(data)
+            except ValueError:
+                logger.warning("Discarded a malformed bus message.")
+                continue
+            self._deliver(message)
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._receiver is not None:
+            self._receiver.close()
+            self._receiver = None
+        self._remove(self.socket_path)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus() -> UnixBus:
+    """
+    the bus of this process, receiving the messages of the monitors
+    :return: UnixBus
+    """
+    global _bus
+    with _bus_lock:
+        if _bus is None:
+            _bus = UnixBus(settings.MARKET_BUS_DIR, name="web")
+        _bus.start()
+    return _bus
@@ -0,0 +1,462 @@
+"""
+long-lived pool running the backtests and the historical data commands
+for the api, started with manage.py startjobs.
+
+spawning python3 manage.py ... per request paid the start of python,
+django, ccxt and backtrader every time. the workers of the pool are
+started once with everything loaded, the views send them jobs over a
+local socket and get the results back by job id. identical jobs
+submitted while one is running share it, the results of the jobs of
+CACHED_JOBS are served again until they expire.
+"""
+import contextlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import runpy
+import secrets
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from multiprocessing.connection import Client, Listener
+from typing import List, Optional
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Model
+from django.forms.models import model_to_dict
+
+
+logger = logging.getLogger(__name__)
+
+
+# finished jobs whose result can still be asked for
+JOB_RESULTS_KEPT = 1000
+
+# id of the job running in this worker and where its progress goes
+_current_job = None
+_progress_queue = None
+
+
+class JobServiceUnavailableError(Exception):
+    pass
+
+
+def job_authkey(create: bool = False) -> Optional[bytes]:
+    """
+    the authkey of the job socket: JOBS_AUTHKEY, or else the one kept in
+    JOBS_AUTHKEY_FILE, readable by its user only
+    :param create: bool: generates the file when it doesn't exist
+    :return: bytes, None if there's none
+    """
+    if settings.JOBS_AUTHKEY:
+        return settings.JOBS_AUTHKEY
+    path = str(settings.JOBS_AUTHKEY_FILE)
+    try:
+        with open(path, "rb") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        if not create:
+            return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    authkey = secrets.token_hex(32).encode()
+    try:
+        descriptor = os.open(
+            path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600
+        )
+    except FileExistsError:
+        # another process generated it meanwhile
+        return job_authkey()
+    with os.fdopen(descriptor, "wb") as file:
+        file.write(authkey)
+    logger.info(f"Generated the job authkey in {path}")
+    return authkey
+
+
+def run_command(name: str, *args) -> str:
+    """
+    runs a management command in the worker
+    :param name: str: e.g. feed_exchange_history
+    :param args: str: command line arguments
+    :return: str: what the command printed
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        call_command(name, *args, stdout=output)
+    return output.getvalue()
+
+
+def report_progress(done: int, total: int):
+    """
+    called by a job to tell how far it is, shown with its status
+    :param done: int
+    :param total: int
+    :return: None
+    """
+    if _progress_queue is not None and _current_job is not None:
+        _progress_queue.put((_current_job, done, total))
+
+
+def load_historical_data(option: str, params: dict):
+    """
+    BackTestingMixin.load_data in the worker, reporting the pages of
+    candles fetched
+    :param option: str: see HistoricalDataSerializer
+    :param params: dict
+    :return: the data loaded
+    """
+    from arbitrage.api.mixins import BackTestingMixin
+
+    result, data = BackTestingMixin().load_data(
+        option, progress=report_progress, **params
+    )
+    if not result:
+        raise ValueError(data)
+    if isinstance(data, Model):
+        # the CoinHistoricalData committed by list_general_trade_pair_ohlcv
+        data = model_to_dict(data)
+    return data
+
+
+def run_script(path: str) -> str:
+    """
+    runs a script of scripts/ in the worker as __main__, the modules it
+    imports stay loaded for the next run
+    :param path: str: relative to BASE_DIR
+    :return: str: what the script printed
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            runpy.run_path(
+                os.path.join(settings.BASE_DIR, path), run_name="__main__"
+            )
+        except SystemExit as exit:
+            if exit.code not in (None, 0):
+                raise
+    return output.getvalue()
+
+
+JOBS = {
+    "feed_exchange_history": partial(run_command, "feed_exchange_history"),
+    "backtest_v1": partial(run_script, "scripts/backtest.py"),
+    "backtest_v2": partial(run_script, "scripts/backtest_v2.py"),
+    "historical_data": load_historical_data,
+}
+
+# jobs whose results are reused by the identical jobs submitted until
+# JOBS_CACHE_TTL, the others only share a job still running
+CACHED_JOBS = {"historical_data"}
+
+
+def _init_worker(progress_queue):
+    global _progress_queue
+    _progress_queue = progress_queue
+    # the worker starts from the fork server, without django loaded
+    django.setup()
+
+
+def _run(job_id: str, function, *args):
+    global _current_job
+    _current_job = job_id
+    try:
+        return function(*args)
+    finally:
+        _current_job = None
+
+
+class Job:
+    def __init__(self, name: str, key: str, future):
+        self.name = name
+        self.key = key
+        self.future = future
+        self.finished = None
+        self.progress = None
+        future.add_done_callback(self._done)
+
+    def _done(self, future):
+        self.finished = time.monotonic()
+
+    def reusable(self, ttl: float) -> bool:
+        """
+        :param ttl: float: seconds a cached result is served
+        :return: bool: an identical job can be answered with this one
+        """
+        if not self.future.done():
+            return True
+        return (
+            self.name in CACHED_JOBS
+            and not self.future.cancelled()
+            and self.future.exception() is None
+            and time.monotonic() - self.finished < ttl
+        )
+
+
+class JobServer:
+    """
+    accepts jobs on a unix socket and runs them in a pool of worker
+    processes. requests and responses are tuples and dicts sent with
+    multiprocessing.connection:
+
+        ("submit", name, args) -> {"status": "pending", "job_id": str}
+        ("result", job_id, timeout) -> {"status": "pending" | "done" |
+            "error" | "unknown", "result": str, "error": str,
+            "progress": {"done": int, "total": int}}
+
+    the jobs are keyed by name and arguments, submitting the key of a job
+    still running or of a cached result returns its job id.
+    """
+
+    def __init__(
+        self,
+        address: Optional[str] = None,
+        workers: Optional[int] = None,
+        authkey: Optional[bytes] = None,
+        kept: int = JOB_RESULTS_KEPT,
+        cache_size: Optional[int] = None,
+        cache_ttl: Optional[float] = None,
+    ):
+        self.address = str(address or settings.JOBS_ADDRESS)
+        self.workers = workers or settings.JOBS_WORKERS
+        self.authkey = authkey or job_authkey(create=True)
+        self.kept = kept
+        self.cache_size = cache_size or settings.JOBS_CACHE_SIZE
+        self.cache_ttl = cache_ttl or settings.JOBS_CACHE_TTL
+        # forking the server with its threads running could deadlock the
+        # workers on a lock held by one of them, they're forked from a
+        # clean fork server process instead
+        self._context = multiprocessing.get_context("forkserver")
+        self._progress = self._context.Queue()
+        self._pool = self._new_pool()
+        # job id -> Job, least recently used first
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        # key -> job id of the running jobs and the cached results
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._listener = None
+        threading.Thread(target=self._receive_progress, daemon=True).start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._progress,),
+        )
+
+    def _receive_progress(self):
+        while True:
+            progress = self._progress.get()
+            if progress is None:
+                return
+            job_id, done, total = progress
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None:
+                    job.progress = {"done": done, "total": total}
+
+    def submit(self, name: str, args: List[str]) -> str:
+        """
+        :param name: str: a key of JOBS
+        :param args: list of str
+        :return: str: job id
+        """
+        function = JOBS[name]
+        key = json.dumps([name, args], sort_keys=True, default=str)
+        with self._lock:
+            self._prune()
+            job_id = self._keys.get(key)
+            job = self._jobs.get(job_id)
+            if job is not None and job.reusable(self.cache_ttl):
+                self._jobs.move_to_end(job_id)
+                return job_id
+
+            job_id = uuid.uuid4().hex
+            try:
+                future = self._pool.submit(_run, job_id, function, *args)
+            except BrokenProcessPool:
+                # a worker died, e.g. killed by the oom killer
+                logger.warning("The job pool is broken, restarting it.")
+                self._pool = self._new_pool()
+                future = self._pool.submit(_run, job_id, function, *args)
+            self._jobs[job_id] = Job(name, key, future)
+            self._keys[key] = job_id
+        return job_id
+
+    def _prune(self):
+        cached = []
+        for job_id, job in self._jobs.items():
+            if self._keys.get(job.key) != job_id or not job.future.done():
+                continue
+            if job.reusable(self.cache_ttl):
+                cached.append(job)
+            else:
+                del self._keys[job.key]
+        # least recently used first
+        for job in cached[: max(len(cached) - self.cache_size, 0)]:
+            del self._keys[job.key]
+
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.future.done() and self._keys.get(job.key) != job_id
+        ]
+        for job_id in finished[: max(len(self._jobs) - self.kept, 0)]:
+            del self._jobs[job_id]
+
+    def result(self, job_id: str, timeout: float = 0) -> dict:
+        """
+        :param job_id: str
+        :param timeout: float: seconds to wait for the job to finish
+        :return: dict
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"status": "unknown", "job_id": job_id}
+        response = {"job_id": job_id}
+        try:
+            response["result"] = job.future.result(timeout=timeout)
+            response["status"] = "done"
+        except TimeoutError:
+            response["status"] = "pending"
+        except Exception as error:
+            response.update(status="error", error=str(error))
+        if job.progress is not None:
+            response["progress"] = job.progress
+        return response
+
+    def handle(self, connection):
+        with connection:
+            while True:
+                try:
+                    request = connection.recv()
+                except EOFError:
+                    return
+                try:
+                    if request[0] == "submit":
+                        _, name, args = request
+                        response = {
+                            "status": "pending",
+                            "job_id": self.submit(name, args),
+                        }
+                    elif request[0] == "result":
+                        _, job_id, timeout = request
+                        response = self.result(job_id, timeout)
+                    else:
+                        raise ValueError(f"Unknown request {request[0]}")
+                except Exception as error:
+                    response = {"status": "error", "error": str(error)}
+                connection.send(response)
+
+    def serve_forever(self):
+        """
+        accepts connections until close, each one is served in a thread
+        :return: None
+        """
+        if not self.authkey:
+            # the requests are pickles, anyone connecting could run code
+            raise ValueError(
+                "The job server doesn't start without an authkey, set "
+                "JOBS_AUTHKEY or JOBS_AUTHKEY_FILE."
+            )
+        os.makedirs(os.path.dirname(self.address), exist_ok=True)
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        # only the user running the web server can send jobs, the socket
+        # is created with that mode instead of changed after binding
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(
+                self.address, family="AF_UNIX", authkey=self.authkey
+            )
+        finally:
+            os.umask(umask)
+        logger.info(f"Job server listening on {self.address}")
+        while True:
+            try:
+                connection = self._listener.accept()
+            except OSError:
+                # closed
+                return
+            except Exception as error:
+                # e.g. a client with the wrong authkey
+                logger.warning(str(error))
+                continue
+            threading.Thread(
+                target=self.handle, args=(connection,), daemon=True
+            ).start()
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._progress.put(None)
+
+
+class JobClient:
+    def __init__(
+        self, address: Optional[str] = None, authkey: Optional[bytes] = None
+    ):
+        self.address = str(address or settings.JOBS_ADDRESS)
+        self._authkey = authkey
+
+    @property
+    def authkey(self) -> Optional[bytes]:
+        # read on use, the server may generate it after the client exists
+        return self._authkey or job_authkey()
+
+    def _request(self, *request) -> dict:
+        if not self.authkey:
+            raise JobServiceUnavailableError(
+                "There's no job authkey, set JOBS_AUTHKEY or start the job "
+                "server with manage.py startjobs."
+            )
+        try:
+            connection = Client(
+                self.address, family="AF_UNIX", authkey=self.authkey
+            )
+        except (FileNotFoundError, ConnectionRefusedError) as error:
+            raise JobServiceUnavailableError(
+                f"The job server isn't running at {self.address}, start it "
+                f"with manage.py startjobs."
+            ) from error
+        with connection:
+            connection.send(request)
+            return connection.recv()
+
+    def submit(self, name: str, *args) -> str:
+        """
+        :param name: str: a key of JOBS
+        :param args: str: arguments of the job
+        :return: str: job id
+        """
+        response = self._request("submit", name, list(args))
+        if response["status"] == "error":
+            raise ValueError(response["error"])
+        return response["job_id"]
+
+    def result(self, job_id: str, timeout: float = 0) -> dict:
+        """
+        :param job_id: str
+        :param timeout: float: seconds to wait for the job to finish
+        :return: dict: status and result or error
+        """
+        return self._request("result", job_id, timeout)
+
+    def run(self, name: str, *args, timeout: Optional[float] = None) -> dict:
+        """
+        submits a job and waits for it at most timeout seconds, when it
+        isn't finished by then the status is pending and the result can be
+        asked for later with the job id
+        :return: dict
+        """
+        timeout = settings.JOBS_WAIT_TIMEOUT if timeout is None else timeout
+        return self.result(self.submit(name, *args), timeout)
@@ -0,0 +1,36 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from arbitrage.jobs import JobServer
+from crypto_bot.services.markets import market_registry
+
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+
+    help = "Starting the worker pool of the backtests and historical data."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="worker processes, JOBS_WORKERS by default",
+        )
+
+    def handle(self, *args, **options):
+        # persisted on disk, the workers read them from there
+        market_registry.warm(wait=False)
+        server = JobServer(workers=options.get("workers"))
+        self.stdout.write(
+            self.style.SUCCESS(f"Serving jobs on {server.address}")
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.close()
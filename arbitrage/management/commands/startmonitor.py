@@ -1,9 +1,13 @@
 import logging
 import pdb
+import time
 
+import psutil
 from django.core.management.base import BaseCommand, CommandError
 
+from arbitrage.monitor import settings as monitor_settings
 from arbitrage.monitor.monitor import Monitor
+from crypto_bot.services.markets import market_registry
 
 
 logger = logging.getLogger(__name__)
@@ -14,7 +18,13 @@ class Command(BaseCommand):
     help = "Starting monitor thread."
     output_transaction = False
     stop_threads = False
-    available_monitors = ["start_tri", "start_inter"]
+    available_monitors = [
+        "start_tri",
+        "start_inter",
+        "start_stream",
+        "feed_quotes",
+        "check_startup",
+    ]
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -25,10 +35,22 @@ class Command(BaseCommand):
         self.monitor = Monitor()
 
     def handle(self, *args, **options):
+        logger.info(
+            f"{options.get('action')} after {self.since_start():.3f} s of "
+            f"start up."
+        )
+        # in the background, the monitor doesn't wait for them
+        market_registry.warm(wait=False)
         if options.get("action") == "start_tri":
             flag = self.start_tri()
         elif options.get("action") == "start_inter":
             flag = self.start_inter()
+        elif options.get("action") == "start_stream":
+            flag = self.start_stream()
+        elif options.get("action") == "feed_quotes":
+            flag = self.feed_quotes()
+        elif options.get("action") == "check_startup":
+            flag = self.check_startup()
 
     def start_tri(self):
         try:
@@ -45,3 +67,48 @@ class Command(BaseCommand):
             logger.exception(str(error))
             return False
         self.stdout.write(self.style.SUCCESS("Successfully start monitor!"))
+
+    def start_stream(self):
+        try:
+            self.monitor.update_stream()
+        except Exception as error:
+            logger.exception(str(error))
+            return False
+        self.stdout.write(self.style.SUCCESS("Successfully start monitor!"))
+
+    def feed_quotes(self):
+        try:
+            self.monitor.feed_quotes()
+        except Exception as error:
+            logger.exception(str(error))
+            return False
+        self.stdout.write(self.style.SUCCESS("Successfully start feeder!"))
+
+    @staticmethod
+    def since_start():
+        """
+        :return: float: seconds since the process started
+        """
+        return time.time() - psutil.Process().create_time()
+
+    def check_startup(self):
+        """
+        builds what the monitors need before their first cycle and prints
+        how long it took, to measure the cold start of startmonitor
+        """
+        timings = [f"imports {self.since_start():.3f} s"]
+        for name in ["EXCHANGES", "TRI_EXCHANGES", "UPDATE_ACTIONS"]:
+            started = time.perf_counter()
+            try:
+                getattr(monitor_settings, name)
+            except Exception as error:
+                logger.exception(str(error))
+                return False
+            timings.append(f"{name} {time.perf_counter() - started:.3f} s")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Ready {self.since_start():.3f} s after the process "
+                f"started: {', '.join(timings)}"
+            )
+        )
+        return True
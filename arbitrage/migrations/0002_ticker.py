@@ -0,0 +1,49 @@
+# Generated by Django 4.0.2 on 2026-10-18 10:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("arbitrage", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Ticker",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                ("timestamp", models.FloatField()),
+                ("open", models.FloatField()),
+                ("high", models.FloatField()),
+                ("low", models.FloatField()),
+                ("close", models.FloatField()),
+                ("volume", models.FloatField()),
+                ("exchange", models.CharField(max_length=64)),
+                ("trade_pair", models.CharField(max_length=64)),
+                ("granularity", models.CharField(max_length=64)),
+            ],
+            options={
+                "db_table": "arbitrage_ticker",
+                "ordering": ["exchange", "granularity", "timestamp"],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="ticker",
+            constraint=models.UniqueConstraint(
+                fields=("exchange", "trade_pair", "granularity", "timestamp"),
+                name="unique_ticker_candle",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.0.2 on 2026-10-18 10:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("arbitrage", "0002_ticker"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="ticker",
+            options={
+                "ordering": ["exchange", "trade_pair", "granularity", "timestamp"]
+            },
+        ),
+    ]
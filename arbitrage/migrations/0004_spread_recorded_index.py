@@ -0,0 +1,26 @@
+# Generated by Django 4.0.2 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("arbitrage", "0003_ticker_ordering"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="spread",
+            index=models.Index(
+                fields=["-recorded_date", "-id"], name="spread_recorded_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="tri_spread",
+            index=models.Index(
+                fields=["-recorded_date", "-id"],
+                name="tri_spread_recorded_idx",
+            ),
+        ),
+    ]
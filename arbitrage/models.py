@@ -1,6 +1,9 @@
 from django.db import models
+import itertools
 import json
 
+import numpy as np
+
 BTCAmount = float
 FiatAmount = float
 
@@ -63,10 +66,81 @@ class Exchange(BaseModel):
         return json.loads(self.api_data)
 
 
+TICKER_FIELDS = ("timestamp", "open", "high", "low", "close", "volume")
+TICKER_DTYPE = np.dtype([(field, "<f8") for field in TICKER_FIELDS])
+TICKER_CHUNK_SIZE = 50_000
+
+
+class TickerQuerySet(models.QuerySet):
+    def series(
+        self, exchange, trade_pair, granularity, since=None, until=None
+    ):
+        """
+        candles of one market and granularity in [since, until) ordered
+        by time, it's a range scan of the unique_ticker_candle index.
+        :param exchange: str
+        :param trade_pair: str
+        :param granularity: str: e.g. 1h
+        :param since: float: timestamp, None reads from the first candle
+        :param until: float: timestamp, None reads until the last candle
+        :return: TickerQuerySet
+        """
+        queryset = self.filter(
+            exchange=exchange, trade_pair=trade_pair, granularity=granularity
+        )
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        return queryset.order_by("timestamp")
+
+    def iter_arrays(self, chunk_size: int = TICKER_CHUNK_SIZE):
+        """
+        streams the candles as structured arrays of TICKER_DTYPE without
+        creating model instances, at most chunk_size rows are in memory.
+        :param chunk_size: int
+        :return: generator of np.ndarray
+        """
+        rows = self.values_list(*TICKER_FIELDS).iterator(
+            chunk_size=chunk_size
+        )
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            # a 2d float array viewed as records, the fields are all <f8
+            yield np.array(chunk, dtype="<f8").view(TICKER_DTYPE)[:, 0]
+
+    def to_array(self, chunk_size: int = TICKER_CHUNK_SIZE) -> np.ndarray:
+        """
+        reads the candles into one structured array, e.g.
+        Ticker.objects.series(...).to_array()["close"]
+        :param chunk_size: int
+        :return: np.ndarray of TICKER_DTYPE
+        """
+        chunks = list(self.iter_arrays(chunk_size))
+        if not chunks:
+            return np.empty(0, dtype=TICKER_DTYPE)
+        return np.concatenate(chunks)
+
+
 class Ticker(BaseModel):
     class Meta:
-        ordering = ["exchange", "granularity", "timestamp"]
+        # same order as the unique index, reads sorted by default walk
+        # the index instead of sorting the rows
+        ordering = ["exchange", "trade_pair", "granularity", "timestamp"]
         db_table = "arbitrage_ticker"
+        constraints = [
+            # one candle per market and granularity, re-fetching a
+            # range with bulk_create(ignore_conflicts=True) is a no-op.
+            # its index also serves the range reads of series
+            models.UniqueConstraint(
+                fields=["exchange", "trade_pair", "granularity", "timestamp"],
+                name="unique_ticker_candle",
+            )
+        ]
+
+    objects = TickerQuerySet.as_manager()
 
     timestamp = models.FloatField()
     open  = models.FloatField()
@@ -83,6 +157,12 @@ class Spread(BaseModel):
     class Meta:
         ordering = ["-recorded_date"]
         db_table = "spread"
+        indexes = [
+            # keyset pagination of the api, newest first
+            models.Index(
+                fields=["-recorded_date", "-id"], name="spread_recorded_idx"
+            )
+        ]
 
     exchange_buy_id = models.IntegerField()
     exchange_sell_id = models.IntegerField()
@@ -105,6 +185,13 @@ class Tri_Spread(BaseModel):
     class Meta:
         ordering = ["-recorded_date"]
         db_table = "tri_spread"
+        indexes = [
+            # keyset pagination of the api, newest first
+            models.Index(
+                fields=["-recorded_date", "-id"],
+                name="tri_spread_recorded_idx",
+            )
+        ]
 
     tri_exchange_buy1_id = models.IntegerField()
     tri_exchange_sell_id = models.IntegerField()
@@ -5,10 +5,9 @@ import sys
 from abc import ABC, abstractmethod
 from typing import Optional
 
-import requests
-
 from arbitrage.monitor.currency import CurrencyPair, BTCAmount
 from arbitrage.monitor.order import Order, OrderState
+from crypto_bot.services.http_pool import http_pool
 
 
 logger = logging.getLogger(__name__)
@@ -24,11 +23,17 @@ class Exchange(ABC):
 
     Here you can find the definition of all generic methods
     and properties shared across exchanges.
+
+    http requests go through session_pool which keeps
+    the connections to each host alive between updates.
     """
+    session_pool = http_pool
+
     def __init__(self, currency_pair: CurrencyPair):
         self.currency_pair = currency_pair
         self.last_ask_price: Optional[float] = None
         self.last_bid_price: Optional[float] = None
+        self.is_stale: bool = False
 
     @property
     def name(self):
@@ -68,21 +73,36 @@ class Exchange(ABC):
     def cancel_order(self, order: Order):
         raise NotImplementedError
 
+    def get_open_orders(self):
+        """
+        ids of the orders still open in the exchange, one request
+        answers for every order, see OrderTracker.
+        :return: set of OrderId
+        """
+        raise NotImplementedError
+
     def update_prices(self):
-        print("Geting url : ", self.ticker_url)
-        response = requests.get(self.ticker_url)
+        """
+        refreshes the last ask and bid prices from the ticker endpoint
+        :return: bool
+        it returns false in case of an error.
+        """
+        logger.debug(f"Getting url: {self.ticker_url}")
+        response = self.session_pool.get(self.ticker_url)
         if response.status_code != 200:
             logger.warning(
                 "Could not update prices. API returned status != 200."
             )
-            return
+            return False
         try:
             json_response = response.json()
             self.last_ask_price = float(json_response.get("ask"))
             self.last_bid_price = float(json_response.get("bid"))
-        except json.decoder.JSONDecodeError or TypeError:
+        except (json.decoder.JSONDecodeError, TypeError):
             logger.error("Could not update prices. Error on json processing:")
             logger.error(sys.exc_info())
+            return False
+        return True
 
     def __str__(self):
         return f"{self.name} ({self.currency_pair.value})"
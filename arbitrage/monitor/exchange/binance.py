@@ -7,6 +7,7 @@ from django.conf import settings
 from arbitrage.monitor.currency import CurrencyPair
 from arbitrage.monitor.exchange import Exchange, BTCAmount
 from arbitrage.monitor.order import Order
+from arbitrage.monitor.exchange.registry import ExchangeSpec
 
 from crypto_bot.services.binance import BinanceHandler
 
@@ -27,23 +28,64 @@ class Binance:
         self.client = Client(key, secret)
         self.allowed_actions = ["canTrade", "canWhitdraw"]
         self.exchange_feed = None
+        self.is_stale = False
+        self.tickers = []
+        self.book = {}
         self.handler = BinanceHandler(
             config={"api-key": key, "secret": secret}
         )
 
     def update_prices(self):
         """
-        refreshes the prices for the order tickets from the exchange API
+        refreshes the prices for the order tickets from the exchange API,
+        one request brings the best bid and ask of every symbol which are
+        indexed in book as symbol -> (bid, ask).
         :return: bool
         it returns false in case of an error.
         """
         try:
             self.tickers = self.client.get_orderbook_tickers()
+            self.book = {
+                ticker["symbol"]: (
+                    float(ticker["bidPrice"]),
+                    float(ticker["askPrice"]),
+                )
+                for ticker in self.tickers
+            }
         except Exception as error:
             logger.exception(str(error))
             return False
         return True
 
+    @classmethod
+    def shared(
+        cls, key=settings.BINANCE_API_KEY, secret=settings.BINANCE_SEC_KEY
+    ):
+        """
+        gets the instance shared by everything using the same credentials,
+        so the api client and its connections are only created once.
+        :param key: str
+        :param secret: str
+        :return: Binance
+        """
+        return ExchangeSpec(cls, key=key, secret=secret).get()
+
+    def markets(self):
+        """
+        lists the markets currently trading in the exchange with
+        their base and quote assets, used to build the currency graph.
+        :return: list of dict: symbol, base, quote
+        """
+        return [
+            {
+                "symbol": symbol["symbol"],
+                "base": symbol["baseAsset"],
+                "quote": symbol["quoteAsset"],
+            }
+            for symbol in self.client.get_exchange_info()["symbols"]
+            if symbol.get("status", "TRADING") == "TRADING"
+        ]
+
     def can_do(self, action: str):
         """
         verifies if the given action can be implemented
@@ -99,12 +141,21 @@ class BinanceAdapter(Exchange):
         CurrencyPair.ETH_USD: "ETHUSD",
     }
 
-    def __init__(self, currency_pair: CurrencyPair, binance: Binance):
+    def __init__(self, currency_pair: CurrencyPair, binance: Binance = None):
         super().__init__(currency_pair)
-        self.binance = Binance()
-        self._depth = self.binance.client.get_order_book(symbol=currency_pair)
-        self.last_ask_price = float(self.depth["asks"][0][0])
-        self.last_bid_price = float(self.depth["bids"][0][0])
+        self.binance = binance or Binance.shared()
+        self._depth = None
+        if currency_pair in self.binance.book:
+            # best prices of the last bulk snapshot, no request needed
+            bid, ask = self.binance.book[currency_pair]
+        else:
+            self._depth = self.binance.client.get_order_book(
+                symbol=currency_pair
+            )
+            bid = self.depth["bids"][0][0]
+            ask = self.depth["asks"][0][0]
+        self.last_ask_price = float(ask)
+        self.last_bid_price = float(bid)
 
     @property
     def depth(self):
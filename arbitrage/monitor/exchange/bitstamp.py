@@ -23,14 +23,25 @@ class Bitstamp(Exchange):
     key = conf_settings.BITSTAMP_KEY
     user = conf_settings.BITSTAMP_USERNAME
     user_id = conf_settings.BITSTAMP_USER_ID
-    handler = BitStampHandler(
-        config={
-            "apit_key": key,
-            "secret": secret,
-            "customer_username": user,
-            "customer_id": user_id,
-        }
-    )
+    _handler = None
+
+    @property
+    def handler(self) -> BitStampHandler:
+        """
+        the trading client, built on first use since it needs the account
+        credentials, shared by every Bitstamp
+        :return: BitStampHandler
+        """
+        if Bitstamp._handler is None:
+            Bitstamp._handler = BitStampHandler(
+                config={
+                    "api_key": self.key,
+                    "secret": self.secret,
+                    "customer_username": self.user,
+                    "customer_id": self.user_id,
+                }
+            )
+        return Bitstamp._handler
 
     @property
     def ticker_url(self):
@@ -4,7 +4,8 @@ import hmac
 import hashlib
 import logging
 
-import requests
+from typing import Set
+
 from requests.auth import AuthBase
 
 from arbitrage.monitor.currency import CurrencyPair
@@ -108,7 +109,7 @@ class Gdax(Exchange):
             "size": amount,
             "price": limit,
         }
-        response = requests.post(url, json=data, auth=self.auth)
+        response = self.session_pool.post(url, json=data, auth=self.auth)
         json = response.json()
         order_id = json.get("id")
         return order_id
@@ -142,7 +143,7 @@ class Gdax(Exchange):
         :return: OrderState obj
         """
         url = f"{self.base_url}/orders/{order.order_id}"
-        response = requests.get(url, auth=self.auth)
+        response = self.session_pool.get(url, auth=self.auth)
 
         if response.status_code == 404:
             logger.info(
@@ -156,3 +157,20 @@ class Gdax(Exchange):
             return OrderState.DONE
         elif state_string in ["open", "pending"]:
             return OrderState.PENDING
+
+    def get_open_orders(self) -> Set[OrderId]:
+        """
+        lists the ids of the orders of the currency pair which are
+        still open or pending
+        :return: set of OrderId
+        """
+        url = f"{self.base_url}/orders"
+        params = {
+            "status": ["open", "pending"],
+            "product_id": self.currency_pair_api_representation.get(
+                self.currency_pair
+            ),
+        }
+        response = self.session_pool.get(url, params=params, auth=self.auth)
+        response.raise_for_status()
+        return {order["id"] for order in response.json()}
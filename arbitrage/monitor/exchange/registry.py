@@ -0,0 +1,66 @@
+import logging
+import threading
+from typing import Union
+
+from django.utils.module_loading import import_string
+
+
+logger = logging.getLogger(__name__)
+
+
+ADAPTERS_PACKAGE = "arbitrage.monitor.exchange"
+
+# ExchangeSpec.key -> adapter instance
+_instances = {}
+_instances_lock = threading.RLock()
+
+
+class ExchangeSpec:
+    """
+    declares an exchange adapter of the monitor settings without building
+    it. the adapter is built on the first get and shared by every spec
+    with the same class and arguments (currency pair, credentials...).
+
+    the class can be given as "module.Class" of arbitrage.monitor.exchange,
+    then its module (and the sdk it imports) is only imported by get.
+    """
+
+    def __init__(self, adapter: Union[str, type], *args, **kwargs):
+        """
+        :param adapter: str or class: e.g. "binance.Binance"
+        :param args: arguments of the adapter, must be hashable
+        :param kwargs: keyword arguments of the adapter, must be hashable
+        """
+        self.adapter = adapter
+        self.args = args
+        self.kwargs = kwargs
+
+    @property
+    def key(self) -> tuple:
+        return (self.path, self.args, tuple(sorted(self.kwargs.items())))
+
+    @property
+    def path(self) -> str:
+        if isinstance(self.adapter, str):
+            return f"{ADAPTERS_PACKAGE}.{self.adapter}"
+        return f"{self.adapter.__module__}.{self.adapter.__qualname__}"
+
+    def get(self):
+        """
+        :return: the adapter, built the first time
+        """
+        key = self.key
+        instance = _instances.get(key)
+        if instance is None:
+            with _instances_lock:
+                instance = _instances.get(key)
+                if instance is None:
+                    adapter = self.adapter
+                    if isinstance(adapter, str):
+                        adapter = import_string(self.path)
+                    instance = adapter(*self.args, **self.kwargs)
+                    _instances[key] = instance
+        return instance
+
+    def __repr__(self):
+        return f"ExchangeSpec({self.path}, {self.args}, {self.kwargs})"
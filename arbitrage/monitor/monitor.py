@@ -1,8 +1,9 @@
-import itertools
 import logging
+import queue
 
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
-from time import sleep
+from time import sleep, time
 from typing import List
 
 from django.conf import settings as config_settings
@@ -10,15 +11,18 @@ from django.conf import settings as config_settings
 from arbitrage.models import Spread
 from arbitrage.monitor import settings
 from arbitrage.monitor.exchange import Exchange
-from arbitrage.monitor.spread_detection.exchange import (
-    SpreadDetection,
-    SpreadMissingPriceError,
-    SpreadDifferentCurrenciesError,
+from arbitrage.monitor.quotes import SharedQuoteTable, quote_key
+from arbitrage.monitor.spread_detection.graph import CurrencyGraph
+from arbitrage.monitor.spread_detection.incremental import (
+    IncrementalSpreadEngine,
 )
+from arbitrage.monitor.spread_detection.matrix import SpreadMatrix
 from arbitrage.monitor.spread_detection.triangular import (
     TriSpreadDetector,
     TriSpreadMissingPriceError,
 )
+from arbitrage.monitor.stream.engine import StreamEngine
+from crypto_bot.services.http_pool import http_pool
 
 
 logger = logging.getLogger(__name__)
@@ -27,16 +31,39 @@ logger = logging.getLogger(__name__)
 class Monitor:
     def __init__(self):
         self._last_spreads = []
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.PRICE_UPDATE_WORKERS,
+            thread_name_prefix="price-update",
+        )
+        # exchange -> future of a price request which is still running
+        self._pending_updates = {}
+        self._spread_engine = None
+        self._spread_matrix = None
+        # tri exchange name -> CurrencyGraph, see TRI_AUTO_DISCOVERY
+        self._tri_graphs = {}
+        self.arbitrage_cycles = []
+        # see SHARED_QUOTES
+        self._shared_quotes = None
+        self._missing_feeder_logged = False
 
     def update_tri(self):
+        if settings.TRI_AUTO_DISCOVERY:
+            self._discover_triangles()
+
         while True:
             try:
                 # update prices of exchanges
-                for tri_exchange in settings.TRI_EXCHANGES:
-                    tri_exchange["exchange"].update_prices()
+                self._update_prices(
+                    [
+                        tri_exchange["exchange"]
+                        for tri_exchange in settings.TRI_EXCHANGES
+                    ]
+                )
 
                 # calculation tri_spreads using triangular arbitrage.
                 tri_spreads = self._calculate_tri_spreads()
+                if self._tri_graphs:
+                    self.arbitrage_cycles = self._find_arbitrage_cycles()
 
                 # Action on triangular arbitrage
                 timestamp = datetime.now().timestamp()
@@ -58,8 +85,9 @@ class Monitor:
         while True:
             try:
                 # Update prices of exchanges
-                for exchange in settings.EXCHANGES:
-                    exchange.update_prices()
+                self._update_prices(settings.EXCHANGES)
+                if config_settings.DEBUG:
+                    logger.debug(f"HTTP connection reuse: {http_pool.stats}")
 
                 # Calculation spreads using exchange arbitrage.
                 spreads = self._calculate_spreads()
@@ -79,34 +107,252 @@ class Monitor:
                     logger.exception(str(update_error))
                 continue
 
-    def _calculate_spreads(self):
-        combinations = itertools.combinations(settings.EXCHANGES, 2)
-        spreads = []
-        for pair in combinations:
+    def update_stream(self):
+        """
+        push based version of update_inter, prices come from the exchanges
+        streaming feeds and the spreads are calculated every time the top
+        of a book changes instead of every UPDATE_INTERVAL seconds.
+        """
+        changes = queue.Queue()
+        engine = StreamEngine(
+            settings.EXCHANGES,
+            urls=settings.STREAM_FEED_URLS,
+            depth=settings.STREAM_BOOK_DEPTH,
+        )
+        engine.add_listener(changes.put)
+        engine.start()
+
+        while True:
             try:
-                spread = SpreadDetection(
-                    exchange_one=pair[0], exchange_two=pair[1]
-                )
-                spreads.append(spread)
-            except (
-                SpreadMissingPriceError,
-                SpreadDifferentCurrenciesError,
-            ) as error:
-                # Set exception handlers here for Missing Prices and Differenct
-                # Currencies Errors, we still do not have these.
+                changed = [changes.get()]
+                # Coalesce the changes received while the previous ones
+                # were being processed.
+                while not changes.empty():
+                    changed.append(changes.get_nowait())
+
+                self._stream_changes(changed)
+
+            except Exception as update_error:
                 if config_settings.DEBUG:
+                    logger.exception(str(update_error))
+                continue
+
+    def _stream_changes(self, changed):
+        """
+        calculates the spreads after the books of the exchanges changed and
+        runs the actions, the ones saving the history only get the spreads
+        calculated again, the others (broadcast, trader) get all of them.
+        :param changed: list of exchange objects
+        :return: None
+        """
+        spreads = self._calculate_spreads(changed)
+        if settings.SPREAD_ENGINE == "matrix":
+            changed = set(changed)
+            recalculated = [
+                spread
+                for spread in spreads
+                if spread.exchange_buy in changed
+                or spread.exchange_sell in changed
+            ]
+        else:
+            recalculated = list(self._spread_engine.recalculated.values())
+        timestamp = datetime.now().timestamp()
+        for action in settings.UPDATE_ACTIONS:
+            action.run_inter(
+                recalculated if action.saves_history else spreads,
+                settings.EXCHANGES,
+                timestamp,
+            )
+
+    def feed_quotes(self):
+        """
+        polls the prices of EXCHANGES every UPDATE_INTERVAL and writes
+        them to the shared quote table the monitors read with
+        SHARED_QUOTES, run a single feeder per host.
+        """
+        table = SharedQuoteTable(
+            settings.SHARED_QUOTES_NAME,
+            [quote_key(exchange) for exchange in settings.EXCHANGES],
+            create=True,
+        )
+        try:
+            while True:
+                try:
+                    self._poll_prices(settings.EXCHANGES)
+                    timestamp = time()
+                    for exchange in settings.EXCHANGES:
+                        if exchange.is_stale:
+                            continue
+                        table.write(
+                            quote_key(exchange),
+                            exchange.last_bid_price,
+                            exchange.last_ask_price,
+                            timestamp,
+                        )
+                    sleep(settings.UPDATE_INTERVAL)
+                except Exception as error:
+                    if config_settings.DEBUG:
+                        logger.exception(str(error))
+                    continue
+        finally:
+            table.close()
+            table.unlink()
+
+    def _quote_table(self):
+        """
+        the shared quote table of the feeder, None while there's none
+        :return: SharedQuoteTable
+        """
+        if self._shared_quotes is None:
+            try:
+                self._shared_quotes = SharedQuoteTable(
+                    settings.SHARED_QUOTES_NAME
+                )
+            except FileNotFoundError:
+                if not self._missing_feeder_logged:
+                    logger.warning(
+                        "There's no quote feeder running, polling the "
+                        "exchanges instead."
+                    )
+                    self._missing_feeder_logged = True
+        return self._shared_quotes
+
+    def _drop_quote_table(self):
+        logger.warning("The quote feeder exited or was restarted.")
+        self._shared_quotes.close()
+        self._shared_quotes = None
+        self._missing_feeder_logged = False
+
+    def _read_shared_prices(self, table, exchanges):
+        """
+        takes the prices of the exchanges from the shared quote table, the
+        ones missing from it or older than SHARED_QUOTES_MAX_AGE are left
+        to poll.
+        :return: list of the exchanges to poll
+        """
+        missing = []
+        now = time()
+        for exchange in exchanges:
+            key = quote_key(exchange)
+            if key not in table:
+                missing.append(exchange)
+                continue
+            quote = table.read(key)
+            if (
+                quote is None
+                or now - quote.timestamp > settings.SHARED_QUOTES_MAX_AGE
+            ):
+                missing.append(exchange)
+                continue
+            exchange.last_bid_price = quote.bid
+            exchange.last_ask_price = quote.ask
+            exchange.is_stale = False
+        return missing
+
+    def _update_prices(self, exchanges):
+        """
+        with SHARED_QUOTES the prices come from the quote table of the
+        feeder process, the exchanges it doesn't cover or has no recent
+        quote of are polled.
+        :param exchanges: list of exchange objects
+        :return: None
+        """
+        if settings.SHARED_QUOTES:
+            table = self._quote_table()
+            if table is not None and not table.is_current():
+                self._drop_quote_table()
+                table = self._quote_table()
+            if table is not None:
+                exchanges = self._read_shared_prices(table, exchanges)
+        if exchanges:
+            self._poll_prices(exchanges)
+
+    def _poll_prices(self, exchanges):
+        """
+        refreshes the prices of the given exchanges, an exchange which fails
+        to update is flagged with is_stale so it's left out of the spreads.
+
+        with CONCURRENT_PRICE_UPDATES every ticker request is issued at once
+        and the cycle waits at most PRICE_UPDATE_DEADLINE seconds for them,
+        requests still running after that are not waited for nor issued
+        again until they finish.
+        :param exchanges: list of exchange objects
+        :return: None
+        """
+        if not settings.CONCURRENT_PRICE_UPDATES:
+            for exchange in exchanges:
+                try:
+                    exchange.is_stale = exchange.update_prices() is False
+                except Exception as error:
                     logger.exception(str(error))
+                    exchange.is_stale = True
+            return
+
+        futures = {}
+        for exchange in exchanges:
+            future = self._pending_updates.get(exchange)
+            if future is None or future.done():
+                future = self._executor.submit(exchange.update_prices)
+                self._pending_updates[exchange] = future
+            futures[future] = exchange
+
+        done, not_done = wait(
+            futures.keys(), timeout=settings.PRICE_UPDATE_DEADLINE
+        )
+
+        for future in done:
+            exchange = futures[future]
+            del self._pending_updates[exchange]
+            error = future.exception()
+            if error is not None:
+                logger.error(f"Could not update prices of {exchange}: {error}")
+                exchange.is_stale = True
+            else:
+                exchange.is_stale = future.result() is False
+
+        for future in not_done:
+            exchange = futures[future]
+            logger.warning(
+                f"{exchange} missed the price update deadline of "
+                f"{settings.PRICE_UPDATE_DEADLINE}s, marking it as stale."
+            )
+            exchange.is_stale = True
+
+    def _calculate_spreads(self, exchanges=None):
+        """
+        updates the spreads of the exchanges whose quotes changed, only the
+        pairs involving those exchanges are recalculated.
+        :param exchanges: list of exchanges to update, all by default
+        :return: list of SpreadDetection
+
+        with SPREAD_ENGINE = "matrix" the spreads are calculated in batch
+        with numpy and only the best spread of each currency pair is kept.
+        """
+        if settings.SPREAD_ENGINE == "matrix":
+            if self._spread_matrix is None:
+                self._spread_matrix = SpreadMatrix(settings.EXCHANGES)
+            return self._spread_matrix.best_spreads()
+
+        if self._spread_engine is None:
+            self._spread_engine = IncrementalSpreadEngine(settings.EXCHANGES)
+
+        self._spread_engine.recalculated.clear()
+        for exchange in exchanges or settings.EXCHANGES:
+            try:
+                self._spread_engine.update(exchange)
             except Exception as error:
                 # General exception handling, we can get a better idea of what
                 # exceptions can occurr.
                 if config_settings.DEBUG:
                     logger.exception(str(error))
 
-        return spreads
+        return self._spread_engine.spread_list
 
     def _calculate_tri_spreads(self):
         tri_spreads = []
         for tri_exchange in settings.TRI_EXCHANGES:
+            if tri_exchange["exchange"].is_stale:
+                continue
             try:
                 for currenciesList in tri_exchange["currenciesList"]:
                     try:
@@ -131,3 +377,49 @@ class Monitor:
                     logger.exception(str(tri_exchange_error))
 
         return tri_spreads
+
+    def _discover_triangles(self):
+        """
+        builds the currency graph of every tri exchange from the markets
+        it lists and replaces its currenciesList with the triangles found.
+        exchanges without a markets method keep their list.
+        :return: None
+        """
+        for tri_exchange in settings.TRI_EXCHANGES:
+            exchange = tri_exchange["exchange"]
+            if not hasattr(exchange, "markets"):
+                continue
+            try:
+                graph = CurrencyGraph(exchange.markets())
+            except Exception as error:
+                logger.exception(str(error))
+                continue
+            self._tri_graphs[tri_exchange["name"]] = graph
+            tri_exchange["currenciesList"] = graph.triangles()
+            logger.info(
+                f"{tri_exchange['name']}: {len(graph.markets)} markets, "
+                f"{len(tri_exchange['currenciesList'])} triangles"
+            )
+
+    def _find_arbitrage_cycles(self):
+        """
+        updates the currency graphs with the last book of their exchange
+        and searches profitable cycles of any length in them.
+        :return: list of (exchange name, ArbitrageCycle) by profit
+        """
+        cycles = []
+        for tri_exchange in settings.TRI_EXCHANGES:
+            graph = self._tri_graphs.get(tri_exchange["name"])
+            exchange = tri_exchange["exchange"]
+            if graph is None or exchange.is_stale:
+                continue
+            graph.update_rates(exchange.book)
+            for cycle in graph.find_cycles(settings.TRI_CYCLE_MIN_LENGTH):
+                cycles.append((tri_exchange["name"], cycle))
+                logger.info(
+                    f"{tri_exchange['name']}: "
+                    f"{' -> '.join(cycle.currencies)} "
+                    f"via {', '.join(cycle.symbols)} "
+                    f"profit {cycle.profit:.4%}"
+                )
+        return sorted(cycles, key=lambda item: item[1].profit, reverse=True)
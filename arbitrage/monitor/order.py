@@ -1,8 +1,17 @@
+import logging
+import threading
+import time
+
 from enum import Enum
+from typing import Dict, Optional, Tuple
 
 from ccxt import Exchange
 
+logger = logging.getLogger(__name__)
+
 OrderId = str
+# order ids are only unique within their exchange
+OrderKey = Tuple[int, OrderId]
 
 
 class OrderState(Enum):
@@ -12,12 +21,174 @@ class OrderState(Enum):
 
 
 class Order:
-    def __init__(self, exchange: Exchange, order_id: OrderId, api_data: dict):
+    def __init__(
+        self, exchange: Exchange, order_id: OrderId, api_data: dict = None
+    ):
         self.exchange = exchange
         self.order_id = order_id
         self.state = OrderState.PENDING
-        self.api_data = api_data
+        self.api_data = api_data or {}
+
+    @property
+    def key(self) -> OrderKey:
+        return (id(self.exchange), self.order_id)
 
     def get_state(self):
-        self.state = self.exchange.get_order_state(self)
+        self.state = order_tracker.state(self)
         return self.state
+
+
+class OrderTracker:
+    """
+    cache of the state of the orders in flight.
+
+    states are kept for ttl seconds, when they expire every tracked order
+    of the same exchange is refreshed together: exchanges implementing
+    get_open_orders answer for all of them with one request and only the
+    orders that left the open list are queried one by one, to know if
+    they were executed or cancelled. exchanges without it are queried
+    per order.
+
+    with start the refresh runs in a background thread and reading a
+    state never waits for the network, push applies updates coming
+    from a feed right away. the OrderExecutor starts it with its loop.
+    """
+
+    def __init__(self, ttl: float = 1):
+        self.ttl = ttl
+        # order key -> order, only pending orders are tracked
+        self._orders: Dict[OrderKey, Order] = {}
+        self._updated_at: Dict[OrderKey, float] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, order: Order):
+        with self._lock:
+            self._orders[order.key] = order
+            # never refreshed, the next refresh includes it
+            self._updated_at.setdefault(order.key, float("-inf"))
+
+    def untrack(self, order: Order):
+        with self._lock:
+            self._orders.pop(order.key, None)
+            self._updated_at.pop(order.key, None)
+
+    def _set(self, order: Order, state: OrderState):
+        order.state = state
+        self._updated_at[order.key] = time.monotonic()
+        if state is not OrderState.PENDING:
+            # final states don't change anymore
+            self.untrack(order)
+
+    def push(self, exchange, order_id: OrderId, state: OrderState):
+        """
+        applies a state received from the exchange, e.g. by websocket
+        :param exchange: Exchange: the exchange of the order
+        :param order_id: str
+        :param state: OrderState
+        :return: None
+        """
+        with self._lock:
+            order = self._orders.get((id(exchange), order_id))
+            if order is not None:
+                self._set(order, state)
+
+    def state(self, order: Order) -> OrderState:
+        """
+        gets the state of the order, only final states are returned
+        without tracking the order.
+        :param order: Order
+        :return: OrderState
+        """
+        if order.state is not OrderState.PENDING:
+            return order.state
+        with self._lock:
+            if order.key not in self._orders:
+                self.track(order)
+            expired = time.monotonic() - self._updated_at[order.key] > self.ttl
+        if expired and not self.is_running:
+            self.refresh(order.exchange)
+        return order.state
+
+    def refresh(self, exchange):
+        """
+        refreshes the state of every tracked order of the exchange
+        :param exchange: Exchange
+        :return: None
+        """
+        with self._lock:
+            orders = [
+                order
+                for order in self._orders.values()
+                if order.exchange is exchange
+            ]
+        if not orders:
+            return
+
+        open_ids = None
+        if hasattr(exchange, "get_open_orders"):
+            try:
+                open_ids = exchange.get_open_orders()
+            except NotImplementedError:
+                pass
+            except Exception as error:
+                logger.warning(f"{exchange} open orders failed: {error}")
+                return
+
+        for order in orders:
+            if open_ids is not None and order.order_id in open_ids:
+                state = OrderState.PENDING
+            else:
+                try:
+                    state = exchange.get_order_state(order)
+                except Exception as error:
+                    logger.warning(f"{order.order_id} state failed: {error}")
+                    continue
+            with self._lock:
+                self._set(order, state or OrderState.PENDING)
+
+    def refresh_all(self):
+        with self._lock:
+            exchanges = {
+                id(order.exchange): order.exchange
+                for order in self._orders.values()
+            }
+        for exchange in exchanges.values():
+            self.refresh(exchange)
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: Optional[float] = None):
+        """
+        refreshes the tracked orders every interval seconds in a
+        background thread
+        :param interval: float, the ttl by default
+        :return: None
+        """
+        if self.is_running:
+            return
+        interval = interval or self.ttl
+        self._stop.clear()
+
+        def reconcile():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh_all()
+                except Exception as error:
+                    logger.exception(str(error))
+
+        self._thread = threading.Thread(
+            target=reconcile, name="order-tracker", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+order_tracker = OrderTracker()
@@ -0,0 +1,213 @@
+import logging
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+Quote = namedtuple("Quote", ["bid", "ask", "timestamp", "sequence"])
+
+MAGIC = b"QUOTES02"
+HEADER_DTYPE = np.dtype(
+    [
+        ("magic", "S8"),
+        ("slots", "<u8"),
+        # tells the tables of successive feeders apart
+        ("generation", "<u8"),
+        ("closed", "<u8"),
+    ]
+)
+KEY_SIZE = 64
+QUOTE_DTYPE = np.dtype(
+    [
+        ("sequence", "<u8"),
+        ("bid", "<f8"),
+        ("ask", "<f8"),
+        ("timestamp", "<f8"),
+    ]
+)
+
+
+def quote_key(exchange) -> str:
+    """
+    :param exchange: Exchange
+    :return: str: e.g. Gdax:BTC/USD
+    """
+    return f"{exchange.name}:{exchange.currency_pair.value}"
+
+
+class SharedQuoteTable:
+    """
+    latest bid/ask of every (exchange, currency pair) in shared memory,
+    written by a single feeder process (startmonitor feed_quotes) and read
+    by every monitor without locks, so N monitors on the same markets
+    cost one set of price requests instead of N.
+
+    layout: a header (magic, slots), the keys of the slots (KEY_SIZE
+    bytes each) and a record of QUOTE_DTYPE per slot. the readers take
+    the slots from the keys stored in the table, they don't need to know
+    its order.
+
+    every record is a seqlock: the writer makes the sequence odd, writes
+    the prices and makes it even again, a reader retries while the
+    sequence is odd or changed during its read, so it never sees a bid
+    and an ask of different updates.
+
+    a reader keeps its mapping when the feeder exits or is replaced by a
+    new one, is_current tells it to attach again.
+    """
+
+    def __init__(
+        self, name: str, keys: Optional[Iterable[str]] = None, create=False
+    ):
+        """
+        :param name: str: name of the shared memory block
+        :param keys: list of str: slots of the table, needed to create it
+        :param create: bool: create the table (the feeder) or attach to
+        an existing one (the readers), FileNotFoundError when there's none
+        """
+        self.name = name
+        self.created = create
+        if create:
+            keys = sorted(set(keys))
+            for key in keys:
+                if len(key.encode()) > KEY_SIZE:
+                    raise ValueError(f"{key} is longer than {KEY_SIZE} bytes.")
+            size = (
+                HEADER_DTYPE.itemsize
+                + len(keys) * KEY_SIZE
+                + len(keys) * QUOTE_DTYPE.itemsize
+            )
+            try:
+                self._memory = SharedMemory(name, create=True, size=size)
+            except FileExistsError:
+                # left by a feeder which didn't exit cleanly
+                stale = SharedMemory(name)
+                stale.close()
+                stale.unlink()
+                self._memory = SharedMemory(name, create=True, size=size)
+            self._map(len(keys))
+            self._header["magic"] = MAGIC
+            self._header["slots"] = len(keys)
+            self._header["generation"] = time.time_ns()
+            self._header["closed"] = 0
+            self._keys[:] = [key.encode() for key in keys]
+            self._records[:] = 0
+        else:
+            self._memory = self._attach(name)
+            header = np.ndarray(1, HEADER_DTYPE, self._memory.buf)[0]
+            if header["magic"] != MAGIC:
+                self._memory.close()
+                raise ValueError(f"{name} isn't a quote table.")
+            self._map(int(header["slots"]))
+
+        self.keys: List[str] = [key.decode() for key in self._keys]
+        self._slots = {key: slot for slot, key in enumerate(self.keys)}
+
+    @staticmethod
+    def _attach(name: str) -> SharedMemory:
+        memory = SharedMemory(name)
+        # the tracker of python < 3.13 would unlink the block when a
+        # reader exits, only the feeder owns it
+        resource_tracker.unregister(memory._name, "shared_memory")
+        return memory
+
+    @property
+    def generation(self) -> int:
+        return int(self._header["generation"])
+
+    def is_current(self) -> bool:
+        """
+        :return: bool: False once the feeder of this table closed it or
+        another feeder created a new table under its name
+        """
+        if self._header["closed"]:
+            return False
+        try:
+            memory = self._attach(self.name)
+        except FileNotFoundError:
+            return False
+        try:
+            # a copy, the block can't be closed while a view exists
+            header = np.frombuffer(
+                bytes(memory.buf[: HEADER_DTYPE.itemsize]), HEADER_DTYPE
+            )[0]
+        finally:
+            memory.close()
+        return header["magic"] == MAGIC and int(
+            header["generation"]
+        ) == self.generation
+
+    def _map(self, slots: int):
+        buffer = self._memory.buf
+        offset = HEADER_DTYPE.itemsize
+        self._header = np.ndarray(1, HEADER_DTYPE, buffer)[0]
+        self._keys = np.ndarray(slots, f"S{KEY_SIZE}", buffer, offset)
+        offset += slots * KEY_SIZE
+        self._records = np.ndarray(slots, QUOTE_DTYPE, buffer, offset)
+        self._sequence = self._records["sequence"]
+        self._bid = self._records["bid"]
+        self._ask = self._records["ask"]
+        self._timestamp = self._records["timestamp"]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._slots
+
+    def write(self, key: str, bid: float, ask: float, timestamp=None):
+        """
+        only one process may write to the table
+        :param key: str: see quote_key
+        :param bid: float
+        :param ask: float
+        :param timestamp: float: time of the prices, now by default
+        :return: None
+        """
+        slot = self._slots[key]
+        self._sequence[slot] += 1
+        self._bid[slot] = bid
+        self._ask[slot] = ask
+        self._timestamp[slot] = (
+            time.time() if timestamp is None else timestamp
+        )
+        self._sequence[slot] += 1
+
+    def read(self, key: str) -> Optional[Quote]:
+        """
+        :param key: str: see quote_key
+        :return: Quote, None if the slot was never written
+        """
+        slot = self._slots[key]
+        while True:
+            sequence = int(self._sequence[slot])
+            if sequence & 1:
+                # the writer is in the middle of an update
+                time.sleep(0)
+                continue
+            quote = Quote(
+                float(self._bid[slot]),
+                float(self._ask[slot]),
+                float(self._timestamp[slot]),
+                sequence,
+            )
+            if int(self._sequence[slot]) == sequence:
+                return quote if sequence else None
+
+    def close(self):
+        if self._header is None:
+            return
+        if self.created:
+            # the readers still mapping it stop using it
+            self._header["closed"] = 1
+        # the arrays are views of the block, they must go first
+        self._header = self._keys = self._records = None
+        self._sequence = self._bid = self._ask = self._timestamp = None
+        self._memory.close()
+
+    def unlink(self):
+        self._memory.unlink()
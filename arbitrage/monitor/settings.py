@@ -1,14 +1,23 @@
+"""
+settings of the monitors.
+
+EXCHANGES, TRI_EXCHANGES, MARKET_BUS and UPDATE_ACTIONS are built on
+their first use (see __getattr__), not on import: the exchange adapters
+open connections and some of them call their api when they're built
+(binance pings it), and this module is imported by everything using the
+spread detection, the web processes included. the adapters are declared
+with ExchangeSpec and shared by every spec with the same arguments.
+"""
 import logging
+import threading
 
 from django.conf import settings
 
 from arbitrage.monitor.currency import CurrencyPair
-from arbitrage.monitor.exchange.binance import Binance
-from arbitrage.monitor.exchange.bitfinex import Bitfinex
-from arbitrage.monitor.exchange.bitstamp import Bitstamp
-from arbitrage.monitor.exchange.gdax import Gdax
-from arbitrage.monitor.update.db_commit import SpreadHistoryToDB
-from arbitrage.monitor.update.csv_writer import AbstractSpreadToCSV
+from arbitrage.monitor.exchange.registry import ExchangeSpec
+
+
+logger = logging.getLogger(__name__)
 
 
 BINANCE_API_KEY = settings.BINANCE_API_KEY
@@ -18,12 +27,12 @@ GDAX_SECRET = settings.GDAX_SECRET
 GDAX_PASSPHRASE = settings.GDAX_PASSPHRASE
 
 
-EXCHANGES = [
-    Bitfinex(CurrencyPair.BTC_USD),
-    Bitstamp(CurrencyPair.BTC_USD),
-    Bitstamp(CurrencyPair.ETH_USD),
-    Gdax(CurrencyPair.BTC_USD),
-    Gdax(CurrencyPair.ETH_USD),
+EXCHANGE_SPECS = [
+    ExchangeSpec("bitfinex.Bitfinex", CurrencyPair.BTC_USD),
+    ExchangeSpec("bitstamp.Bitstamp", CurrencyPair.BTC_USD),
+    ExchangeSpec("bitstamp.Bitstamp", CurrencyPair.ETH_USD),
+    ExchangeSpec("gdax.Gdax", CurrencyPair.BTC_USD),
+    ExchangeSpec("gdax.Gdax", CurrencyPair.ETH_USD),
 ]
 
 TRI_CURRENCY_LIST = [
@@ -34,20 +43,99 @@ TRI_CURRENCY_LIST = [
     ["BNBBTC", "AVAXBNB", "AVAXBTC"],
 ]
 
-TRI_EXCHANGES = [
+TRI_EXCHANGE_SPECS = [
     {
         "name": "Binance",
-        "exchange": Binance(),
+        "exchange": ExchangeSpec(
+            "binance.Binance", key=BINANCE_API_KEY, secret=BINANCE_SEC_KEY
+        ),
         "currenciesList": TRI_CURRENCY_LIST,
     }
 ]
 
 
-UPDATE_ACTIONS = [SpreadHistoryToDB()]
+def _exchanges():
+    return [spec.get() for spec in EXCHANGE_SPECS]
+
+
+def _tri_exchanges():
+    return [
+        dict(tri_exchange, exchange=tri_exchange["exchange"].get())
+        for tri_exchange in TRI_EXCHANGE_SPECS
+    ]
+
+
+def _market_bus():
+    from arbitrage.bus import UnixBus
+
+    return UnixBus(settings.MARKET_BUS_DIR, name="monitor")
+
+
+# SpreadHistoryToColumnar("history") keeps the spreads in binary columns
+# readable with ColumnarSpreadStore, which can also export them to csv.
+# SpreadBroadcast pushes every batch to the live stream of the web workers,
+# SpreadsToBus also publishes the quotes used, for the live views.
+def _update_actions():
+    from arbitrage.monitor.update.bus import SpreadsToBus
+    from arbitrage.monitor.update.db_commit import BulkSpreadHistoryToDB
+
+    return [BulkSpreadHistoryToDB(), SpreadsToBus(__getattr__("MARKET_BUS"))]
+
+
+_LAZY_SETTINGS = {
+    "EXCHANGES": _exchanges,
+    "TRI_EXCHANGES": _tri_exchanges,
+    "MARKET_BUS": _market_bus,
+    "UPDATE_ACTIONS": _update_actions,
+}
+_lazy_lock = threading.RLock()
+
+
+def __getattr__(name):
+    """
+    builds the lazy settings on their first use, then they're plain
+    attributes of the module
+    """
+    if name not in _LAZY_SETTINGS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lazy_lock:
+        if name not in globals():
+            globals()[name] = _LAZY_SETTINGS[name]()
+        return globals()[name]
 
 
 UPDATE_INTERVAL = 5  # seconds
 
+# Refresh every exchange at once instead of one after the other, exchanges
+# that do not answer before the deadline are marked as stale for the cycle.
+CONCURRENT_PRICE_UPDATES = True
+PRICE_UPDATE_DEADLINE = 3  # seconds
+PRICE_UPDATE_WORKERS = 16
+
+# With SHARED_QUOTES the monitors read the prices of EXCHANGES from the
+# shared memory table written by a single "startmonitor feed_quotes"
+# process instead of polling the exchanges each, quotes older than
+# SHARED_QUOTES_MAX_AGE seconds mark their exchange as stale.
+SHARED_QUOTES = False
+SHARED_QUOTES_NAME = "arbitrader_quotes"
+SHARED_QUOTES_MAX_AGE = 3 * UPDATE_INTERVAL
+
+# Streaming monitor (start_stream), feed urls can be overridden per exchange
+# name, e.g. to point them to a local ReplayServer.
+STREAM_FEED_URLS = {}
+STREAM_BOOK_DEPTH = 25
+
+# "incremental" keeps every spread between exchanges of the same currency pair,
+# "matrix" calculates them in batch with numpy and keeps only the best spread
+# of each currency pair, meant for large sets of exchanges.
+SPREAD_ENGINE = "incremental"
+
+# Build the currency graph of every tri exchange from its markets, replaces
+# the currenciesList with every triangle found and searches profitable
+# cycles of any length on each update.
+TRI_AUTO_DISCOVERY = False
+TRI_CYCLE_MIN_LENGTH = 3
+
 TIME_BETWEEN_NOTIFICATIONS = 5 * 60  # Only send a notification every 5 minutes
 
 MINIMUM_SPREAD_TRADING = 200
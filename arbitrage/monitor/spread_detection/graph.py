@@ -0,0 +1,203 @@
+import logging
+import math
+from collections import deque, namedtuple
+from typing import Dict, Iterable, List, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+ArbitrageCycle = namedtuple(
+    "ArbitrageCycle", ["currencies", "symbols", "profit"]
+)
+
+
+class CurrencyGraph:
+    """
+    Graph of currencies where every market adds two edges:
+
+    - base -> quote, selling the base at the bid, weight -log(bid)
+    - quote -> base, buying the base at the ask, weight log(ask)
+
+    A cycle with negative total weight multiplies the starting amount
+    by more than 1, so profitable paths of any length are found with a
+    Bellman-Ford/SPFA negative cycle search.
+
+    The distances of the last search are kept, when it didn't find any
+    cycle every edge satisfies them, so after a rates update only the
+    edges whose weight changed can be violated and the next search only
+    starts from their tails instead of from every currency.
+    """
+
+    def __init__(self, markets: Iterable[dict]):
+        """
+        :param markets: dicts with the symbol (exchange id), base and quote
+        of every market, e.g. {"symbol": "ADABTC", "base": "ADA",
+        "quote": "BTC"}
+        """
+        self.markets: Dict[str, Tuple[str, str]] = {
+            market["symbol"]: (market["base"], market["quote"])
+            for market in markets
+        }
+        self.currencies = sorted(
+            {currency for pair in self.markets.values() for currency in pair}
+        )
+        # (symbol, side) -> [tail, head, weight, symbol]
+        self.edges: Dict[Tuple[str, str], list] = {}
+        self.adjacency: Dict[str, List[list]] = {
+            currency: [] for currency in self.currencies
+        }
+        self.distance = {currency: 0.0 for currency in self.currencies}
+        self.predecessor = {}
+        self._changed = set(self.currencies)
+        self._converged = False
+
+    @classmethod
+    def from_ccxt_markets(cls, markets: Iterable[dict]):
+        """
+        builds the graph from the markets of ccxt load_markets/fetch_markets,
+        the exchange id of the market is used as symbol.
+        :param markets: list of dict
+        :return: CurrencyGraph
+        """
+        return cls(
+            {
+                "symbol": market["id"],
+                "base": market["base"],
+                "quote": market["quote"],
+            }
+            for market in markets
+            if market.get("active", True) is not False
+        )
+
+    def _set_weight(self, symbol: str, side: str, tail, head, weight):
+        edge = self.edges.get((symbol, side))
+        if edge is None:
+            edge = [tail, head, weight, symbol]
+            self.edges[(symbol, side)] = edge
+            self.adjacency[tail].append(edge)
+            self._changed.add(tail)
+        elif edge[2] != weight:
+            edge[2] = weight
+            self._changed.add(tail)
+
+    def update_rates(self, book: Dict[str, Tuple[float, float]]):
+        """
+        updates the weights of the edges with the current prices
+        :param book: dict symbol -> (bid, ask)
+        :return: None
+        """
+        for symbol, (bid, ask) in book.items():
+            if symbol not in self.markets or not bid or not ask:
+                continue
+            base, quote = self.markets[symbol]
+            self._set_weight(symbol, "bid", base, quote, -math.log(bid))
+            self._set_weight(symbol, "ask", quote, base, math.log(ask))
+
+    def find_cycles(self, min_length: int = 3) -> List[ArbitrageCycle]:
+        """
+        searches negative cycles, i.e. profitable paths, in the graph
+        :param min_length: int: minimum number of trades of a cycle
+        :return: list of ArbitrageCycle sorted by profit
+        """
+        if not self._converged:
+            self.distance = {currency: 0.0 for currency in self.currencies}
+            self.predecessor = {}
+            queue = deque(self.currencies)
+        else:
+            queue = deque(self._changed)
+        self._changed = set()
+
+        limit = len(self.currencies)
+        length = {currency: 0 for currency in self.currencies}
+        queued = set(queue)
+        found = None
+
+        while queue and found is None:
+            tail = queue.popleft()
+            queued.discard(tail)
+            for _, head, weight, symbol in self.adjacency[tail]:
+                candidate = self.distance[tail] + weight
+                if candidate >= self.distance[head] - 1e-12:
+                    continue
+                self.distance[head] = candidate
+                self.predecessor[head] = (tail, symbol, weight)
+                length[head] = length[tail] + 1
+                if length[head] >= limit:
+                    found = head
+                    break
+                if head not in queued:
+                    queued.add(head)
+                    queue.append(head)
+
+        self._converged = found is None
+        if found is None:
+            return []
+
+        cycles = [
+            cycle
+            for cycle in self._predecessor_cycles()
+            if len(cycle.symbols) >= min_length
+        ]
+        return sorted(cycles, key=lambda cycle: cycle.profit, reverse=True)
+
+    def _predecessor_cycles(self) -> List[ArbitrageCycle]:
+        """
+        every currency has a single predecessor so each cycle of the
+        predecessor graph is found by walking it once.
+        :return: list of ArbitrageCycle
+        """
+        cycles = []
+        visited = set()
+        for start in self.predecessor:
+            path = {}
+            node = start
+            while node in self.predecessor and node not in visited:
+                if node in path:
+                    cycles.append(self._build_cycle(node))
+                    break
+                path[node] = True
+                node = self.predecessor[node][0]
+            visited.update(path)
+        return [cycle for cycle in cycles if cycle.profit > 0]
+
+    def _build_cycle(self, node) -> ArbitrageCycle:
+        currencies = [node]
+        symbols = []
+        weight = 0.0
+        current = node
+        while True:
+            tail, symbol, edge_weight = self.predecessor[current]
+            symbols.append(symbol)
+            weight += edge_weight
+            if tail == node:
+                break
+            currencies.append(tail)
+            current = tail
+        # walked backwards, symbols[i] trades currencies[i] into the next one
+        currencies = [node] + currencies[:0:-1]
+        symbols.reverse()
+        return ArbitrageCycle(
+            currencies=currencies,
+            symbols=symbols,
+            profit=math.exp(-weight) - 1,
+        )
+
+    def triangles(self) -> List[List[str]]:
+        """
+        lists every triangle of markets in the format of
+        TRI_CURRENCY_LIST: [XY, ZX, ZY], e.g. [BNBBTC, ADABNB, ADABTC]
+        :return: list of lists of symbols
+        """
+        by_pair = {pair: symbol for symbol, pair in self.markets.items()}
+        by_quote = {}
+        for symbol, (base, quote) in self.markets.items():
+            by_quote.setdefault(quote, []).append(base)
+
+        triangles = []
+        for symbol_xy, (x, y) in self.markets.items():
+            for z in by_quote.get(x, []):
+                symbol_zy = by_pair.get((z, y))
+                if symbol_zy is not None:
+                    triangles.append([symbol_xy, by_pair[(z, x)], symbol_zy])
+        return triangles
@@ -0,0 +1,131 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from arbitrage.monitor.currency import CurrencyPair
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.spread_detection.exchange import (
+    SpreadDetection,
+    SpreadMissingPriceError,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalSpreadEngine:
+    """
+    Keeps the spreads between exchanges up to date one quote at a time.
+
+    Exchanges are grouped by currency pair up front so pairs with
+    different currencies are never compared, and when the quote of an
+    exchange moves only the spreads involving that exchange are
+    recalculated. A best buy (lowest ask) and best sell (highest bid)
+    index is kept per currency pair.
+    """
+
+    def __init__(self, exchanges: List[Exchange]):
+        self.groups: Dict[CurrencyPair, List[Exchange]] = {}
+        for exchange in exchanges:
+            self.groups.setdefault(exchange.currency_pair, []).append(
+                exchange
+            )
+        self.spreads: Dict[Tuple[Exchange, Exchange], SpreadDetection] = {}
+        self.best_buy: Dict[CurrencyPair, Exchange] = {}
+        self.best_sell: Dict[CurrencyPair, Exchange] = {}
+        # spreads calculated again since it was last cleared
+        self.recalculated: Dict[
+            Tuple[Exchange, Exchange], SpreadDetection
+        ] = {}
+        self._quotes: Dict[Exchange, Tuple[float, float]] = {}
+
+    @property
+    def spread_list(self) -> List[SpreadDetection]:
+        return list(self.spreads.values())
+
+    def update(self, exchange: Exchange) -> bool:
+        """
+        recalculates the spreads of the exchange if its quote moved
+        :param exchange: Exchange object
+        :return: bool: true if the spreads of the exchange changed
+        """
+        if exchange.is_stale:
+            return self.remove(exchange)
+
+        quote = (exchange.last_bid_price, exchange.last_ask_price)
+        if None in quote:
+            return self.remove(exchange)
+        if self._quotes.get(exchange) == quote:
+            return False
+        self._quotes[exchange] = quote
+
+        group = self.groups[exchange.currency_pair]
+        for other in group:
+            if other is exchange or other not in self._quotes:
+                continue
+            # keep the same orientation the exchanges were given in
+            key = (
+                (exchange, other)
+                if group.index(exchange) < group.index(other)
+                else (other, exchange)
+            )
+            try:
+                self.spreads[key] = SpreadDetection(
+                    exchange_one=key[0], exchange_two=key[1]
+                )
+                self.recalculated[key] = self.spreads[key]
+            except SpreadMissingPriceError:
+                self.spreads.pop(key, None)
+                self.recalculated.pop(key, None)
+
+        self._update_index(exchange.currency_pair)
+        return True
+
+    def remove(self, exchange: Exchange) -> bool:
+        """
+        drops the quote and every spread of the exchange,
+        used when its prices are not reliable anymore.
+        :param exchange: Exchange object
+        :return: bool: true if there was something to remove
+        """
+        if self._quotes.pop(exchange, None) is None:
+            return False
+        for key in [key for key in self.spreads if exchange in key]:
+            del self.spreads[key]
+            self.recalculated.pop(key, None)
+        self._update_index(exchange.currency_pair)
+        return True
+
+    def _update_index(self, currency_pair: CurrencyPair):
+        """
+        refreshes the best buy and sell exchanges of the currency pair
+        :param currency_pair: CurrencyPair
+        :return: None
+        """
+        quoted = [
+            exchange
+            for exchange in self.groups[currency_pair]
+            if exchange in self._quotes
+        ]
+        if not quoted:
+            self.best_buy.pop(currency_pair, None)
+            self.best_sell.pop(currency_pair, None)
+            return
+        self.best_buy[currency_pair] = min(
+            quoted, key=lambda exchange: self._quotes[exchange][1]
+        )
+        self.best_sell[currency_pair] = max(
+            quoted, key=lambda exchange: self._quotes[exchange][0]
+        )
+
+    def best_spread(self, currency_pair: CurrencyPair) -> Optional[float]:
+        """
+        spread between the best sell and the best buy of the currency pair
+        :param currency_pair: CurrencyPair
+        :return: float
+        """
+        if currency_pair not in self.best_buy:
+            return None
+        return (
+            self._quotes[self.best_sell[currency_pair]][0]
+            - self._quotes[self.best_buy[currency_pair]][1]
+        )
@@ -0,0 +1,139 @@
+import logging
+from typing import List
+
+import numpy as np
+
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.spread_detection import SpreadABC
+
+
+logger = logging.getLogger(__name__)
+
+
+class MatrixSpread(SpreadABC):
+    """
+    Spread found by SpreadMatrix, the value is already calculated
+    so it only exposes it through the SpreadABC interface.
+    """
+
+    def __init__(
+        self, exchange_buy: Exchange, exchange_sell: Exchange, spread: float
+    ):
+        self.exchange_buy = exchange_buy
+        self.exchange_sell = exchange_sell
+        self.spread = spread
+
+    @property
+    def summary(self):
+        return (
+            f"{self.exchange_buy} [{self.exchange_buy.last_ask_price}] -> "
+            f"{self.exchange_sell} [{self.exchange_sell.last_bid_price}] -> "
+            f"Spread: {self.spread_with_currency}"
+        )
+
+    @property
+    def spread_with_currency(self):
+        return f"{self.spread} {self.exchange_buy.currency_pair.fiat_symbol}"
+
+    @property
+    def spread_percentage(self):
+        return self.spread / self.exchange_buy.last_bid_price
+
+    def _calculate_spread(self):
+        return self.spread
+
+
+class SpreadMatrix:
+    """
+    Batch spread calculator for large sets of exchanges.
+
+    Bids and asks live in contiguous arrays laid out as
+    (currency pair, exchange slot), so the bid - ask matrix of every
+    currency pair and its argmax are computed in one vectorized pass
+    instead of building a SpreadDetection per pair of exchanges.
+    Spreads are kept as floats, nothing is truncated. Spread.spread is an
+    IntegerField, the db update actions round them when they're saved.
+    """
+
+    def __init__(self, exchanges: List[Exchange]):
+        groups = {}
+        for exchange in exchanges:
+            groups.setdefault(exchange.currency_pair, []).append(exchange)
+
+        self.currency_pairs = list(groups)
+        width = max((len(group) for group in groups.values()), default=0)
+        # exchange objects laid out like the price arrays, None is padding
+        self.slots = np.full((len(groups), width), None, dtype=object)
+        for row, group in enumerate(groups.values()):
+            self.slots[row, : len(group)] = group
+
+        # the exchanges in the order of their flat index in the arrays
+        self._occupied = np.flatnonzero(
+            [exchange is not None for exchange in self.slots.flat]
+        )
+        self._exchanges = list(self.slots.flat[self._occupied])
+        self.bids = np.full(self.slots.shape, np.nan)
+        self.asks = np.full(self.slots.shape, np.nan)
+        self._diagonal = np.eye(width, dtype=bool)
+
+    def load(self):
+        """
+        copies the last prices of the exchanges into the arrays,
+        stale exchanges and missing prices are left as nan.
+        :return: None
+        """
+        # None becomes nan
+        bids = np.array(
+            [exchange.last_bid_price for exchange in self._exchanges],
+            dtype=float,
+        )
+        asks = np.array(
+            [exchange.last_ask_price for exchange in self._exchanges],
+            dtype=float,
+        )
+        stale = np.array(
+            [exchange.is_stale for exchange in self._exchanges], dtype=bool
+        )
+        bids[stale] = asks[stale] = np.nan
+        self.bids.flat[self._occupied] = bids
+        self.asks.flat[self._occupied] = asks
+
+    def matrix(self) -> np.ndarray:
+        """
+        spread of selling in exchange i and buying in exchange j for every
+        currency pair, shape (currency pairs, exchanges, exchanges)
+        :return: np.ndarray, -inf where there's no valid spread
+        """
+        matrix = self.bids[:, :, None] - self.asks[:, None, :]
+        matrix[:, self._diagonal] = -np.inf
+        matrix[np.isnan(matrix)] = -np.inf
+        return matrix
+
+    def best_spreads(self) -> List[MatrixSpread]:
+        """
+        loads the current prices and returns the best spread
+        of every currency pair
+        :return: list of MatrixSpread
+        """
+        if not self.currency_pairs:
+            return []
+        self.load()
+        matrix = self.matrix()
+        width = matrix.shape[-1]
+        flat = matrix.reshape(len(self.currency_pairs), -1)
+        best = flat.argmax(axis=1)
+        values = flat[np.arange(len(best)), best]
+
+        spreads = []
+        for row, (cell, value) in enumerate(zip(best, values)):
+            if not np.isfinite(value):
+                continue
+            sell, buy = divmod(int(cell), width)
+            spreads.append(
+                MatrixSpread(
+                    exchange_buy=self.slots[row, buy],
+                    exchange_sell=self.slots[row, sell],
+                    spread=float(value),
+                )
+            )
+        return spreads
@@ -21,6 +21,8 @@ class TriSpreadDetector(SpreadABC):
     def __init__(self, exchange: Exchange, currenciesList: list):
         self.exchange = exchange
         self.currenciesList = currenciesList
+        # symbol -> (bid, ask) used to calculate the spread
+        self.prices = {}
         self.spread = self._calculate_spread()
 
     @property
@@ -35,38 +37,42 @@ class TriSpreadDetector(SpreadABC):
     def spread_percentage(self):
         return self.spread
 
-    def _calculate_spread(self):
-
-        exch_rate_list = []
-        client = self.exchange.client
-        sym = self.currenciesList[0]
+    def _price(self, symbol: str, side: str) -> float:
+        """
+        reads the best price of the symbol from the bulk snapshot
+        the exchange took on its last update
+        :param symbol: str
+        :param side: str: bid or ask
+        :return: float
+        """
+        try:
+            bid, ask = self.exchange.book[symbol]
+        except KeyError:
+            raise TriSpreadMissingPriceError(
+                f"There's no price for {symbol} in the last snapshot."
+            ) from None
+        self.prices[symbol] = (bid, ask)
+        price = bid if side == "bid" else ask
+        if not price:
+            raise TriSpreadMissingPriceError(
+                f"The {side} price of {symbol} is missing."
+            )
+        return price
 
-        # record of buy and sell orders for given symbol
-        depth = client.get_order_book(symbol=sym)
+    def _calculate_spread(self):
+        """
+        all three prices come from the snapshot of the exchange so
+        calculating a triangle doesn't make any request.
+        """
+        self.prices = {}
 
         # price one
-        price1 = float(depth["bids"][0][0])
-        exch_rate_list.append(price1)
-
+        rate1 = self._price(self.currenciesList[0], "bid")
         # price two
-        try:
-            sym = self.currenciesList[1]
-            depth = client.get_order_book(symbol=sym)
-            price2 = float(depth["asks"][0][0])
-            price2 = 1 / price2
-            exch_rate_list.append(price2)
-        except Exception as error:
-            logger.exception(str(error))
-            price2 = 0.000000001
-            exch_rate_list.append(price2)
-
+        price2 = 1 / self._price(self.currenciesList[1], "ask")
         # price three
-        sym = self.currenciesList[2]
-        depth = client.get_order_book(symbol=sym)
-        price3 = float(depth["bids"][0][0])
-        exch_rate_list.append(price3)
+        price3 = self._price(self.currenciesList[2], "bid")
 
-        rate1 = exch_rate_list[0]
         rate2 = price3 * price2
 
         if float(rate1) < float(rate2):
@@ -0,0 +1,86 @@
+import time
+from typing import Iterable, Optional, Tuple
+
+
+PriceLevel = Tuple[float, float]  # (price, size)
+
+
+class OrderBook:
+    """
+    local copy of the order book of one currency pair in one exchange,
+    kept up to date with the messages coming from the streaming feed.
+
+    a level with size 0 removes the price from its side, only the best
+    `depth` levels of each side are kept.
+    """
+
+    def __init__(self, depth: int = 25):
+        self.depth = depth
+        self.bids = {}
+        self.asks = {}
+        self.sequence = 0
+        self.timestamp: Optional[float] = None
+
+    @property
+    def best_bid(self) -> Optional[float]:
+        return max(self.bids) if self.bids else None
+
+    @property
+    def best_ask(self) -> Optional[float]:
+        return min(self.asks) if self.asks else None
+
+    def top(self, levels: Optional[int] = None):
+        """
+        returns the sorted levels of both sides of the book
+        :param levels: int: number of levels per side, all of them by default
+        :return: tuple: (bids, asks) list of (price, size)
+        """
+        bids = sorted(self.bids.items(), reverse=True)[:levels]
+        asks = sorted(self.asks.items())[:levels]
+        return bids, asks
+
+    def apply(
+        self,
+        bids: Iterable[PriceLevel],
+        asks: Iterable[PriceLevel],
+        snapshot: bool = False,
+    ) -> bool:
+        """
+        applies a snapshot or a delta to the book
+        :param bids: list of (price, size)
+        :param asks: list of (price, size)
+        :param snapshot: bool: replaces the whole book when true
+        :return: bool: true if the best bid or ask changed
+        """
+        best = (self.best_bid, self.best_ask)
+        if snapshot:
+            self.bids = {}
+            self.asks = {}
+
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            for price, size in levels:
+                price, size = float(price), float(size)
+                if size == 0:
+                    side.pop(price, None)
+                else:
+                    side[price] = size
+
+        self._trim()
+        self.sequence += 1
+        self.timestamp = time.time()
+        return best != (self.best_bid, self.best_ask)
+
+    def _trim(self):
+        """
+        drops the levels beyond the configured depth
+        :return: None
+        """
+        if len(self.bids) > self.depth:
+            self.bids = dict(
+                sorted(self.bids.items(), reverse=True)[: self.depth]
+            )
+        if len(self.asks) > self.depth:
+            self.asks = dict(sorted(self.asks.items())[: self.depth])
+
+    def __str__(self):
+        return f"OrderBook [{self.best_bid} / {self.best_ask}]"
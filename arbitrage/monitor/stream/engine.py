@@ -0,0 +1,170 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.stream.book import OrderBook
+from arbitrage.monitor.stream.feeds import FEEDS, StreamFeed
+
+
+logger = logging.getLogger(__name__)
+
+
+class StreamEngine:
+    """
+    push based market data engine.
+
+    it keeps one connection per exchange feed and a live OrderBook per
+    (exchange, currency pair), the best bid and ask of every book are
+    written in place into last_bid_price/last_ask_price of the exchange
+    objects and the listeners are called with the exchange every time
+    the top of its book moves.
+
+    listeners run in the engine thread so they must not block, hand the
+    work over to another thread (e.g. through a queue) instead.
+    """
+
+    def __init__(
+        self,
+        exchanges: List[Exchange],
+        urls: Optional[Dict[str, str]] = None,
+        depth: int = 25,
+        reconnect_delay: float = 1,
+    ):
+        urls = urls or {}
+        grouped = {}
+        for exchange in exchanges:
+            grouped.setdefault(exchange.name, []).append(exchange)
+
+        self.feeds: List[StreamFeed] = []
+        for name, group in grouped.items():
+            if name not in FEEDS:
+                logger.warning(f"There's no streaming feed for {name}.")
+                continue
+            self.feeds.append(FEEDS[name](group, url=urls.get(name)))
+
+        self.books = {
+            (exchange.name, exchange.currency_pair): OrderBook(depth=depth)
+            for feed in self.feeds
+            for exchange in feed.exchanges.values()
+        }
+        self.reconnect_delay = reconnect_delay
+        self._listeners: List[Callable[[Exchange], None]] = []
+        self._loop = None
+        self._thread = None
+        self._task = None
+
+    def add_listener(self, listener: Callable[[Exchange], None]):
+        """
+        registers a callable that receives the exchange whose
+        best bid or ask just changed
+        :param listener: callable
+        :return: None
+        """
+        self._listeners.append(listener)
+
+    def book(self, exchange: Exchange) -> OrderBook:
+        return self.books[(exchange.name, exchange.currency_pair)]
+
+    def handle_message(self, feed: StreamFeed, message):
+        """
+        applies a decoded message of the feed to the books
+        :param feed: StreamFeed
+        :param message: dict or list
+        :return: None
+        """
+        for update in feed.parse(message):
+            exchange = feed.exchanges[update.currency_pair]
+            book = self.book(exchange)
+            changed = book.apply(
+                update.bids, update.asks, snapshot=update.snapshot
+            )
+            exchange.last_bid_price = book.best_bid
+            exchange.last_ask_price = book.best_ask
+            exchange.is_stale = False
+            if changed:
+                self._notify(exchange)
+
+    def _notify(self, exchange: Exchange):
+        for listener in self._listeners:
+            try:
+                listener(exchange)
+            except Exception as error:
+                logger.exception(str(error))
+
+    async def _run_feed(self, session: aiohttp.ClientSession, feed):
+        """
+        keeps the feed connected, reconnecting after any error
+        :param session: aiohttp.ClientSession
+        :param feed: StreamFeed
+        :return: None
+        """
+        while True:
+            try:
+                async with session.ws_connect(feed.url, heartbeat=30) as ws:
+                    logger.info(f"Connected to {feed}")
+                    for message in feed.subscribe_messages():
+                        await ws.send_json(message)
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            self.handle_message(feed, json.loads(msg.data))
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.error(f"{feed} disconnected: {error}")
+
+            # prices are not live anymore until the feed reconnects
+            for exchange in feed.exchanges.values():
+                exchange.is_stale = True
+                self._notify(exchange)
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def run(self):
+        """
+        runs every feed until cancelled
+        :return: None
+        """
+        async with aiohttp.ClientSession() as session:
+            await asyncio.gather(
+                *[self._run_feed(session, feed) for feed in self.feeds]
+            )
+
+    def _run_in_thread(self):
+        asyncio.set_event_loop(self._loop)
+        self._task = self._loop.create_task(self.run())
+        try:
+            self._loop.run_until_complete(self._task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._loop.close()
+
+    def start(self):
+        """
+        starts the engine in a background thread
+        :return: None
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_in_thread, name="stream-engine", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        closes every connection and stops the engine thread
+        :return: None
+        """
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(
+            lambda: self._task is not None and self._task.cancel()
+        )
+        self._thread.join(timeout)
+        self._thread = None
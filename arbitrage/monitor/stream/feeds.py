@@ -0,0 +1,169 @@
+import logging
+from collections import namedtuple
+from typing import Iterable, List, Optional
+
+from arbitrage.monitor.exchange import Exchange
+
+
+logger = logging.getLogger(__name__)
+
+
+BookUpdate = namedtuple(
+    "BookUpdate", ["currency_pair", "bids", "asks", "snapshot"]
+)
+
+
+class StreamFeed:
+    """
+    Base class for the streaming market data feed of an exchange.
+
+    A feed knows how to subscribe to the order book or ticker channels
+    of the currency pairs of its exchanges and how to turn every message
+    received into BookUpdate tuples.
+    """
+
+    url = None
+
+    def __init__(self, exchanges: List[Exchange], url: Optional[str] = None):
+        self.exchanges = {
+            exchange.currency_pair: exchange for exchange in exchanges
+        }
+        self.symbols = {
+            exchange.currency_pair_api_representation[
+                exchange.currency_pair
+            ]: exchange.currency_pair
+            for exchange in exchanges
+        }
+        if url is not None:
+            self.url = url
+
+    @property
+    def name(self):
+        return next(iter(self.exchanges.values())).name
+
+    def subscribe_messages(self) -> List[dict]:
+        raise NotImplementedError
+
+    def parse(self, message) -> Iterable[BookUpdate]:
+        raise NotImplementedError
+
+    def __str__(self):
+        return f"{self.name} feed ({self.url})"
+
+
+class BitstampFeed(StreamFeed):
+    """
+    order book channel, every message is a snapshot of the top levels.
+    """
+
+    url = "wss://ws.bitstamp.net"
+
+    def subscribe_messages(self):
+        return [
+            {
+                "event": "bts:subscribe",
+                "data": {"channel": f"order_book_{symbol}"},
+            }
+            for symbol in self.symbols
+        ]
+
+    def parse(self, message):
+        if not isinstance(message, dict) or message.get("event") != "data":
+            return []
+        symbol = message.get("channel", "").replace("order_book_", "")
+        if symbol not in self.symbols:
+            return []
+        data = message["data"]
+        return [
+            BookUpdate(
+                currency_pair=self.symbols[symbol],
+                bids=data.get("bids", []),
+                asks=data.get("asks", []),
+                snapshot=True,
+            )
+        ]
+
+
+class GdaxFeed(StreamFeed):
+    """
+    ticker channel, it carries the best bid and ask of the product.
+    """
+
+    url = "wss://ws-feed.pro.coinbase.com"
+
+    def subscribe_messages(self):
+        return [
+            {
+                "type": "subscribe",
+                "product_ids": list(self.symbols),
+                "channels": ["ticker"],
+            }
+        ]
+
+    def parse(self, message):
+        if not isinstance(message, dict) or message.get("type") != "ticker":
+            return []
+        symbol = message.get("product_id")
+        if symbol not in self.symbols:
+            return []
+        return [
+            BookUpdate(
+                currency_pair=self.symbols[symbol],
+                bids=[
+                    (message["best_bid"], message.get("best_bid_size", 1))
+                ],
+                asks=[
+                    (message["best_ask"], message.get("best_ask_size", 1))
+                ],
+                snapshot=True,
+            )
+        ]
+
+
+class BitfinexFeed(StreamFeed):
+    """
+    ticker channel of the v2 api, messages come as [channel_id, data]
+    once the subscription is confirmed.
+    """
+
+    url = "wss://api-pub.bitfinex.com/ws/2"
+
+    def __init__(self, exchanges, url=None):
+        super().__init__(exchanges, url)
+        self.channels = {}
+
+    def subscribe_messages(self):
+        return [
+            {"event": "subscribe", "channel": "ticker", "symbol": f"t{symbol}"}
+            for symbol in self.symbols
+        ]
+
+    def parse(self, message):
+        if isinstance(message, dict):
+            if message.get("event") == "subscribed":
+                self.channels[message["chanId"]] = message["symbol"][1:]
+            return []
+
+        if not isinstance(message, list) or len(message) < 2:
+            return []
+        symbol = self.channels.get(message[0])
+        data = message[1]
+        # heartbeats come as [channel_id, "hb"]
+        if symbol not in self.symbols or not isinstance(data, list):
+            return []
+        bid, bid_size, ask, ask_size = data[:4]
+        return [
+            BookUpdate(
+                currency_pair=self.symbols[symbol],
+                bids=[(bid, bid_size)],
+                asks=[(ask, ask_size)],
+                snapshot=True,
+            )
+        ]
+
+
+FEEDS = {
+    "Bitstamp": BitstampFeed,
+    "Gdax": GdaxFeed,
+    "Bitfinex": BitfinexFeed,
+}
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import logging
+import threading
+from typing import List, Optional
+
+from aiohttp import web
+
+
+logger = logging.getLogger(__name__)
+
+
+def load_recording(path: str) -> List:
+    """
+    loads a feed recording, one json message per line
+    :param path: str
+    :return: list
+    """
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+class ReplayServer:
+    """
+    local stand-in for an exchange websocket feed.
+
+    every client gets the recorded messages, in order, once it sends its
+    first (subscription) message, so the real feed parsers can be pointed
+    to it and exercised offline.
+    """
+
+    def __init__(
+        self,
+        messages: List,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        interval: float = 0,
+    ):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.received = []
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}/"
+
+    async def _handler(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.received.append(await ws.receive_json())
+        for message in self.messages:
+            await ws.send_str(json.dumps(message))
+            await asyncio.sleep(self.interval)
+        # keep the connection open until the client leaves
+        async for msg in ws:
+            self.received.append(msg.data)
+        return ws
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get("/", self._handler)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def _serve(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self, timeout: Optional[float] = 5):
+        """
+        starts serving in a background thread
+        :return: str: url of the server
+        """
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._serve, name="replay-server", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self.url
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._thread = None
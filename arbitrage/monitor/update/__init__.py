@@ -7,6 +7,11 @@ from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
 
 
 class UpdateAction(ABC):
+    # the actions saving the history only get the spreads that were
+    # calculated again in Monitor.update_stream, not every spread on
+    # every book change
+    saves_history = False
+
     def __init__(self, spread_threshold: Optional[int] = None):
         self.threshold = spread_threshold or 0
 
@@ -0,0 +1,73 @@
+import logging
+from typing import List, Optional, Union
+
+from arbitrage.bus import LocalBus, UnixBus
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.update import UpdateAction
+from arbitrage.monitor.spread_detection.exchange import SpreadDetection
+from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
+
+
+logger = logging.getLogger(__name__)
+
+
+class SpreadBroadcast(UpdateAction):
+    """
+    publishes every batch of spreads to the market data bus, the live
+    stream of the web workers receives them from there. nothing is
+    written to the database and a receiver that is gone or too slow
+    never blocks the monitor, it just misses the batch. every spread is
+    sent, the clients filter them by threshold.
+
+    the topics are inter and tri, the data is {"timestamp": float,
+    "spreads": [dict]}. given a path (LIVE_SPREADS_DIR) instead of a bus
+    it publishes to the unix sockets of that directory.
+    """
+
+    def __init__(
+        self,
+        bus: Union[str, LocalBus],
+        spread_threshold: Optional[int] = None,
+    ):
+        super().__init__(spread_threshold)
+        if not isinstance(bus, LocalBus):
+            bus = UnixBus(bus, name="monitor")
+        self.bus = bus
+
+    def run_inter(
+        self,
+        spreads: List[SpreadDetection],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ):
+        rows = [
+            {
+                "currency_pair": spread.exchange_buy.currency_pair.value,
+                "buy_exchange": spread.exchange_buy.name,
+                "sell_exchange": spread.exchange_sell.name,
+                "buy_price": spread.exchange_buy.last_ask_price,
+                "sell_price": spread.exchange_sell.last_bid_price,
+                "spread": spread.spread,
+            }
+            for spread in spreads
+            if None not in [spread.exchange_buy, spread.exchange_sell]
+        ]
+        self.bus.publish("inter", {"timestamp": timestamp, "spreads": rows})
+
+    def run_tri(
+        self,
+        spreads: List[TriSpreadDetector],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ):
+        rows = [
+            {
+                "exchange": spread.exchange.name,
+                "symbols": list(spread.currenciesList),
+                "prices": spread.prices,
+                "spread": spread.spread,
+            }
+            for spread in spreads
+            if spread.exchange is not None
+        ]
+        self.bus.publish("tri", {"timestamp": timestamp, "spreads": rows})
@@ -0,0 +1,59 @@
+import logging
+from typing import List
+
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.update.broadcast import SpreadBroadcast
+from arbitrage.monitor.spread_detection.exchange import SpreadDetection
+from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
+
+
+logger = logging.getLogger(__name__)
+
+
+class SpreadsToBus(SpreadBroadcast):
+    """
+    publishes every cycle to the market data bus, the spreads of
+    SpreadBroadcast and:
+
+    - quotes.<exchange name>: {"timestamp": float, "quotes": {currency
+      pair or symbol: [bid, ask]}}, the prices the spreads used
+    """
+
+    def _publish_quotes(self, quotes: dict, timestamp: float):
+        for name, prices in quotes.items():
+            self.bus.publish(
+                f"quotes.{name}", {"timestamp": timestamp, "quotes": prices}
+            )
+
+    def run_inter(
+        self,
+        spreads: List[SpreadDetection],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ):
+        quotes = {}
+        for exchange in exchanges:
+            quotes.setdefault(exchange.name, {})[
+                exchange.currency_pair.value
+            ] = [exchange.last_bid_price, exchange.last_ask_price]
+        self._publish_quotes(quotes, timestamp)
+        super().run_inter(spreads, exchanges, timestamp)
+
+    def run_tri(
+        self,
+        spreads: List[TriSpreadDetector],
+        exchanges: List[dict],
+        timestamp: float,
+    ):
+        quotes = {}
+        for spread in spreads:
+            if spread.exchange is None:
+                continue
+            quotes.setdefault(spread.exchange.name, {}).update(
+                {
+                    symbol: list(price)
+                    for symbol, price in spread.prices.items()
+                }
+            )
+        self._publish_quotes(quotes, timestamp)
+        super().run_tri(spreads, exchanges, timestamp)
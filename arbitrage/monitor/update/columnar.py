@@ -0,0 +1,406 @@
+import csv
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.update import UpdateAction
+from arbitrage.monitor.spread_detection.exchange import SpreadDetection
+from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
+
+
+logger = logging.getLogger(__name__)
+
+
+# column -> dtype, the string columns are saved as codes of a dictionary
+SPREAD_COLUMNS = {
+    "timestamp": "<f8",
+    "spread": "<f8",
+    "buy_price": "<f8",
+    "sell_price": "<f8",
+    "buy_exchange": "<u2",
+    "sell_exchange": "<u2",
+    "currency_pair": "<u2",
+}
+TRI_SPREAD_COLUMNS = {
+    "timestamp": "<f8",
+    "spread": "<f8",
+    "exchange": "<u2",
+    "currency_pair": "<u2",
+}
+STRING_COLUMNS = {"buy_exchange", "sell_exchange", "exchange", "currency_pair"}
+
+INDEX_FILE = "index.json"
+CHUNK_ROWS = 1_000_000
+
+
+class ColumnarSpreadStore:
+    """
+    append-only spread history saved as one binary file per column,
+    fixed width records, split in chunks of chunk_rows rows:
+
+        <path>/index.json
+        <path>/chunk-000000/timestamp.bin
+        <path>/chunk-000000/spread.bin
+        ...
+
+    the index keeps the rows and the first and last timestamp of every
+    chunk, so a time range only maps the chunks it overlaps. the rows of
+    the index are the committed ones, bytes written after them by an
+    interrupted append are truncated when the store is opened again, and
+    the chunks it started without indexing them are removed.
+
+    chunk_rows is kept in the index, a store is always reopened with the
+    layout it was created with.
+
+    strings (exchanges, currency pairs) are saved as uint16 codes of a
+    dictionary kept in the index, decode turns them back into strings.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        columns: Dict[str, str] = None,
+        chunk_rows: Optional[int] = None,
+    ):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.isfile(index_path):
+            with open(index_path) as file:
+                self.index = json.load(file)
+            stored_rows = self.index.setdefault(
+                "chunk_rows", chunk_rows or CHUNK_ROWS
+            )
+            if chunk_rows and chunk_rows != stored_rows:
+                logger.warning(
+                    f"{path} was created with chunks of {stored_rows} "
+                    f"rows, ignoring chunk_rows={chunk_rows}."
+                )
+            self._repair()
+        else:
+            self.index = {
+                "columns": dict(columns or SPREAD_COLUMNS),
+                "chunk_rows": chunk_rows or CHUNK_ROWS,
+                "dictionary": [],
+                "chunks": [],
+            }
+            self._save_index()
+        self.chunk_rows = self.index["chunk_rows"]
+        self.columns = self.index["columns"]
+        self._codes = {
+            value: code for code, value in enumerate(self.index["dictionary"])
+        }
+
+    def _chunk_path(self, chunk: dict, column: str) -> str:
+        return os.path.join(self.path, chunk["name"], f"{column}.bin")
+
+    def _save_index(self):
+        tmp_path = os.path.join(self.path, f"{INDEX_FILE}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(self.index, file)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILE))
+
+    def _repair(self):
+        """
+        drops the bytes and the chunks of an append that didn't reach the
+        index
+        :return: None
+        """
+        for chunk in self.index["chunks"]:
+            for column, dtype in self.index["columns"].items():
+                path = self._chunk_path(chunk, column)
+                size = chunk["rows"] * np.dtype(dtype).itemsize
+                if os.path.getsize(path) > size:
+                    os.truncate(path, size)
+        indexed = {chunk["name"] for chunk in self.index["chunks"]}
+        for name in os.listdir(self.path):
+            directory = os.path.join(self.path, name)
+            if (
+                name.startswith("chunk-")
+                and name not in indexed
+                and os.path.isdir(directory)
+            ):
+                shutil.rmtree(directory)
+
+    def encode(self, value) -> int:
+        """
+        gets the code of a string, adding it to the dictionary if it's new
+        :param value: str
+        :return: int
+        """
+        value = str(value)
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.index["dictionary"])
+            self.index["dictionary"].append(value)
+            self._codes[value] = code
+        return code
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """
+        turns an array of codes back into the strings
+        :param codes: np.ndarray
+        :return: np.ndarray of str
+        """
+        return np.asarray(self.index["dictionary"], dtype=object)[codes]
+
+    @property
+    def rows(self) -> int:
+        return sum(chunk["rows"] for chunk in self.index["chunks"])
+
+    def append(self, rows: List[dict]):
+        """
+        appends rows at the end of the last chunk, opening new chunks
+        when it's full.
+        :param rows: list of dict: column -> value, strings are encoded
+        :return: None
+        """
+        if not rows:
+            return
+        with self._lock:
+            data = {
+                column: np.array(
+                    [
+                        self.encode(row[column])
+                        if column in STRING_COLUMNS
+                        else row[column]
+                        for row in rows
+                    ],
+                    dtype=dtype,
+                )
+                for column, dtype in self.columns.items()
+            }
+            start = 0
+            while start < len(rows):
+                chunk = self._writable_chunk()
+                stop = min(start + self.chunk_rows - chunk["rows"], len(rows))
+                for column, values in data.items():
+                    with open(self._chunk_path(chunk, column), "ab") as file:
+                        file.write(values[start:stop].tobytes())
+                timestamps = data["timestamp"][start:stop]
+                if chunk["rows"] and timestamps[0] < chunk["last"]:
+                    chunk["sorted"] = False
+                elif np.any(np.diff(timestamps) < 0):
+                    chunk["sorted"] = False
+                chunk["first"] = min(chunk["first"], float(timestamps.min()))
+                chunk["last"] = max(chunk["last"], float(timestamps.max()))
+                chunk["rows"] += stop - start
+                start = stop
+            # the rows only exist for readers once the index is replaced
+            self._save_index()
+
+    def _writable_chunk(self) -> dict:
+        chunks = self.index["chunks"]
+        if chunks and chunks[-1]["rows"] < self.chunk_rows:
+            return chunks[-1]
+        chunk = {
+            "name": f"chunk-{len(chunks):06d}",
+            "rows": 0,
+            "first": float("inf"),
+            "last": float("-inf"),
+            "sorted": True,
+        }
+        os.makedirs(os.path.join(self.path, chunk["name"]), exist_ok=True)
+        for column in self.columns:
+            # empty, whatever an interrupted append left there
+            open(self._chunk_path(chunk, column), "wb").close()
+        chunks.append(chunk)
+        return chunk
+
+    def _map(self, chunk: dict, column: str) -> np.ndarray:
+        return np.memmap(
+            self._chunk_path(chunk, column),
+            dtype=self.columns[column],
+            mode="r",
+            shape=(chunk["rows"],),
+        )
+
+    def iter_chunks(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        columns: Optional[List[str]] = None,
+    ):
+        """
+        maps the chunks overlapping [start, end] into memory, the arrays
+        are read-only views of the files, nothing is copied until used.
+        :param start: float: timestamp, None reads from the beginning
+        :param end: float: timestamp, None reads until the end
+        :param columns: list of str, every column by default
+        :return: generator of dict column -> np.ndarray
+        """
+        columns = columns or list(self.columns)
+        start = float("-inf") if start is None else start
+        end = float("inf") if end is None else end
+        for chunk in list(self.index["chunks"]):
+            if not chunk["rows"] or chunk["last"] < start:
+                continue
+            if chunk["first"] > end:
+                continue
+            timestamps = self._map(chunk, "timestamp")
+            if chunk["sorted"]:
+                selection = slice(
+                    np.searchsorted(timestamps, start, side="left"),
+                    np.searchsorted(timestamps, end, side="right"),
+                )
+            else:
+                selection = (timestamps >= start) & (timestamps <= end)
+            yield {
+                column: self._map(chunk, column)[selection]
+                for column in columns
+            }
+
+    def read(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        columns: Optional[List[str]] = None,
+    ) -> Dict[str, np.ndarray]:
+        """
+        reads the rows between two timestamps, when they are in a single
+        chunk the arrays are views of the mapped file, otherwise the
+        chunks are concatenated.
+        :param start: float: timestamp
+        :param end: float: timestamp
+        :param columns: list of str
+        :return: dict column -> np.ndarray
+        """
+        columns = columns or list(self.columns)
+        parts = list(self.iter_chunks(start, end, columns))
+        if len(parts) == 1:
+            return parts[0]
+        return {
+            column: np.concatenate([part[column] for part in parts])
+            if parts
+            else np.empty(0, dtype=self.columns[column])
+            for column in columns
+        }
+
+    def export_csv(
+        self,
+        filename: str,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ):
+        """
+        writes the rows between two timestamps as csv with the columns of
+        the store plus the time_pretty column AbstractSpreadToCSV writes.
+        :param filename: str
+        :param start: float: timestamp
+        :param end: float: timestamp
+        :return: int: rows written
+        """
+        columns = list(self.columns)
+        header = columns[:2] + ["time_pretty"] + columns[2:]
+        written = 0
+        with open(filename, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            for part in self.iter_chunks(start, end):
+                values = [
+                    self.decode(part[column])
+                    if column in STRING_COLUMNS
+                    else part[column].tolist()
+                    for column in columns
+                ]
+                pretty = [
+                    datetime.utcfromtimestamp(timestamp)
+                    for timestamp in part["timestamp"].tolist()
+                ]
+                for row in zip(*values[:2], pretty, *values[2:]):
+                    writer.writerow(row)
+                    written += 1
+        return written
+
+
+class SpreadHistoryToColumnar(UpdateAction):
+    """
+    appends every spread of the cycle to a ColumnarSpreadStore,
+    inter spreads in <path>/inter and tri spreads in <path>/tri.
+    """
+
+    saves_history = True
+
+    def __init__(
+        self,
+        path: str,
+        chunk_rows: Optional[int] = None,
+        spread_threshold: Optional[int] = None,
+    ):
+        super().__init__(spread_threshold)
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self._inter_store = None
+        self._tri_store = None
+
+    @property
+    def inter_store(self) -> ColumnarSpreadStore:
+        if self._inter_store is None:
+            self._inter_store = ColumnarSpreadStore(
+                os.path.join(self.path, "inter"),
+                SPREAD_COLUMNS,
+                self.chunk_rows,
+            )
+        return self._inter_store
+
+    @property
+    def tri_store(self) -> ColumnarSpreadStore:
+        if self._tri_store is None:
+            self._tri_store = ColumnarSpreadStore(
+                os.path.join(self.path, "tri"),
+                TRI_SPREAD_COLUMNS,
+                self.chunk_rows,
+            )
+        return self._tri_store
+
+    def run_inter(
+        self,
+        spreads: List[SpreadDetection],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ) -> None:
+        rows = []
+        for spread in spreads:
+            if None in [spread.exchange_buy, spread.exchange_sell]:
+                continue
+            rows.append(
+                {
+                    "timestamp": timestamp,
+                    "spread": spread.spread,
+                    "buy_price": spread.exchange_buy.last_ask_price,
+                    "sell_price": spread.exchange_sell.last_bid_price,
+                    "buy_exchange": spread.exchange_buy.name,
+                    "sell_exchange": spread.exchange_sell.name,
+                    "currency_pair": spread.exchange_buy.currency_pair.value,
+                }
+            )
+        self.inter_store.append(rows)
+
+    def run_tri(
+        self,
+        spreads: List[TriSpreadDetector],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ) -> None:
+        rows = []
+        for spread in spreads:
+            if None in [spread.exchange, spread.currenciesList]:
+                continue
+            rows.append(
+                {
+                    "timestamp": timestamp,
+                    "spread": spread.spread,
+                    "exchange": spread.exchange.name,
+                    "currency_pair": "-".join(spread.currenciesList),
+                }
+            )
+        self.tri_store.append(rows)
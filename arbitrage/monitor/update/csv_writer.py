@@ -11,6 +11,8 @@ from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
 
 
 class AbstractSpreadToCSV(UpdateAction):
+    saves_history = True
+
     def __init__(
         self,
         filename: str,
@@ -1,20 +1,25 @@
 import logging
 import pdb
-from typing import List
+import queue
+import threading
+import time
+from typing import List, Optional
 
 from django.conf import settings as config_settings
+from django.db import close_old_connections, connection, transaction
 
 from arbitrage.models import Spread, Exchange, Tri_Spread
 from arbitrage.monitor.update import UpdateAction
 from arbitrage.monitor.spread_detection.exchange import SpreadDetection
 from arbitrage.monitor.spread_detection.triangular import TriSpreadDetector
-from arbitrage.monitor.exchange.binance import BinanceAdapter
 
 
 logger = logging.getLogger(__name__)
 
 
 class SpreadHistoryToDB(UpdateAction):
+    saves_history = True
+
     def run_inter(
         self,
         spreads: List[SpreadDetection],
@@ -36,7 +41,8 @@ class SpreadHistoryToDB(UpdateAction):
                     last_bid_price=spread.exchange_sell.last_bid_price,
                 )
                 new_spread = Spread.objects.create(
-                    spread=spread.spread,
+                    # an IntegerField, the matrix spreads are floats
+                    spread=int(round(spread.spread)),
                     xchange_buy=exchange_buy,
                     xchange_sell=exchange_sell,
                 )
@@ -56,33 +62,16 @@ class SpreadHistoryToDB(UpdateAction):
     ):
         for spread in tri_spreads:
             try:
-                binance_buy1 = BinanceAdapter(
-                    spread.currenciesList[0], spread.exchange
-                )
-                tri_exchange_buy1 = Exchange.objects.create(
-                    name=binance_buy1.name,
-                    currency_pair=binance_buy1.currency_pair,
-                    last_ask_price=binance_buy1.last_ask_price,
-                    last_bid_price=binance_buy1.last_bid_price,
-                )
-                binance_sell = BinanceAdapter(
-                    spread.currenciesList[1], spread.exchange
-                )
-                tri_exchange_sell = Exchange.objects.create(
-                    name=binance_sell.name,
-                    currency_pair=binance_sell.currency_pair,
-                    last_ask_price=binance_sell.last_ask_price,
-                    last_bid_price=binance_sell.last_bid_price,
-                )
-                binance_buy2 = BinanceAdapter(
-                    spread.currenciesList[2], spread.exchange
-                )
-                tri_exchange_buy2 = Exchange.objects.create(
-                    name=binance_buy2.name,
-                    currency_pair=binance_buy2.currency_pair,
-                    last_ask_price=binance_buy2.last_ask_price,
-                    last_bid_price=binance_buy2.last_bid_price,
-                )
+                # the prices the detector used, no new request is made
+                tri_exchange_buy1, tri_exchange_sell, tri_exchange_buy2 = [
+                    Exchange.objects.create(
+                        name=spread.exchange.name,
+                        currency_pair=symbol,
+                        last_ask_price=spread.prices[symbol][1],
+                        last_bid_price=spread.prices[symbol][0],
+                    )
+                    for symbol in spread.currenciesList[:3]
+                ]
                 tri_spread = Tri_Spread.objects.create(
                     tri_spread=spread.spread,
                     tri_xchange_buy1=tri_exchange_buy1,
@@ -96,3 +85,242 @@ class SpreadHistoryToDB(UpdateAction):
 
             if config_settings.DEBUG:
                 logger.info(f"[!] Spread {tri_spread} created successfully.")
+
+
+class BulkSpreadHistoryToDB(UpdateAction):
+    """
+    saves the same history as SpreadHistoryToDB without writing in the
+    monitor thread: the prices of every spread are copied into a bounded
+    queue and a writer thread saves them in batches with bulk_create,
+    one transaction per batch.
+
+    a batch is flushed when it reaches batch_size rows or flush_interval
+    seconds after its first row. when the queue is full the monitor waits
+    up to put_timeout seconds per cycle for the writer, the spreads still
+    not queued by then are dropped and counted in dropped.
+    """
+
+    saves_history = True
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval: float = 2,
+        max_pending: int = 10000,
+        put_timeout: float = 0.5,
+        spread_threshold: Optional[int] = None,
+    ):
+        super().__init__(spread_threshold)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.dropped = 0
+        self.saved = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _exchange_row(name, currency_pair, bid, ask):
+        return {
+            "name": name,
+            "currency_pair": currency_pair,
+            "last_ask_price": ask,
+            "last_bid_price": bid,
+        }
+
+    def _put(self, rows):
+        """
+        queues the rows of a cycle, waiting at most put_timeout for all
+        of them
+        :param rows: list of tuple
+        :return: None
+        """
+        self.start()
+        deadline = time.monotonic() + self.put_timeout
+        dropped = 0
+        for row in rows:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    self._queue.put(row, timeout=remaining)
+                else:
+                    self._queue.put_nowait(row)
+            except queue.Full:
+                dropped += 1
+        if dropped:
+            self.dropped += dropped
+            logger.warning(
+                f"spread history queue is full, {self.dropped} spreads "
+                f"dropped so far."
+            )
+
+    def run_inter(
+        self,
+        spreads: List[SpreadDetection],
+        exchanges: List[Exchange],
+        timestamp: float,
+    ):
+        rows = []
+        for spread in spreads:
+            buy, sell = spread.exchange_buy, spread.exchange_sell
+            rows.append(
+                (
+                    "inter",
+                    spread.spread,
+                    [
+                        self._exchange_row(
+                            buy.name,
+                            buy.currency_pair,
+                            buy.last_bid_price,
+                            buy.last_ask_price,
+                        ),
+                        self._exchange_row(
+                            sell.name,
+                            sell.currency_pair,
+                            sell.last_bid_price,
+                            sell.last_ask_price,
+                        ),
+                    ],
+                )
+            )
+        self._put(rows)
+
+    def run_tri(
+        self,
+        tri_spreads: List[TriSpreadDetector],
+        tri_exchanges: List[Exchange],
+        timestamp: float,
+    ):
+        rows = []
+        for spread in tri_spreads:
+            # buy1, sell, buy2 in the order of the currenciesList
+            exchange_rows = []
+            for symbol in spread.currenciesList[:3]:
+                bid, ask = spread.prices.get(symbol, (None, None))
+                exchange_rows.append(
+                    self._exchange_row(spread.exchange.name, symbol, bid, ask)
+                )
+            rows.append(("tri", spread.spread, exchange_rows))
+        self._put(rows)
+
+    def start(self):
+        """
+        starts the writer thread if it isn't running
+        :return: None
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="spread-history-writer", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        stops the writer thread after saving what is left in the queue
+        :param timeout: float: seconds to wait for the thread
+        :return: None
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = (
+                self.flush_interval
+                if deadline is None
+                else max(deadline - time.monotonic(), 0)
+            )
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            else:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+
+            stopping = self._stop.is_set() and self._queue.empty()
+            if batch and (
+                len(batch) >= self.batch_size
+                or time.monotonic() >= deadline
+                or stopping
+            ):
+                self.flush(batch)
+                batch = []
+                deadline = None
+            if stopping:
+                break
+        close_old_connections()
+
+    def _create_exchanges(self, rows):
+        exchanges = [Exchange(**row) for row in rows]
+        if connection.features.can_return_rows_from_bulk_insert:
+            return Exchange.objects.bulk_create(exchanges)
+        # the database doesn't give back the ids of a bulk insert
+        for exchange in exchanges:
+            exchange.save()
+        return exchanges
+
+    def flush(self, batch):
+        """
+        saves a batch of queued spreads in one transaction
+        :param batch: list of (kind, spread, exchange rows)
+        :return: None
+        """
+        try:
+            with transaction.atomic():
+                exchanges = self._create_exchanges(
+                    [row for _, _, rows in batch for row in rows]
+                )
+                exchanges = iter(exchanges)
+                spreads, tri_spreads = [], []
+                for kind, value, rows in batch:
+                    if kind == "inter":
+                        buy, sell = next(exchanges), next(exchanges)
+                        # bulk_create doesn't call save, which fills the ids
+                        spreads.append(
+                            Spread(
+                                # an IntegerField, the matrix spreads are
+                                # floats
+                                spread=int(round(value)),
+                                xchange_buy=buy,
+                                xchange_sell=sell,
+                                exchange_buy_id=buy.pk,
+                                exchange_sell_id=sell.pk,
+                            )
+                        )
+                    else:
+                        buy1, sell, buy2 = (
+                            next(exchanges),
+                            next(exchanges),
+                            next(exchanges),
+                        )
+                        tri_spreads.append(
+                            Tri_Spread(
+                                tri_spread=value,
+                                tri_xchange_buy1=buy1,
+                                tri_xchange_sell=sell,
+                                tri_xchange_buy2=buy2,
+                                tri_exchange_buy1_id=buy1.pk,
+                                tri_exchange_sell_id=sell.pk,
+                                tri_exchange_buy2_id=buy2.pk,
+                            )
+                        )
+                Spread.objects.bulk_create(spreads)
+                Tri_Spread.objects.bulk_create(tri_spreads)
+        except Exception as error:
+            logger.exception(str(error))
+            return
+        self.saved += len(batch)
+        if config_settings.DEBUG:
+            logger.debug(f"[!] {len(batch)} spreads saved in one batch.")
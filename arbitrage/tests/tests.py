@@ -1,18 +1,95 @@
+import asyncio
+import json
 import logging
 import os
 import pdb
+import socket
+import tempfile
+import threading
+import time
 import datetime as dt
+import importlib.util
+from unittest import mock
 
 import ccxt
+import numpy as np
 
 from config.settings import get_env_var
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
 from rest_framework.test import APIRequestFactory, force_authenticate
 
 from accounts.models import User
-from arbitrage.api import views
+import arbitrage.monitor
+from arbitrage import jobs, models
+from arbitrage.api import mixins, stream, views
+from arbitrage.bus import LocalBus, UnixBus
+from arbitrage.api.pagination import InvalidCursorError, keyset_page
+from arbitrage.api.stream import SpreadHub
+from arbitrage.monitor import settings as monitor_settings
 from arbitrage.monitor.currency import CurrencyPair
-from arbitrage.monitor.settings import Bitfinex
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.exchange import registry
+from arbitrage.monitor.exchange.registry import ExchangeSpec
+from arbitrage.monitor.monitor import Monitor
+from arbitrage.monitor.exchange.bitfinex import Bitfinex
+from arbitrage.monitor.spread_detection.graph import CurrencyGraph
+from arbitrage.monitor.spread_detection.incremental import (
+    IncrementalSpreadEngine,
+)
+from arbitrage.monitor.spread_detection.matrix import SpreadMatrix
+from arbitrage.monitor.spread_detection.triangular import (
+    TriSpreadDetector,
+    TriSpreadMissingPriceError,
+)
+from arbitrage.monitor.quotes import SharedQuoteTable, quote_key
+from arbitrage.monitor.order import (
+    Order,
+    OrderState,
+    OrderTracker,
+    order_tracker,
+)
+from arbitrage.monitor.stream.engine import StreamEngine
+from arbitrage.monitor.exchange import binance
+from arbitrage.monitor.update.broadcast import SpreadBroadcast
+from arbitrage.monitor.update.bus import SpreadsToBus
+from arbitrage.monitor.update.columnar import (
+    ColumnarSpreadStore,
+    SpreadHistoryToColumnar,
+)
+from arbitrage.monitor.update.db_commit import (
+    BulkSpreadHistoryToDB,
+    SpreadHistoryToDB,
+)
+from arbitrage.trader import OrderExecutor, Trader, TraderState
+from arbitrage.monitor.stream.replay import ReplayServer
+
+
+class FakeExchange(Exchange):
+    """
+    exchange answering with fixed prices after the given delay
+    """
+
+    def __init__(self, currency_pair, bid, ask, delay=0):
+        super().__init__(currency_pair)
+        self.bid = bid
+        self.ask = ask
+        self.delay = delay
+
+    def update_prices(self):
+        time.sleep(self.delay)
+        self.last_bid_price = self.bid
+        self.last_ask_price = self.ask
+        return True
+
+
+class StreamedExchange(Exchange):
+    """
+    exchange fed only by the bitstamp feed of the StreamEngine
+    """
+
+    name = "Bitstamp"
+    currency_pair_api_representation = {CurrencyPair.BTC_USD: "btcusd"}
 
 
 class TestBitFinex(TestCase):
@@ -31,3 +108,1171 @@ class TestBitStamp(TestCase):
 class TestGdax(TestCase):
     def setUp(self):
         pass
+
+
+class TestMonitorPriceUpdate(TestCase):
+    def setUp(self):
+        self.monitor = Monitor()
+        self.fast = FakeExchange(CurrencyPair.BTC_USD, 100, 101)
+        self.other = FakeExchange(CurrencyPair.BTC_USD, 102, 103)
+        self.slow = FakeExchange(CurrencyPair.BTC_USD, 90, 91, delay=1)
+
+    def test_concurrent_update_marks_late_exchanges_stale(self):
+        exchanges = [self.fast, self.other, self.slow]
+        with mock.patch.object(monitor_settings, "EXCHANGES", exchanges):
+            with mock.patch.object(
+                monitor_settings, "PRICE_UPDATE_DEADLINE", 0.2
+            ):
+                start = time.monotonic()
+                self.monitor._update_prices(exchanges)
+                self.assertLess(time.monotonic() - start, 1)
+
+            self.assertFalse(self.fast.is_stale)
+            self.assertTrue(self.slow.is_stale)
+            spreads = self.monitor._calculate_spreads()
+
+        self.assertEqual(len(spreads), 1)
+        self.assertNotIn(
+            self.slow, [spreads[0].exchange_buy, spreads[0].exchange_sell]
+        )
+
+
+class TestStreamEngine(TestCase):
+    messages = [
+        {"event": "bts:subscription_succeeded", "data": {}},
+        {
+            "event": "data",
+            "channel": "order_book_btcusd",
+            "data": {"bids": [["100.5", "1"]], "asks": [["101", "2"]]},
+        },
+        {
+            "event": "data",
+            "channel": "order_book_btcusd",
+            "data": {"bids": [["100.5", "3"]], "asks": [["101", "2"]]},
+        },
+        {
+            "event": "data",
+            "channel": "order_book_btcusd",
+            "data": {"bids": [["102", "1"]], "asks": [["103", "1"]]},
+        },
+    ]
+
+    def setUp(self):
+        self.server = ReplayServer(self.messages)
+        self.exchange = StreamedExchange(CurrencyPair.BTC_USD)
+        self.engine = StreamEngine(
+            [self.exchange], urls={"Bitstamp": self.server.start()}
+        )
+        self.changes = []
+        self.engine.add_listener(
+            lambda exchange: self.changes.append(
+                (exchange.last_bid_price, exchange.last_ask_price)
+            )
+        )
+
+    def tearDown(self):
+        self.engine.stop(timeout=5)
+        self.server.stop()
+
+    def test_book_changes_update_prices_in_place(self):
+        self.engine.start()
+        deadline = time.monotonic() + 5
+        while len(self.changes) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        # the second message doesn't move the top of the book
+        self.assertEqual(self.changes, [(100.5, 101.0), (102.0, 103.0)])
+        self.assertEqual(self.exchange.last_bid_price, 102.0)
+        self.assertEqual(
+            self.server.received[0]["data"]["channel"], "order_book_btcusd"
+        )
+
+
+class TestIncrementalSpreadEngine(TestCase):
+    def setUp(self):
+        self.exchanges = [
+            FakeExchange(CurrencyPair.BTC_USD, 100, 101),
+            FakeExchange(CurrencyPair.BTC_USD, 103, 104),
+            FakeExchange(CurrencyPair.ETH_USD, 10, 11),
+            FakeExchange(CurrencyPair.BTC_USD, 99, 100),
+        ]
+        for exchange in self.exchanges:
+            exchange.update_prices()
+        self.engine = IncrementalSpreadEngine(self.exchanges)
+        for exchange in self.exchanges:
+            self.engine.update(exchange)
+
+    def test_only_same_currency_pairs_are_compared(self):
+        self.assertEqual(len(self.engine.spreads), 3)
+        btc = self.engine.groups[CurrencyPair.BTC_USD]
+        self.assertIs(self.engine.best_buy[CurrencyPair.BTC_USD], btc[2])
+        self.assertIs(self.engine.best_sell[CurrencyPair.BTC_USD], btc[1])
+        self.assertEqual(self.engine.best_spread(CurrencyPair.BTC_USD), 3)
+
+    def test_unchanged_quote_is_not_recalculated(self):
+        self.assertFalse(self.engine.update(self.exchanges[0]))
+
+    def test_moved_quote_recalculates_its_pairs(self):
+        exchange = self.exchanges[0]
+        exchange.last_bid_price, exchange.last_ask_price = 110, 111
+        untouched = self.engine.spreads[(self.exchanges[1], self.exchanges[3])]
+
+        self.assertTrue(self.engine.update(exchange))
+        spread = self.engine.spreads[(exchange, self.exchanges[3])]
+        self.assertIs(spread.exchange_sell, exchange)
+        self.assertIs(
+            self.engine.spreads[(self.exchanges[1], self.exchanges[3])],
+            untouched,
+        )
+        self.assertIs(self.engine.best_sell[CurrencyPair.BTC_USD], exchange)
+
+    def test_stale_exchange_is_removed(self):
+        exchange = self.exchanges[1]
+        exchange.is_stale = True
+        self.assertTrue(self.engine.update(exchange))
+        self.assertEqual(len(self.engine.spreads), 1)
+
+    def test_stream_saves_only_the_recalculated_spreads(self):
+        history = mock.Mock(saves_history=True)
+        broadcast = mock.Mock(saves_history=False)
+        monitor = Monitor()
+        monitor._spread_engine = self.engine
+        exchange = self.exchanges[0]
+        exchange.last_bid_price, exchange.last_ask_price = 110, 111
+
+        with mock.patch.multiple(
+            monitor_settings,
+            EXCHANGES=self.exchanges,
+            UPDATE_ACTIONS=[history, broadcast],
+            SPREAD_ENGINE="incremental",
+        ):
+            monitor._stream_changes([exchange])
+            saved = {
+                (spread.exchange_buy, spread.exchange_sell)
+                for spread in history.run_inter.call_args.args[0]
+            }
+            self.assertEqual(
+                saved,
+                {
+                    (self.exchanges[1], exchange),
+                    (self.exchanges[3], exchange),
+                },
+            )
+            self.assertEqual(len(broadcast.run_inter.call_args.args[0]), 3)
+
+            # the book changed without moving the quote
+            monitor._stream_changes([exchange])
+            self.assertEqual(history.run_inter.call_args.args[0], [])
+            self.assertEqual(len(broadcast.run_inter.call_args.args[0]), 3)
+
+
+class TestSpreadMatrix(TestCase):
+    def setUp(self):
+        self.exchanges = [
+            FakeExchange(CurrencyPair.BTC_USD, 100.25, 101),
+            FakeExchange(CurrencyPair.BTC_USD, 103.75, 104),
+            FakeExchange(CurrencyPair.ETH_USD, 10, 11),
+            FakeExchange(CurrencyPair.BTC_USD, 99, 100.5),
+            FakeExchange(CurrencyPair.ETH_USD, 12, 12.5),
+        ]
+        for exchange in self.exchanges:
+            exchange.update_prices()
+        self.matrix = SpreadMatrix(self.exchanges)
+
+    def test_best_spread_per_currency_pair(self):
+        spreads = {
+            spread.exchange_buy.currency_pair: spread
+            for spread in self.matrix.best_spreads()
+        }
+        btc = spreads[CurrencyPair.BTC_USD]
+        self.assertIs(btc.exchange_buy, self.exchanges[3])
+        self.assertIs(btc.exchange_sell, self.exchanges[1])
+        # not truncated to int like SpreadDetection
+        self.assertEqual(btc.spread, 3.25)
+        eth = spreads[CurrencyPair.ETH_USD]
+        self.assertIs(eth.exchange_sell, self.exchanges[4])
+        self.assertEqual(eth.spread, 1)
+
+    def test_stale_exchanges_are_ignored(self):
+        self.exchanges[1].is_stale = True
+        spreads = {
+            spread.exchange_buy.currency_pair: spread
+            for spread in self.matrix.best_spreads()
+        }
+        self.assertIs(
+            spreads[CurrencyPair.BTC_USD].exchange_sell, self.exchanges[0]
+        )
+        self.assertEqual(spreads[CurrencyPair.BTC_USD].spread, -0.25)
+
+    def test_prices_are_reloaded(self):
+        self.matrix.load()
+        self.assertEqual(self.matrix.bids[0].tolist(), [100.25, 103.75, 99])
+        self.assertTrue(np.isnan(self.matrix.bids[1, 2]))
+
+        self.exchanges[0].last_bid_price = None
+        self.exchanges[2].last_ask_price = 9
+        self.matrix.load()
+        self.assertTrue(np.isnan(self.matrix.bids[0, 0]))
+        self.assertEqual(self.matrix.asks[1, 0], 9)
+
+
+class TestTriSpreadDetector(TestCase):
+    def setUp(self):
+        self.exchange = mock.Mock()
+        self.exchange.book = {
+            "BNBBTC": (0.01, 0.0101),
+            "ADABNB": (0.002, 0.0025),
+            "ADABTC": (0.00003, 0.000031),
+        }
+
+    def test_spread_is_calculated_from_the_snapshot(self):
+        spread = TriSpreadDetector(
+            exchange=self.exchange,
+            currenciesList=["BNBBTC", "ADABNB", "ADABTC"],
+        )
+        self.assertAlmostEqual(spread.spread, 0.00003 / 0.0025 - 0.01)
+        self.assertEqual(spread.prices, self.exchange.book)
+        self.exchange.client.get_order_book.assert_not_called()
+
+    def test_missing_symbol(self):
+        with self.assertRaises(TriSpreadMissingPriceError):
+            TriSpreadDetector(
+                exchange=self.exchange,
+                currenciesList=["BNBBTC", "ANTBNB", "ANTBTC"],
+            )
+
+
+class TestCurrencyGraph(TestCase):
+    markets = [
+        {"symbol": "BNBBTC", "base": "BNB", "quote": "BTC"},
+        {"symbol": "ADABNB", "base": "ADA", "quote": "BNB"},
+        {"symbol": "ADABTC", "base": "ADA", "quote": "BTC"},
+        {"symbol": "ETHBTC", "base": "ETH", "quote": "BTC"},
+    ]
+    values = {"BTC": 1, "BNB": 0.01, "ADA": 0.00003, "ETH": 0.05}
+
+    def setUp(self):
+        self.graph = CurrencyGraph(self.markets)
+
+    def book(self, spread=0.001):
+        book = {}
+        for market in self.markets:
+            mid = self.values[market["base"]] / self.values[market["quote"]]
+            book[market["symbol"]] = (mid * (1 - spread), mid * (1 + spread))
+        return book
+
+    def test_triangles(self):
+        self.assertEqual(
+            self.graph.triangles(), [["BNBBTC", "ADABNB", "ADABTC"]]
+        )
+
+    def test_no_cycle_in_consistent_prices(self):
+        self.graph.update_rates(self.book())
+        self.assertEqual(self.graph.find_cycles(), [])
+
+    def test_profitable_cycle(self):
+        self.graph.update_rates(self.book())
+        self.graph.find_cycles()
+
+        book = self.book()
+        book["ADABTC"] = (0.0000306, 0.0000309)
+        self.graph.update_rates(book)
+        cycles = self.graph.find_cycles()
+
+        self.assertEqual(len(cycles), 1)
+        cycle = cycles[0]
+        self.assertEqual(
+            sorted(cycle.symbols), ["ADABNB", "ADABTC", "BNBBTC"]
+        )
+        # replay the trades of the cycle starting with one unit
+        amount, currency = 1.0, cycle.currencies[0]
+        for symbol in cycle.symbols:
+            base, quote = self.graph.markets[symbol]
+            bid, ask = book[symbol]
+            if currency == base:
+                amount, currency = amount * bid, quote
+            else:
+                amount, currency = amount / ask, base
+        self.assertEqual(currency, cycle.currencies[0])
+        self.assertAlmostEqual(amount - 1, cycle.profit)
+
+        self.graph.update_rates(self.book())
+        self.assertEqual(self.graph.find_cycles(), [])
+
+
+class TestBulkSpreadHistoryToDB(TestCase):
+    def setUp(self):
+        self.action = BulkSpreadHistoryToDB(max_pending=2, put_timeout=0)
+        # the rows are flushed by hand instead of by the writer thread
+        self.action.start = mock.Mock()
+
+    def drain(self):
+        batch = []
+        while not self.action._queue.empty():
+            batch.append(self.action._queue.get_nowait())
+        return batch
+
+    def test_inter_spreads_are_saved_in_one_batch(self):
+        buy = FakeExchange(CurrencyPair.BTC_USD, bid=99, ask=100)
+        sell = FakeExchange(CurrencyPair.BTC_USD, bid=120, ask=121)
+        buy.update_prices()
+        sell.update_prices()
+        spread = mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=20)
+        self.action.run_inter([spread, spread], [buy, sell], time.time())
+        # buy prices are copied when queued
+        buy.last_ask_price = 1
+
+        self.action.flush(self.drain())
+
+        self.assertEqual(models.Spread.objects.count(), 2)
+        saved = models.Spread.objects.first()
+        self.assertEqual(saved.exchange_buy_id, saved.xchange_buy.pk)
+        self.assertEqual(saved.xchange_buy.last_ask_price, 100)
+        self.assertEqual(saved.xchange_sell.last_bid_price, 120)
+
+    def test_float_spreads_are_rounded(self):
+        buy = FakeExchange(CurrencyPair.BTC_USD, bid=99, ask=100)
+        sell = FakeExchange(CurrencyPair.BTC_USD, bid=120, ask=121)
+        spread = mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=3.75)
+        self.action.run_inter([spread], [buy, sell], time.time())
+        self.action.flush(self.drain())
+
+        self.assertEqual(models.Spread.objects.get().spread, 4)
+
+    def test_tri_spreads_use_the_detector_prices(self):
+        exchange = mock.Mock(
+            book={
+                "BNBBTC": (0.01, 0.0101),
+                "ADABNB": (0.002, 0.0025),
+                "ADABTC": (0.00003, 0.000031),
+            }
+        )
+        exchange.name = "Binance"
+        tri_spread = TriSpreadDetector(
+            exchange=exchange, currenciesList=["BNBBTC", "ADABNB", "ADABTC"]
+        )
+        self.action.run_tri([tri_spread], [], time.time())
+        self.action.flush(self.drain())
+
+        saved = models.Tri_Spread.objects.get()
+        self.assertEqual(saved.tri_xchange_sell.currency_pair, "ADABNB")
+        self.assertEqual(saved.tri_xchange_buy2.last_bid_price, 0.00003)
+
+    def test_full_queue_drops_spreads(self):
+        spread = mock.Mock(
+            exchange_buy=FakeExchange(CurrencyPair.BTC_USD, bid=1, ask=2),
+            exchange_sell=FakeExchange(CurrencyPair.BTC_USD, bid=3, ask=4),
+            spread=1,
+        )
+        self.action.run_inter([spread] * 3, [], time.time())
+        self.assertEqual(self.action.dropped, 1)
+
+    def test_full_queue_waits_once_per_cycle(self):
+        self.action.put_timeout = 0.1
+        spread = mock.Mock(
+            exchange_buy=FakeExchange(CurrencyPair.BTC_USD, bid=1, ask=2),
+            exchange_sell=FakeExchange(CurrencyPair.BTC_USD, bid=3, ask=4),
+            spread=1,
+        )
+        started = time.monotonic()
+        self.action.run_inter([spread] * 50, [], time.time())
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(self.action.dropped, 48)
+
+
+class TestTriSpreadHistory(TestCase):
+    def setUp(self):
+        self.exchange = mock.Mock(
+            book={
+                "BNBBTC": (0.01, 0.0101),
+                "ADABNB": (0.002, 0.0025),
+                "ADABTC": (0.00003, 0.000031),
+            }
+        )
+        self.exchange.name = "Binance"
+
+    def test_run_tri_saves_the_detector_prices(self):
+        tri_spread = TriSpreadDetector(
+            exchange=self.exchange,
+            currenciesList=["BNBBTC", "ADABNB", "ADABTC"],
+        )
+        SpreadHistoryToDB().run_tri([tri_spread], [], time.time())
+
+        saved = models.Tri_Spread.objects.get()
+        self.assertEqual(saved.tri_xchange_buy1.last_ask_price, 0.0101)
+        self.assertEqual(saved.tri_xchange_sell.currency_pair, "ADABNB")
+        self.exchange.client.get_order_book.assert_not_called()
+
+    @mock.patch.object(binance, "BinanceHandler")
+    @mock.patch.object(binance, "Client")
+    def test_adapter_uses_the_shared_snapshot(self, client, handler):
+        shared = binance.Binance.shared("key", "secret")
+        self.assertIs(binance.Binance.shared("key", "secret"), shared)
+        client.assert_called_once_with("key", "secret")
+
+        shared.book = self.exchange.book
+        adapter = binance.BinanceAdapter("ADABNB", shared)
+        self.assertEqual(adapter.last_bid_price, 0.002)
+        shared.client.get_order_book.assert_not_called()
+
+
+class TestColumnarSpreadStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "inter")
+        self.store = ColumnarSpreadStore(self.path, chunk_rows=4)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def rows(self, start, count):
+        return [
+            {
+                "timestamp": float(timestamp),
+                "spread": timestamp * 2.5,
+                "buy_price": 100.0,
+                "sell_price": 110.0,
+                "buy_exchange": "Gdax",
+                "sell_exchange": "Bitstamp",
+                "currency_pair": "BTC/USD",
+            }
+            for timestamp in range(start, start + count)
+        ]
+
+    def test_append_and_read_range(self):
+        self.store.append(self.rows(0, 6))
+        self.store.append(self.rows(6, 4))
+        self.assertEqual(len(self.store.index["chunks"]), 3)
+
+        store = ColumnarSpreadStore(self.path)
+        data = store.read(start=3, end=7)
+        self.assertEqual(data["timestamp"].tolist(), [3, 4, 5, 6, 7])
+        self.assertEqual(data["spread"].tolist(), [7.5, 10, 12.5, 15, 17.5])
+        self.assertEqual(
+            store.decode(data["sell_exchange"]).tolist(), ["Bitstamp"] * 5
+        )
+
+    def test_single_chunk_is_memory_mapped(self):
+        self.store.append(self.rows(0, 3))
+        data = self.store.read(start=1)
+        self.assertIsInstance(data["spread"], np.memmap)
+        self.assertEqual(data["timestamp"].tolist(), [1, 2])
+
+    def test_uncommitted_bytes_are_dropped(self):
+        self.store.append(self.rows(0, 2))
+        chunk = self.store.index["chunks"][0]
+        with open(self.store._chunk_path(chunk, "spread"), "ab") as file:
+            file.write(b"\x00" * 8)
+
+        store = ColumnarSpreadStore(self.path)
+        store.append(self.rows(2, 1))
+        self.assertEqual(store.read()["spread"].tolist(), [0, 2.5, 5])
+
+    def test_unindexed_chunks_are_dropped(self):
+        self.store.append(self.rows(0, 4))
+        # an append interrupted after starting the second chunk
+        directory = os.path.join(self.path, "chunk-000001")
+        os.makedirs(directory)
+        with open(os.path.join(directory, "spread.bin"), "wb") as file:
+            file.write(np.array([999.0]).tobytes())
+
+        store = ColumnarSpreadStore(self.path)
+        self.assertFalse(os.path.exists(directory))
+        store.append(self.rows(4, 1))
+        self.assertEqual(store.read(start=3)["spread"].tolist(), [7.5, 10])
+
+    def test_reopened_with_the_stored_chunk_rows(self):
+        self.store.append(self.rows(0, 3))
+        store = ColumnarSpreadStore(self.path, chunk_rows=100)
+        self.assertEqual(store.chunk_rows, 4)
+        store.append(self.rows(3, 2))
+        self.assertEqual(
+            [chunk["rows"] for chunk in store.index["chunks"]], [4, 1]
+        )
+
+    def test_export_csv(self):
+        action = SpreadHistoryToColumnar(self.directory.name)
+        buy = FakeExchange(CurrencyPair.BTC_USD, bid=99, ask=100)
+        sell = FakeExchange(CurrencyPair.BTC_USD, bid=120, ask=121)
+        buy.update_prices()
+        sell.update_prices()
+        spread = mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=20)
+        action.run_inter([spread], [buy, sell], 1600000000.0)
+
+        filename = os.path.join(self.directory.name, "spreads.csv")
+        self.assertEqual(action.inter_store.export_csv(filename), 1)
+        with open(filename) as file:
+            lines = file.read().splitlines()
+        self.assertEqual(
+            lines[1],
+            "1600000000.0,20.0,2020-09-13 12:26:40,100.0,120.0,"
+            "FakeExchange,FakeExchange,BTC/USD",
+        )
+
+
+class FakeTradingExchange(FakeExchange):
+    """
+    exchange whose orders are executed fill_after seconds after placed
+    """
+
+    def __init__(self, fill_after):
+        super().__init__(CurrencyPair.BTC_USD, bid=120, ask=100)
+        self.update_prices()
+        self.fill_after = fill_after
+        self.placed_at = None
+        self.cancelled = False
+
+    def _place(self, amount, limit):
+        time.sleep(0.05)
+        self.placed_at = time.monotonic()
+        return Order(self, f"{self.name}-{limit}", {})
+
+    limit_buy_order = limit_sell_order = _place
+
+    def get_order_state(self, order):
+        if self.cancelled:
+            return OrderState.CANCELLED
+        if time.monotonic() - self.placed_at >= self.fill_after:
+            return OrderState.DONE
+        return OrderState.PENDING
+
+    def cancel_order(self, order):
+        self.cancelled = True
+
+
+class TestTrader(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(order_tracker, "ttl", 0.01)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def trade(self, sell, buy):
+        trader = Trader(
+            executor=OrderExecutor(poll_interval=0.02, timeout=0.3)
+        )
+        spread = mock.Mock(exchange_sell=sell, exchange_buy=buy, spread=500)
+        trader.run_inter([spread], [sell, buy], time.time())
+        # the monitor isn't blocked by the trade
+        self.assertIs(trader.state, TraderState.TRADE_PENDING)
+        trade = trader.pending.result(timeout=2)
+        self.assertTrue(order_tracker.is_running)
+        trader.executor.stop(1)
+        return trader, trade
+
+    def test_both_legs_are_placed_at_once(self):
+        sell = FakeTradingExchange(fill_after=0.05)
+        buy = FakeTradingExchange(fill_after=0.1)
+        trader, trade = self.trade(sell, buy)
+
+        self.assertTrue(trade.is_done)
+        self.assertIs(trader.state, TraderState.TRADE_DONE)
+        self.assertLess(abs(sell.placed_at - buy.placed_at), 0.04)
+
+    def test_pending_order_is_cancelled_after_timeout(self):
+        sell = FakeTradingExchange(fill_after=0.05)
+        buy = FakeTradingExchange(fill_after=10)
+        trader, trade = self.trade(sell, buy)
+
+        self.assertTrue(buy.cancelled)
+        self.assertIs(trade.buy_order.state, OrderState.CANCELLED)
+        self.assertIs(trade.sell_order.state, OrderState.DONE)
+
+
+class TestOrderTracker(TestCase):
+    def setUp(self):
+        self.tracker = OrderTracker(ttl=60)
+        self.exchange = mock.Mock()
+        self.exchange.get_open_orders.return_value = {"1", "2"}
+        self.exchange.get_order_state.return_value = OrderState.DONE
+        self.orders = [Order(self.exchange, str(id)) for id in range(1, 4)]
+        for order in self.orders:
+            self.tracker.track(order)
+
+    def test_one_request_per_exchange(self):
+        self.assertIs(self.tracker.state(self.orders[0]), OrderState.PENDING)
+        self.exchange.get_open_orders.assert_called_once()
+        # only the order missing from the open orders is queried
+        self.exchange.get_order_state.assert_called_once_with(self.orders[2])
+        self.assertIs(self.orders[2].state, OrderState.DONE)
+
+        # cached until the ttl expires
+        self.tracker.state(self.orders[1])
+        self.exchange.get_open_orders.assert_called_once()
+
+    def test_push_updates(self):
+        self.tracker.refresh(self.exchange)
+        self.tracker.push(self.exchange, "1", OrderState.CANCELLED)
+        self.assertIs(self.tracker.state(self.orders[0]), OrderState.CANCELLED)
+        self.exchange.get_open_orders.assert_called_once()
+
+    def test_same_id_in_two_exchanges(self):
+        other = mock.Mock()
+        order = Order(other, "1")
+        self.tracker.track(order)
+        self.tracker.push(other, "1", OrderState.DONE)
+        self.assertIs(order.state, OrderState.DONE)
+        self.assertIs(self.orders[0].state, OrderState.PENDING)
+        self.assertIs(self.tracker.state(self.orders[0]), OrderState.PENDING)
+
+    def test_started_with_the_executor(self):
+        executor = OrderExecutor(tracker=self.tracker)
+        executor.start()
+        self.assertTrue(self.tracker.is_running)
+        executor.stop(1)
+        self.assertFalse(self.tracker.is_running)
+
+
+class TestSpreadPagination(TestCase):
+    def setUp(self):
+        buy = models.Exchange.objects.create(
+            name="Gdax", currency_pair="BTC/USD", last_ask_price=100
+        )
+        sell = models.Exchange.objects.create(
+            name="Bitfinex", currency_pair="BTC/USD", last_bid_price=120
+        )
+        self.spreads = [
+            models.Spread.objects.create(
+                xchange_buy=buy, xchange_sell=sell, spread=spread
+            )
+            for spread in range(5)
+        ]
+        self.start = dt.datetime(2021, 1, 1, tzinfo=dt.timezone.utc)
+        for index, spread in enumerate(self.spreads):
+            # the last two share the date, the pk breaks the tie
+            recorded_date = self.start + dt.timedelta(minutes=min(index, 3))
+            models.Spread.objects.filter(pk=spread.pk).update(
+                recorded_date=recorded_date
+            )
+        self.queryset = models.Spread.objects.values(
+            "id", "recorded_date", "spread"
+        )
+
+    def test_pages_follow_the_cursor(self):
+        pages, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(self.queryset, limit=2, cursor=cursor)
+            pages.append([row["spread"] for row in rows])
+            if cursor is None:
+                break
+        self.assertEqual(pages, [[4, 3], [2, 1], [0]])
+
+    def test_time_filters(self):
+        rows, cursor = keyset_page(
+            self.queryset,
+            limit=10,
+            since=self.start + dt.timedelta(minutes=1),
+            until=self.start + dt.timedelta(minutes=3),
+        )
+        self.assertEqual([row["spread"] for row in rows], [2, 1])
+        self.assertIsNone(cursor)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursorError):
+            keyset_page(self.queryset, limit=2, cursor="not-a-cursor")
+
+    def test_inter_spread_endpoint(self):
+        user = User.objects.create(email="user@example.com", username="user")
+        request = APIRequestFactory().get("/", {"limit": 3})
+        force_authenticate(request, user=user)
+        response = views.InterSpread.as_view()(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["inter_spread"] for row in response.data["data"]], [4, 3, 2]
+        )
+        self.assertEqual(
+            response.data["data"][0]["inter_xchange_buy1"]["name"], "Gdax"
+        )
+        self.assertIsNotNone(response.data["next"])
+
+
+class TestSpreadStream(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.action = SpreadBroadcast(self.directory.name)
+        buy = FakeExchange(CurrencyPair.BTC_USD, bid=99, ask=100)
+        sell = FakeExchange(CurrencyPair.BTC_USD, bid=120, ask=121)
+        eth = FakeExchange(CurrencyPair.ETH_USD, bid=10, ask=11)
+        for exchange in [buy, sell, eth]:
+            exchange.update_prices()
+        self.spreads = [
+            mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=20),
+            mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=5),
+            mock.Mock(exchange_buy=eth, exchange_sell=eth, spread=30),
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_clients_receive_their_spreads(self):
+        async def run():
+            hub = SpreadHub(self.directory.name)
+            hub.start()
+            try:
+                btc = hub.subscribe(currency_pairs={"BTC/USD"}, threshold=10)
+                tri = hub.subscribe(types={"tri"})
+                self.action.run_inter(self.spreads, [], 1.0)
+                message = await asyncio.wait_for(btc.queue.get(), 1)
+                self.assertTrue(tri.queue.empty())
+                return message
+            finally:
+                hub.stop()
+
+        message = asyncio.run(run())
+        self.assertEqual(message["type"], "inter")
+        self.assertEqual(
+            [spread["spread"] for spread in message["spreads"]], [20]
+        )
+        self.assertEqual(message["spreads"][0]["sell_price"], 120)
+
+    def test_stale_sockets_are_removed(self):
+        path = os.path.join(self.directory.name, "web-0.sock")
+        receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receiver.bind(path)
+        receiver.close()
+
+        self.action.run_inter(self.spreads, [], 1.0)
+        self.assertFalse(os.path.exists(path))
+
+
+class TestMarketBus(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        buy = FakeExchange(CurrencyPair.BTC_USD, bid=99, ask=100)
+        sell = FakeExchange(CurrencyPair.BTC_USD, bid=120, ask=121)
+        eth = FakeExchange(CurrencyPair.ETH_USD, bid=10, ask=11)
+        self.exchanges = [buy, sell, eth]
+        for exchange in self.exchanges:
+            exchange.update_prices()
+        self.spreads = [
+            mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=20),
+            mock.Mock(exchange_buy=buy, exchange_sell=sell, spread=5),
+            mock.Mock(exchange_buy=eth, exchange_sell=eth, spread=30),
+        ]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_spreads_and_quotes_are_published(self):
+        bus = LocalBus()
+        SpreadsToBus(bus).run_inter(self.spreads, self.exchanges, 1.0)
+
+        spreads = bus.latest("inter")["data"]["spreads"]
+        self.assertEqual([spread["spread"] for spread in spreads], [20, 5, 30])
+        self.assertEqual(spreads[0]["sell_price"], 120)
+        quotes = bus.snapshot("quotes.")
+        self.assertEqual(
+            quotes["quotes.FakeExchange"]["data"]["quotes"],
+            # the last exchange of each currency pair wins
+            {"BTC/USD": [120, 121], "ETH/USD": [10, 11]},
+        )
+
+    def test_unix_bus_between_processes(self):
+        consumer = UnixBus(self.directory.name, name="web")
+        consumer.start()
+        received = []
+        consumer.subscribe(received.append)
+        try:
+            publisher = UnixBus(self.directory.name, name="monitor")
+            publisher.publish("tri", {"spreads": []})
+            deadline = time.monotonic() + 1
+            while not received and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            consumer.stop()
+
+        self.assertEqual(received[0]["data"], {"spreads": []})
+        self.assertEqual(consumer.latest("tri"), received[0])
+        self.assertFalse(os.path.exists(consumer.socket_path))
+
+    def test_stream_sends_events(self):
+        bus = LocalBus()
+        action = SpreadsToBus(bus)
+
+        async def run():
+            hub = SpreadHub(bus)
+            hub.start()
+            sent = []
+            disconnect = asyncio.Event()
+
+            async def receive():
+                if not sent:
+                    return {"type": "http.request", "body": b""}
+                await disconnect.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+                if message.get("body"):
+                    disconnect.set()
+
+            with mock.patch.object(
+                stream, "authenticate", return_value=True
+            ), mock.patch.object(stream, "get_hub", return_value=hub):
+                query = b"token=x&threshold=10&currency_pair=BTC/USD"
+                task = asyncio.ensure_future(
+                    stream.spread_stream(
+                        {"query_string": query}, receive, send
+                    )
+                )
+                while not hub.subscriptions:
+                    await asyncio.sleep(0.01)
+                action.run_inter(self.spreads, [], 1.0)
+                await asyncio.wait_for(task, 1)
+            hub.stop()
+            return sent, hub
+
+        sent, hub = asyncio.run(run())
+        self.assertEqual(sent[0]["status"], 200)
+        event, data = sent[1]["body"].decode().strip().split("\n")
+        self.assertEqual(event, "event: inter")
+        spreads = json.loads(data[len("data: "):])["spreads"]
+        self.assertEqual([spread["spread"] for spread in spreads], [20])
+        # the client is gone
+        self.assertFalse(hub.subscriptions)
+
+
+class TestSharedQuoteTable(TestCase):
+    def setUp(self):
+        self.name = f"test_quotes_{os.getpid()}"
+        self.btc = FakeExchange(CurrencyPair.BTC_USD, 100, 101)
+        self.eth = FakeExchange(CurrencyPair.ETH_USD, 10, 11)
+        self.bch = FakeExchange(CurrencyPair.BCH_USD, 1, 2)
+        self.feeder = SharedQuoteTable(
+            self.name, [quote_key(self.btc), quote_key(self.eth)], create=True
+        )
+
+    def tearDown(self):
+        self.feeder.close()
+        self.feeder.unlink()
+
+    def test_readers_see_the_feeder_quotes(self):
+        reader = SharedQuoteTable(self.name)
+        self.assertEqual(
+            reader.keys, ["FakeExchange:BTC/USD", "FakeExchange:ETH/USD"]
+        )
+        self.assertIsNone(reader.read(quote_key(self.btc)))
+
+        self.feeder.write(quote_key(self.btc), 100, 101, timestamp=1.0)
+        quote = reader.read(quote_key(self.btc))
+        self.assertEqual(
+            (quote.bid, quote.ask, quote.timestamp), (100, 101, 1)
+        )
+        self.assertEqual(quote.sequence, 2)
+        reader.close()
+
+    def test_monitor_reads_the_shared_quotes(self):
+        self.feeder.write(quote_key(self.btc), 200, 201)
+        # older than SHARED_QUOTES_MAX_AGE
+        self.feeder.write(quote_key(self.eth), 20, 21, timestamp=1.0)
+        self.btc.update_prices = mock.Mock()
+        self.bch.update_prices = mock.Mock(return_value=True)
+
+        with mock.patch.multiple(
+            monitor_settings,
+            SHARED_QUOTES=True,
+            SHARED_QUOTES_NAME=self.name,
+        ):
+            Monitor()._update_prices([self.btc, self.eth, self.bch])
+
+        self.btc.update_prices.assert_not_called()
+        self.assertEqual(self.btc.last_bid_price, 200)
+        self.assertFalse(self.btc.is_stale)
+        # the stale quote and the exchange not in the table are polled
+        self.assertEqual(self.eth.last_bid_price, 10)
+        self.assertFalse(self.eth.is_stale)
+        self.bch.update_prices.assert_called_once()
+
+    def test_monitor_follows_the_feeder(self):
+        self.feeder.write(quote_key(self.btc), 1, 2)
+        self.btc.update_prices = mock.Mock(return_value=True)
+        monitor = Monitor()
+
+        with mock.patch.multiple(
+            monitor_settings,
+            SHARED_QUOTES=True,
+            SHARED_QUOTES_NAME=self.name,
+        ):
+            monitor._update_prices([self.btc])
+            self.assertEqual(self.btc.last_bid_price, 1)
+            self.btc.update_prices.assert_not_called()
+
+            # the feeder exits, the exchange is polled
+            self.feeder.close()
+            self.feeder.unlink()
+            monitor._update_prices([self.btc])
+            self.btc.update_prices.assert_called_once()
+            self.assertIsNone(monitor._shared_quotes)
+
+            # a new feeder starts, the monitor attaches to its table
+            self.feeder = SharedQuoteTable(
+                self.name, [quote_key(self.btc)], create=True
+            )
+            self.feeder.write(quote_key(self.btc), 5, 6)
+            monitor._update_prices([self.btc])
+            self.assertEqual(self.btc.last_bid_price, 5)
+
+            # replaced by a feeder which didn't close its table
+            replaced = self.feeder
+            self.feeder = SharedQuoteTable(
+                self.name, [quote_key(self.btc)], create=True
+            )
+            replaced.created = False
+            replaced.close()
+            self.feeder.write(quote_key(self.btc), 7, 8)
+            monitor._update_prices([self.btc])
+            self.assertEqual(self.btc.last_bid_price, 7)
+            self.btc.update_prices.assert_called_once()
+        monitor._shared_quotes.close()
+
+
+class TestJobServer(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        address = os.path.join(self.directory.name, "jobs.sock")
+        patcher = mock.patch.dict(
+            jobs.JOBS,
+            {
+                "dumps": json.dumps,
+                "sleep": time.sleep,
+                "progress": jobs.report_progress,
+            },
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.server = jobs.JobServer(
+            address, workers=1, authkey=b"test", cache_size=1, cache_ttl=60
+        )
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = jobs.JobClient(address, authkey=b"test")
+        for _ in range(100):
+            if os.path.exists(address):
+                break
+            time.sleep(0.05)
+
+    def tearDown(self):
+        self.server.close()
+        self.directory.cleanup()
+
+    def test_generated_authkey_and_private_socket(self):
+        directory = os.path.join(self.directory.name, "missing")
+        address = os.path.join(directory, "jobs.sock")
+        with override_settings(
+            JOBS_AUTHKEY=None,
+            JOBS_AUTHKEY_FILE=os.path.join(directory, "jobs.key"),
+        ):
+            client = jobs.JobClient(address)
+            with self.assertRaises(jobs.JobServiceUnavailableError):
+                client.submit("dumps", [1])
+
+            server = jobs.JobServer(address, workers=1)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            for _ in range(100):
+                if os.path.exists(address):
+                    break
+                time.sleep(0.05)
+
+            try:
+                for path in [address, os.path.join(directory, "jobs.key")]:
+                    self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+                self.assertEqual(client.authkey, server.authkey)
+                job = client.run("dumps", [1], timeout=30)
+                self.assertEqual(job["result"], "[1]")
+            finally:
+                server.close()
+
+    def test_jobs_run_in_the_pool(self):
+        job = self.client.run("dumps", [1, 2], timeout=30)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["result"], "[1, 2]")
+
+        # the result stays available by job id
+        self.assertEqual(
+            self.client.result(job["job_id"])["result"], "[1, 2]"
+        )
+        self.assertEqual(self.client.result("missing")["status"], "unknown")
+        with self.assertRaises(ValueError):
+            self.client.submit("missing")
+
+    def test_identical_jobs_are_coalesced(self):
+        job_id = self.client.submit("sleep", 0.5)
+        self.assertEqual(self.client.submit("sleep", 0.5), job_id)
+        self.assertNotEqual(self.client.submit("sleep", 0.1), job_id)
+
+        self.assertEqual(self.client.result(job_id, 30)["status"], "done")
+        # not cached, finished jobs run again
+        self.assertNotEqual(self.client.submit("sleep", 0.5), job_id)
+
+    def test_results_are_cached(self):
+        with mock.patch.object(jobs, "CACHED_JOBS", {"dumps"}):
+            job = self.client.run("dumps", 1, timeout=30)
+            self.assertEqual(self.client.submit("dumps", 1), job["job_id"])
+
+            # evicts the result of 1, the cache holds one
+            self.client.run("dumps", 2, timeout=30)
+            self.assertNotEqual(
+                self.client.submit("dumps", 1), job["job_id"]
+            )
+
+    def test_progress(self):
+        job = self.client.run("progress", 1, 2, timeout=30)
+        for _ in range(100):
+            job = self.client.result(job["job_id"])
+            if "progress" in job:
+                break
+            time.sleep(0.05)
+        self.assertEqual(job["progress"], {"done": 1, "total": 2})
+
+    def test_unavailable_server(self):
+        client = jobs.JobClient(
+            os.path.join(self.directory.name, "none.sock"), authkey=b"test"
+        )
+        with self.assertRaises(jobs.JobServiceUnavailableError):
+            client.submit("dumps", 1)
+
+
+class TestHistoricalDataJob(TransactionTestCase):
+    """
+    the historical_data job run through the view, in a pool of threads so
+    it shares the mocked exchange and the test database
+    """
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        address = os.path.join(self.directory.name, "jobs.sock")
+
+        self.fetch = threading.Event()
+        start = dt.datetime(2021, 1, 1).timestamp()
+
+        def fetch_ohlcv(symbol, timeframe, since, limit, params):
+            self.fetch.wait(30)
+            if since / 1000 > start:
+                return []
+            return [
+                [(start + 3600 * hour) * 1000, 1.0, 2.0, 0.5, 1.5, 10.0]
+                for hour in range(24)
+            ]
+
+        self.exchange = mock.Mock()
+        self.exchange.fetch_ohlcv.side_effect = fetch_ohlcv
+        for patcher in [
+            mock.patch.object(
+                jobs,
+                "ProcessPoolExecutor",
+                lambda mp_context, **kwargs: ThreadPoolExecutor(**kwargs),
+            ),
+            mock.patch.object(
+                mixins.BackTestingMixin.command_obj.obj_handler,
+                "load_exchange_manager",
+                return_value=self.exchange,
+            ),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.server = jobs.JobServer(address, workers=1, authkey=b"test")
+        self.addCleanup(self.server.close)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        for _ in range(100):
+            if os.path.exists(address):
+                break
+            time.sleep(0.05)
+        client = jobs.JobClient(address, authkey=b"test")
+        self.view = views.ExchangeHistoricalDataView
+        patcher = mock.patch.object(self.view, "job_client", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(email="user@example.com", username="u")
+
+    def post(self):
+        request = APIRequestFactory().post(
+            "/",
+            {
+                "option": "list_exchange_trade_pair_ohlcv",
+                "exchange": "binance",
+                "trade_pair": "BTC/USDT",
+                "granularity": "1h",
+                "start_date": "2021-01-01",
+                "end_date": "2021-01-02",
+            },
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        return self.view.as_view()(request)
+
+    def test_ohlcv_job(self):
+        with self.settings(JOBS_WAIT_TIMEOUT=0):
+            first = self.post()
+            second = self.post()
+        self.assertEqual(first.status_code, 202)
+        # the identical request shares the running job
+        self.assertEqual(second.data["job_id"], first.data["job_id"])
+
+        self.fetch.set()
+        job = self.view.job_client.result(first.data["job_id"], 30)
+        self.assertEqual(job["status"], "done", job)
+        self.assertEqual(len(job["result"]), 24)
+        self.assertEqual(job["result"][0]["close"], 1.5)
+        self.assertEqual(
+            self.exchange.fetch_ohlcv.call_args.kwargs["symbol"], "BTC/USDT"
+        )
+        self.assertEqual(models.Ticker.objects.count(), 24)
+
+        for _ in range(100):
+            job = self.view.job_client.result(first.data["job_id"])
+            if job.get("progress", {}).get("done") == 86400:
+                break
+            time.sleep(0.05)
+        self.assertEqual(job["progress"], {"done": 86400, "total": 86400})
+
+        with self.settings(JOBS_WAIT_TIMEOUT=30):
+            # cached, fetched once
+            self.assertEqual(self.post().data["data"], job["result"])
+        self.assertEqual(self.exchange.fetch_ohlcv.call_count, 2)
+
+    def test_refused_job_is_an_error_response(self):
+        view = self.view()
+        jobs = view.run_jobs([("no_such_job",), ("no_such_job", "x")])
+        self.assertEqual([job["status"] for job in jobs], ["error"] * 2)
+        self.assertEqual(view.job_response(jobs[0]).status_code, 400)
+
+
+class TestExchangeRegistry(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(registry._instances, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_adapters_are_shared(self):
+        spec = ExchangeSpec(FakeExchange, CurrencyPair.BTC_USD, 1, 2)
+        exchange = spec.get()
+        self.assertIs(
+            ExchangeSpec(FakeExchange, CurrencyPair.BTC_USD, 1, 2).get(),
+            exchange,
+        )
+        self.assertIsNot(
+            ExchangeSpec(FakeExchange, CurrencyPair.ETH_USD, 1, 2).get(),
+            exchange,
+        )
+
+    def test_settings_build_the_exchanges_on_first_use(self):
+        path = os.path.join(
+            os.path.dirname(arbitrage.monitor.__file__), "settings.py"
+        )
+        module_spec = importlib.util.spec_from_file_location(
+            "lazy_monitor_settings", path
+        )
+        module = importlib.util.module_from_spec(module_spec)
+        module_spec.loader.exec_module(module)
+        self.assertNotIn("EXCHANGES", vars(module))
+
+        module.EXCHANGE_SPECS = [
+            ExchangeSpec(FakeExchange, CurrencyPair.BTC_USD, 1, 2)
+        ]
+        exchanges = module.EXCHANGES
+        self.assertIsInstance(exchanges[0], FakeExchange)
+        self.assertIs(module.EXCHANGES, exchanges)
+        with self.assertRaises(AttributeError):
+            module.MISSING
@@ -1,17 +1,23 @@
-import time
-import datetime
+import asyncio
+import logging
+import threading
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from enum import Enum
 from typing import List, Optional
 
-from bitcoin_arbitrage.monitor import settings
-from bitcoin_arbitrage.monitor.exchange import Exchange
-from bitcoin_arbitrage.monitor.log import setup_logger
-from bitcoin_arbitrage.monitor.spread_detection import Spread
-from bitcoin_arbitrage.monitor.update import UpdateAction
-from bitcoin_arbitrage.monitor.order import Order, OrderState
+from arbitrage.monitor import settings
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.spread_detection import SpreadABC as Spread
+from arbitrage.monitor.update import UpdateAction
+from arbitrage.monitor.order import (
+    Order,
+    OrderState,
+    OrderTracker,
+    order_tracker,
+)
 
-logger = setup_logger("Trader")
+logger = logging.getLogger(__name__)
 
 
 class Trade:
@@ -19,6 +25,13 @@ class Trade:
         self.sell_order = sell_order
         self.buy_order = buy_order
 
+    @property
+    def is_done(self):
+        return all(
+            order is not None and order.state is OrderState.DONE
+            for order in [self.sell_order, self.buy_order]
+        )
+
 
 class TraderState(Enum):
     READY = 0
@@ -26,31 +39,215 @@ class TraderState(Enum):
     TRADE_DONE = 2
 
 
+class OrderExecutor:
+    """
+    runs the order lifecycle of the trades in an asyncio loop living in
+    its own thread, so placing and tracking orders never blocks the
+    monitor.
+
+    the exchange clients are blocking, their calls run in a thread pool
+    and the loop waits for them, which lets both legs of a trade be
+    placed and tracked at the same time.
+
+    the order tracker refreshes the states of the orders in flight in the
+    background while the executor runs.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.TRADING_ORDER_STATE_UPDATE_INTERVAL,
+        timeout: float = settings.TRADING_TIME_UNTIL_ORDER_CANCELLATION,
+        workers: int = 8,
+        tracker: OrderTracker = order_tracker,
+    ):
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.tracker = tracker
+        self._pool = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="order"
+        )
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """
+        starts the event loop thread and the order tracker if they
+        aren't running
+        :return: None
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.tracker.start(self.poll_interval)
+            self._loop = asyncio.new_event_loop()
+            self._loop.set_default_executor(self._pool)
+            self._thread = threading.Thread(
+                target=self._loop.run_forever,
+                name="order-executor",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        stops the event loop and the order tracker, trades still running
+        are abandoned
+        :param timeout: float: seconds to wait for each thread
+        :return: None
+        """
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self.tracker.stop(timeout)
+
+    def submit(self, spread: Spread, amount: float) -> Future:
+        """
+        executes the trade of the spread in the background
+        :param spread: Spread
+        :param amount: float: btc amount of both orders
+        :return: concurrent.futures.Future with the Trade
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.execute(spread, amount), self._loop
+        )
+
+    async def _call(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            None, function, *args
+        )
+
+    async def _place(self, exchange: Exchange, side: str, amount, limit):
+        place = (
+            exchange.limit_sell_order
+            if side == "sell"
+            else exchange.limit_buy_order
+        )
+        try:
+            return await self._call(place, amount, limit)
+        except Exception as error:
+            logger.exception(f"{side} order in {exchange} failed: {error}")
+            return None
+
+    async def _wait_filled(self, order: Order):
+        state = order.state
+        while state is OrderState.PENDING:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                state = await self._call(order.get_state)
+            except Exception as error:
+                logger.warning(f"{order.order_id} state failed: {error}")
+        return state
+
+    async def _track(self, exchange: Exchange, order: Order):
+        """
+        waits until the order isn't pending anymore or cancels it
+        once the timeout is reached.
+        :return: OrderState
+        """
+        try:
+            return await asyncio.wait_for(
+                self._wait_filled(order), self.timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"{order.order_id} in {exchange} wasn't executed in "
+                f"{self.timeout}s, cancelling it."
+            )
+            try:
+                await self._call(exchange.cancel_order, order)
+                # skip the cached state, the order just changed
+                state = await self._call(exchange.get_order_state, order)
+                self.tracker.push(exchange, order.order_id, state)
+                order.state = state
+            except Exception as error:
+                logger.exception(str(error))
+            return order.state
+
+    async def execute(self, spread: Spread, amount: float) -> Trade:
+        """
+        places both legs of the spread at the same time and tracks
+        them until they are filled or cancelled.
+        :param spread: Spread
+        :param amount: float
+        :return: Trade
+        """
+        sell_limit = (
+            spread.exchange_sell.last_bid_price - settings.TRADING_LIMIT_PUFFER
+        )
+        buy_limit = (
+            spread.exchange_buy.last_ask_price + settings.TRADING_LIMIT_PUFFER
+        )
+        sell_order, buy_order = await asyncio.gather(
+            self._place(spread.exchange_sell, "sell", amount, sell_limit),
+            self._place(spread.exchange_buy, "buy", amount, buy_limit),
+        )
+
+        legs = [
+            (exchange, order)
+            for exchange, order in [
+                (spread.exchange_sell, sell_order),
+                (spread.exchange_buy, buy_order),
+            ]
+            if order is not None
+        ]
+        if len(legs) == 1:
+            # the other leg was rejected, don't keep one side open
+            exchange, order = legs[0]
+            logger.warning(
+                f"Only one leg of {spread} was placed, cancelling it."
+            )
+            try:
+                await self._call(exchange.cancel_order, order)
+            except Exception as error:
+                logger.exception(str(error))
+        else:
+            await asyncio.gather(
+                *(self._track(exchange, order) for exchange, order in legs)
+            )
+
+        trade = Trade(sell_order=sell_order, buy_order=buy_order)
+        if not trade.is_done and any(
+            order is not None and order.state is OrderState.DONE
+            for order in [sell_order, buy_order]
+        ):
+            logger.warning(f"Only one leg of {spread} was executed.")
+        return trade
+
+
 class Trader(UpdateAction):
-    def __init__(self, spread_threshold: Optional[int] = None):
+    def __init__(
+        self,
+        spread_threshold: Optional[int] = None,
+        executor: OrderExecutor = None,
+    ):
         super().__init__(spread_threshold)
         self.spread: Spread = None
         self.state = TraderState.READY
+        self.executor = executor or OrderExecutor()
+        self.pending: Future = None
         # Restart is required to make the trader actually trade again
 
-    def run(
+    def run_inter(
         self,
         spreads: List[Spread],
         exchanges: List[Exchange],
         timestamp: float,
     ):
         if self.state is TraderState.READY:
+            if not spreads:
+                return
             # Get best spread of this update
-            spreads.sort(key=lambda x: x.spread, reverse=True)
-            self.spread = spreads[0]
+            self.spread = max(spreads, key=lambda x: x.spread)
 
             # Evaluate opportunity
             if self._should_use_this_spread() is False:
                 return
 
-            # Execute trade
-            trade = self._make_trade()
-            self._store_trade(trade)
+            # Execute trade, the monitor keeps running meanwhile
+            self._make_trade()
             return
 
         if self.state in [TraderState.TRADE_DONE, TraderState.TRADE_PENDING]:
@@ -59,6 +256,9 @@ class Trader(UpdateAction):
             )
             return
 
+    def run_tri(self, spreads, exchanges, timestamp):
+        pass
+
     def _should_use_this_spread(self):
         above_spread_limit = (
             self.spread.spread > settings.MINIMUM_SPREAD_TRADING
@@ -68,79 +268,35 @@ class Trader(UpdateAction):
     def _make_trade(self):
         """
         Strategy:
-         - Place sell order
-         - Busy Wait until sell order is executed (or TRADING_TIME_UNTIL_ORDER_CANCELLATION is exceeded)
-         - Place buy order
+         - Place sell and buy orders at the same time
+         - Track both until executed, cancelling the ones still pending
+           after TRADING_TIME_UNTIL_ORDER_CANCELLATION
         """
-        # ToDo Test / Review / Make sure we don't fuck up
-        btc_order_amount = settings.TRADING_BTC_AMOUNT
-        time_until_cancellation = datetime.timedelta(
-            seconds=settings.TRADING_TIME_UNTIL_ORDER_CANCELLATION
-        )
         self.state = TraderState.TRADE_PENDING
-
-        #
-        # Sell Order
-        #
-        sell_limit = (
-            self.spread.exchange_sell.last_bid_price
-            - settings.TRADING_LIMIT_PUFFER
+        self.pending = self.executor.submit(
+            self.spread, settings.TRADING_BTC_AMOUNT
         )
-        sell_order: Order = self.spread.exchange_sell.limit_sell_order(
-            btc_order_amount, sell_limit
-        )
-        sell_order_state = sell_order.get_state()
-
-        start_time_sell_order = datetime.datetime.now()
-
-        while sell_order_state is OrderState.PENDING:
-            if (
-                datetime.datetime.now()
-                > start_time_sell_order + time_until_cancellation
-            ):
-                # ToDo: How to handle this?
-                self.spread.exchange_sell.cancel_order(sell_order)
-                logger.warning(
-                    "Trade execution stopped, because sell order was not executed in the wished time."
-                )
-
-            sell_order_state = sell_order.get_state()
-            time.sleep(settings.TRADING_ORDER_STATE_UPDATE_INTERVAL)
-
-        if sell_order_state is OrderState.CANCELLED:
-            # ToDo: How to handle this?
+        self.pending.add_done_callback(self._trade_finished)
+        return self.pending
+
+    def _trade_finished(self, future: Future):
+        try:
+            trade = future.result()
+        except Exception as error:
+            logger.exception(str(error))
             self.state = TraderState.READY
-            logger.warning("Sell Order is cancelled.")
             return
 
-        if sell_order_state is OrderState.DONE:
-            start_time_buy_order = datetime.datetime.now()
-            buy_limit = (
-                self.spread.exchange_buy.last_ask_price
-                + settings.TRADING_LIMIT_PUFFER
-            )
-            buy_order: Order = self.spread.exchange_buy.limit_buy_order(
-                btc_order_amount, buy_limit
-            )
-            buy_order_state = buy_order.get_state()
-
-            while buy_order_state is OrderState.PENDING:
-                if (
-                    datetime.datetime.now()
-                    > start_time_buy_order + time_until_cancellation
-                ):
-                    # ToDo: How to handle this?
-                    self.spread.exchange_buy.cancel_order(buy_order)
-                    logger.warning(
-                        "Trade execution stopped, because buy order was not executed in the wished time."
-                    )
-
-                buy_order_state = buy_order.get_state()
-                time.sleep(settings.TRADING_ORDER_STATE_UPDATE_INTERVAL)
-
-            self.state = TraderState.TRADE_DONE
+        if not any(
+            order is not None and order.state is OrderState.DONE
+            for order in [trade.sell_order, trade.buy_order]
+        ):
+            logger.warning("No order was executed.")
+            self.state = TraderState.READY
+            return
 
-            return Trade(sell_order=sell_order, buy_order=buy_order)
+        self.state = TraderState.TRADE_DONE
+        self._store_trade(trade)
 
     def _store_trade(self, trade: Trade):
         pass  # ToDo
@@ -14,6 +14,11 @@ urlpatterns = [
         view=api_views.TriSpread.as_view(),
         name="tri_spread",
     ),
+    path(
+        route="market-live",
+        view=api_views.LiveMarketData.as_view(),
+        name="market_live",
+    ),
     path(
         route="triangular-monitor",
         view=api_views.TriangularMonitor.as_view(),
@@ -84,4 +89,9 @@ urlpatterns = [
         view=api_views.BacktestV2.as_view(),
         name="backtest_v2",
     ),
+    path(
+        route="jobs/<str:job_id>",
+        view=api_views.JobResult.as_view(),
+        name="job_result",
+    ),
 ]
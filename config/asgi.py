@@ -4,4 +4,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# imported once the apps are loaded
+from arbitrage.api.stream import SPREAD_STREAM_PATH, spread_stream
+
+
+async def application(scope, receive, send):
+    # the live spreads are streamed outside of django, a request would
+    # hold a django worker thread for as long as the client is connected
+    if scope["type"] == "http" and scope["path"] == SPREAD_STREAM_PATH:
+        return await spread_stream(scope, receive, send)
+    return await django_application(scope, receive, send)
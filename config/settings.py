@@ -164,6 +164,58 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {"ACCESS_TOKEN_LIFETIME": timedelta(hours=1)}
 
 
+# Live spreads ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+
+
+
+# The monitors send their spreads to the unix sockets the ASGI workers bind
+# in this directory, see arbitrage.api.stream.
+LIVE_SPREADS_DIR = BASE_DIR / "monitor_ref" / "live"
+# The live spreads are one of the topics of the market data bus, its quotes
+# and spreads go through the same sockets, see arbitrage.bus.
+MARKET_BUS_DIR = LIVE_SPREADS_DIR
+
+
+# Markets ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+
+
+
+# The markets of the ccxt exchanges are persisted there and loaded from
+# the exchanges again after MARKETS_TTL, see crypto_bot.services.markets.
+MARKETS_CACHE_DIR = BASE_DIR / "monitor_ref" / "markets"
+MARKETS_TTL = 6 * 60 * 60  # seconds
+# Loaded when startmonitor and startjobs start, the exchanges they use.
+MARKETS_WARM = ["binance", "bitfinex", "bitstamp"]
+# Exchanges fetched at once by feed_exchange_history populate.
+POPULATE_WORKERS = 8
+# Same for the coins and currencies supported by coingecko.
+COINGECKO_CACHE_FILE = BASE_DIR / "monitor_ref" / "coingecko.json"
+COINGECKO_TTL = 24 * 60 * 60  # seconds
+
+# Connections kept alive per host and retry policy of the requests sent
+# to the exchanges, see crypto_bot.services.http_pool.
+HTTP_POOL_SIZE = 10
+HTTP_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+HTTP_RETRIES = 3
+HTTP_BACKOFF_FACTOR = 0.3
+
+
+# Jobs +~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+
+
+
+# The backtests and historical data commands of the api run in the worker
+# pool of manage.py startjobs, see arbitrage.jobs.
+JOBS_ADDRESS = BASE_DIR / "monitor_ref" / "jobs.sock"
+JOBS_WORKERS = 4
+JOBS_AUTHKEY = os.environ.get("JOBS_AUTHKEY", "").encode() or None
+# generated by startjobs when JOBS_AUTHKEY isn't set
+JOBS_AUTHKEY_FILE = BASE_DIR / "monitor_ref" / "jobs.key"
+# seconds a request waits for its job, then it answers with the job id.
+# kept short, a request waiting for a job holds its web worker
+JOBS_WAIT_TIMEOUT = 1
+# results of the historical data jobs served again to identical requests
+JOBS_CACHE_SIZE = 100
+JOBS_CACHE_TTL = 60 * 60  # seconds
+
+
 # Logging ~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~+~
 
 
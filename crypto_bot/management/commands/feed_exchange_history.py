@@ -1,13 +1,21 @@
 import json
 import os
+import queue
 import sys
+import threading
+import time
 import warnings
 import pprint
 import datetime
 
+from concurrent.futures import ThreadPoolExecutor
+
 import ccxt
+import numpy as np
 from django.conf import settings
 from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
 from django.utils.timezone import make_aware
 from django.conf import settings
 import arbitrage.models
@@ -15,6 +23,7 @@ import arbitrage.models
 from crypto_bot.models import *
 from crypto_bot.services.ccxt_api import CCXTApiHandler as handler
 from crypto_bot.services.coingecko import CoinGeckoHandler as gecko_handler
+from crypto_bot.services.markets import market_registry
 
 
 LIST_GENERAL_TRADE_PAIR_PARAMS = [
@@ -26,6 +35,16 @@ LIST_GENERAL_TRADE_PAIR_PARAMS = [
     "cache",
 ]
 
+# rows per INSERT statement when committing candles
+TICKER_BATCH_SIZE = 1000
+
+POPULATE_GRANULARITIES = ['1d', '1h']
+POPULATE_CHECKPOINT = os.path.join(
+    settings.BASE_DIR, 'populate_checkpoint.json'
+)
+POPULATE_REPORT_INTERVAL = 10  # seconds
+POPULATE_QUEUE_SIZE = 100  # pages fetched waiting to be saved
+
 
 class Command(BaseCommand):
     """
@@ -101,6 +120,21 @@ class Command(BaseCommand):
             default=False
         )
 
+        parser.add_argument(
+            "--sync",
+            help="fetch the candles missing since the last one stored until "
+            "now, for every market stored or the ones matching --exchange, "
+            "--trade_pair and --granularity.",
+            action="store_true",
+            default=False
+        )
+        parser.add_argument(
+            "--checkpoint",
+            type=str,
+            help="file keeping the progress of --populate, running it again "
+            "resumes from the last candle saved of every market.",
+        )
+
         parser.add_argument(
             "--currency",
             help=" currency to gather values from for the provided coin_id, (run only with command "
@@ -201,9 +235,19 @@ class Command(BaseCommand):
                         indent=4
                     )
                 )
+        elif options.get("sync"):
+            params = dict(
+                exchange=options['exchange'],
+                trade_pair=options['trade_pair'],
+                granularity=options['granularity'],
+                time_frame=options['time_frame'],
+            )
+            candles = self.sync(params)
+            print(json.dumps(dict(candles=candles)))
         elif options.get("populate"):
             params = dict(
                 time_frame=options['time_frame'],
+                checkpoint=options['checkpoint'],
             )
             self.populate(params)
         elif options.get("list_general_trade_pair_ohlcv"):
@@ -245,9 +289,7 @@ class Command(BaseCommand):
         available list of exchanges supported at the moment.
         """
         exchange = params["exchange"]
-        exchange = getattr(ccxt, exchange.lower())()
-        exchange.load_markets()
-        t1 = exchange.markets
+        t1 = market_registry.markets(exchange.lower())
 
         markets = [
             v['symbol']
@@ -286,12 +328,11 @@ class Command(BaseCommand):
         for key in params.keys():
             if key not in LIST_GENERAL_TRADE_PAIR_PARAMS:
                 error = f"Missing {key} param"
-                warning.warn(error, UserWarning, stacklevel=2)
+                warnings.warn(error, UserWarning, stacklevel=2)
                 return False, error
 
         coin_id = params["coin_id"]
         currency = params["currency"]
-        t1 = params['time_frame'].split('/')
         date_from = params["since"]
         date_to = params["limit"]
         cache = params["cache"]
@@ -302,7 +343,7 @@ class Command(BaseCommand):
         dt = make_aware(dt)
 
         try:
-            if coin_id not in self.obj_handler_gecko.supported_coins:
+            if not self.obj_handler_gecko.is_supported_coin(coin_id):
                 return (
                     False,
                     f"{coin_id} is not supported, try a different one.",
@@ -417,6 +458,10 @@ class Command(BaseCommand):
             :param since: time to start fetching: this is a timestamp of a date obj
             :param limit: time to stop fetching from: this is a timestamp of a date obj
             :param granularity: how long the difference is between records
+            :param progress: optional function(done, total) called after
+            every page with the seconds of the time frame fetched so far
+            :param commit: the candles are saved and the ones stored in
+            the time frame are returned
         :return:json
         """
         t1 = params['time_frame'].split('/')
@@ -427,12 +472,14 @@ class Command(BaseCommand):
         t8 = '%s/%s' % (t3[0], t3[1])
         t11 = params['cache']
         t17 = params["granularity"]
+        progress = params.get("progress")
 
         t12 = arbitrage.models.Ticker.objects.all().filter(
             timestamp__gte=t4.timestamp(),
             timestamp__lt=t5.timestamp(),
             exchange=t2,
             trade_pair=t8,
+            granularity=t17,
         )
         t14 = t12.count() > 0
         t15 = params['commit']
@@ -441,54 +488,40 @@ class Command(BaseCommand):
             exchange = self.obj_handler.load_exchange_manager(
                 exchange=t2,
             )
-            t6 = t4
             data = []
 
-            while t6 < t5 and not t14:
-                t7 = self.obj_handler.list_ohlcvs(
-                    exchange_obj=exchange,
-                    symbol=t8,
-                    since=int(t6.timestamp()) * 1000,
-                    limit=1000,
-                    timeframe=t17,
-                )
-                t10 = [
-                    dict(
-                        timestamp=int(o[0] / 1000),
-                        open=float(o[1]),
-                        high=float(o[2]),
-                        low=float(o[3]),
-                        close=float(o[4]),
-                        volume=float(o[5]),
-                    )
-                    for o in t7
-                ]
-
-                if len(t10) == 0:
-                    break
-
-                t6 = datetime.datetime.fromtimestamp(
-                    t10[-1]['timestamp'] + 1
+            if t15:
+                # only the ranges missing in the stored candles are fetched
+                t18 = self.missing_ranges(
+                    t2, t8, t17, t4.timestamp(), t5.timestamp()
                 )
-
-                if t15:
-                    for t9 in t10:
-                        t13 = arbitrage.models.Ticker.objects.create(
-                            timestamp=t9['timestamp'],
-                            open=t9['open'],
-                            high=t9['high'],
-                            low=t9['low'],
-                            close=t9['close'],
-                            volume=t9['volume'],
+            elif not t14:
+                t18 = [(t4.timestamp(), t5.timestamp())]
+            else:
+                t18 = []
+
+            total = int(sum(t20 - t19 for t19, t20 in t18))
+            fetched = 0
+            for t19, t20 in t18:
+                for t10 in self.iter_ohlcv_pages(exchange, t8, t17, t19, t20):
+                    if t15:
+                        self.commit_candles(
+                            t10,
                             exchange=t2,
                             trade_pair=t8,
                             granularity=t17,
                         )
-                        t13.save()
-                        del t13
-                else:
-                    data.extend(t10)
-        else:
+                    else:
+                        data.extend(t10)
+                    if progress is not None:
+                        progress(
+                            fetched + int(t10[-1]['timestamp'] - t19), total
+                        )
+                fetched += int(t20 - t19)
+            if progress is not None:
+                progress(total, total)
+        if t11 or t15:
+            # the stored candles, those just committed included
             for o in t12:
                 assert o.exchange == t2
                 assert o.trade_pair == t8
@@ -508,41 +541,337 @@ class Command(BaseCommand):
 
         return True, data
 
-    def populate(self, params):
-        t1 = self.list_exchanges()[1]
-        t2 = {
-            k : self.list_trade_pairs_by_exchange(
-                dict(
-                    exchange=k,
-                )
-            )[1]
-            for k in t1
+    def missing_ranges(self, exchange, trade_pair, granularity, since, until):
+        """
+        computes the ranges of the time frame without stored candles from
+        the timestamps saved, the candle still open isn't considered
+        missing since it isn't final yet.
+        :param exchange: str
+        :param trade_pair: str
+        :param granularity: str: e.g. 1h
+        :param since: float: timestamp
+        :param until: float: timestamp
+        :return: list of (since, until) tuples
+        """
+        step = ccxt.Exchange.parse_timeframe(granularity)
+        until = min(until, time.time() // step * step)
+        if since >= until:
+            return []
+
+        timestamps = np.fromiter(
+            arbitrage.models.Ticker.objects.series(
+                exchange, trade_pair, granularity, since, until
+            ).values_list('timestamp', flat=True),
+            dtype=float,
+        )
+        if len(timestamps) == 0:
+            return [(since, until)]
+
+        ranges = []
+        if timestamps[0] - since >= step:
+            ranges.append((since, timestamps[0]))
+        for index in np.flatnonzero(np.diff(timestamps) > step):
+            ranges.append((timestamps[index] + 1, timestamps[index + 1]))
+        if timestamps[-1] + step < until:
+            ranges.append((timestamps[-1] + 1, until))
+        return ranges
+
+    def sync(self, params):
+        """
+        brings the stored candles up to date: each stored (exchange,
+        trade pair, granularity) is fetched from its last candle until
+        now, so running it periodically costs about one page per market.
+        the filters narrow the markets synced, with a time_frame the
+        markets without candles yet are fetched from its start.
+        :param params: dict: exchange, trade_pair, granularity, time_frame
+        :return: int: candles fetched
+        """
+        series = arbitrage.models.Ticker.objects.all()
+        for field in ['exchange', 'trade_pair', 'granularity']:
+            if params.get(field):
+                series = series.filter(**{field: params[field]})
+        last = {
+            (o['exchange'], o['trade_pair'], o['granularity']): o['last']
+            for o in series.values(
+                'exchange', 'trade_pair', 'granularity'
+            ).annotate(last=Max('timestamp'))
         }
-        for k, v in t2.items():
-            t15 = arbitrage.models.Ticker.objects.all().filter(
-                exchange=k,
+
+        if params.get('time_frame'):
+            since = datetime.datetime.strptime(
+                params['time_frame'].split('/')[0], '%d%m%Y'
+            ).timestamp()
+            key = (
+                params.get('exchange'),
+                params.get('trade_pair'),
+                params.get('granularity'),
             )
-            t16 = t15.count()
-            if t16:
-                continue
+            if all(key):
+                last.setdefault(key, since - 1)
+
+        exchanges = {}
+        candles = 0
+        for (exchange, trade_pair, granularity), t1 in sorted(last.items()):
+            if exchange not in exchanges:
+                exchanges[exchange] = self.obj_handler.load_exchange_manager(
+                    exchange=exchange,
+                )
+            for t19, t20 in self.missing_ranges(
+                exchange, trade_pair, granularity, t1 + 1, time.time()
+            ):
+                for page in self.iter_ohlcv_pages(
+                    exchanges[exchange], trade_pair, granularity, t19, t20
+                ):
+                    candles += self.commit_candles(
+                        page,
+                        exchange=exchange,
+                        trade_pair=trade_pair,
+                        granularity=granularity,
+                    )
+            self.stdout.write(f"{exchange} {trade_pair} {granularity} synced")
+        return candles
 
-            for t3 in v:
-                for t4 in ['1d', '1h']:
-                    pprint.pprint(
-                        dict(
-                            granularity=t4,
-                            exchange=k,
-                            trade_pair=t3.split('/')[0:2],
-                        )
+    def iter_ohlcv_pages(self, exchange_obj, symbol, timeframe, since, until):
+        """
+        fetches the candles of the symbol page by page from since until
+        the given timestamp or until the exchange has no more candles.
+        :param exchange_obj: ccxt exchange object
+        :param symbol: str: e.g. BTC/USDT
+        :param timeframe: str: granularity, e.g. 1h
+        :param since: float: timestamp in seconds
+        :param until: float: timestamp in seconds
+        :return: generator of lists of dict
+        """
+        while since < until:
+            t7 = self.obj_handler.list_ohlcvs(
+                exchange_obj=exchange_obj,
+                symbol=symbol,
+                since=int(since) * 1000,
+                limit=1000,
+                timeframe=timeframe,
+            )
+            page = [
+                dict(
+                    timestamp=int(o[0] / 1000),
+                    open=float(o[1]),
+                    high=float(o[2]),
+                    low=float(o[3]),
+                    close=float(o[4]),
+                    volume=float(o[5]),
+                )
+                for o in t7
+                if o[0] / 1000 < until
+            ]
+            if len(page) == 0:
+                break
+            yield page
+            since = page[-1]['timestamp'] + 1
+
+    def commit_candles(self, candles, exchange, trade_pair, granularity):
+        """
+        saves a fetched page of candles in one transaction with bulk
+        inserts, candles already stored are skipped by the unique
+        constraint of the ticker so fetching a range again is safe.
+        :param candles: list of dict: timestamp, open, high, low, close, volume
+        :param exchange: str
+        :param trade_pair: str
+        :param granularity: str
+        :return: int: number of candles sent
+        """
+        with transaction.atomic():
+            arbitrage.models.Ticker.objects.bulk_create(
+                [
+                    arbitrage.models.Ticker(
+                        exchange=exchange,
+                        trade_pair=trade_pair,
+                        granularity=granularity,
+                        **candle,
                     )
-                    self.list_exchange_trade_pair_ohlcv(
-                        dict(
-                            trade_pair=t3.split('/')[0:2],
-                            time_frame=params['time_frame'],
-                            granularity=t4,
-                            exchange=k,
-                            cache=False,
-                            commit=True,
-                        )
+                    for candle in candles
+                ],
+                batch_size=TICKER_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+        return len(candles)
+
+    def populate(self, params):
+        """
+        backfills the candles of every market of every exchange listed
+        for the POPULATE_GRANULARITIES in the time frame.
+
+        every exchange is fetched by a worker with a single ccxt object
+        with rate limiting enabled, so the requests of an exchange respect
+        its rateLimit while up to POPULATE_WORKERS exchanges are fetched
+        in parallel. the pages are saved by this thread as they arrive,
+        the database only has one writer. when saving fails the workers
+        are stopped and the error is raised.
+
+        the last timestamp saved of each (exchange, pair, granularity) is
+        written to the checkpoint file after every page, running it again
+        resumes from there.
+        :param params: dict: time_frame DDMMYYYY/DDMMYYYY, checkpoint path
+        :return: int: candles saved
+        """
+        t1 = params['time_frame'].split('/')
+        since = datetime.datetime.strptime(t1[0], '%d%m%Y').timestamp()
+        until = datetime.datetime.strptime(t1[1], '%d%m%Y').timestamp()
+        checkpoint = BackfillCheckpoint(
+            params.get('checkpoint') or POPULATE_CHECKPOINT
+        )
+        progress = BackfillProgress(self.stdout)
+        pages = queue.Queue(maxsize=POPULATE_QUEUE_SIZE)
+        exchanges = self.list_exchanges()[1]
+        if not exchanges:
+            return 0
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(
+            max_workers=min(len(exchanges), settings.POPULATE_WORKERS),
+            thread_name_prefix="backfill",
+        ) as pool:
+            futures = [
+                pool.submit(
+                    self.populate_exchange,
+                    exchange,
+                    since,
+                    until,
+                    checkpoint,
+                    pages,
+                    stop,
+                )
+                for exchange in exchanges
+            ]
+            running = len(futures)
+            try:
+                while running:
+                    key, page = pages.get()
+                    if page is None:
+                        running -= 1
+                        continue
+                    exchange, trade_pair, granularity = key
+                    self.commit_candles(
+                        page,
+                        exchange=exchange,
+                        trade_pair=trade_pair,
+                        granularity=granularity,
                     )
-        raise NotImplementedError()
+                    checkpoint.set(key, page[-1]['timestamp'])
+                    progress.add(exchange, len(page))
+            finally:
+                if running:
+                    # the pool waits for its workers on exit, they may be
+                    # blocked on the full queue
+                    stop.set()
+                    while running:
+                        if pages.get()[1] is None:
+                            running -= 1
+
+        progress.report(final=True)
+        return progress.total
+
+    def populate_exchange(
+        self, exchange, since, until, checkpoint, pages, stop
+    ):
+        """
+        fetches every market of one exchange into the pages queue as
+        (key, page), (exchange, None) is sent when it's done or once stop
+        is set. see populate
+        :return: None
+        """
+        try:
+            if stop.is_set():
+                return
+            # loaded once and shared, load_exchange_manager sets them on
+            # the instance so ccxt doesn't load them again
+            markets = market_registry.markets(exchange)
+            exchange_obj = self.obj_handler.load_exchange_manager(
+                exchange=exchange,
+            )
+            exchange_obj.enableRateLimit = True
+            trade_pairs = [
+                v['symbol']
+                for k, v in markets.items()
+                if k == v['symbol'] == '%s/%s' % (v['base'], v['quote'])
+            ]
+            for trade_pair in trade_pairs:
+                for granularity in POPULATE_GRANULARITIES:
+                    key = (exchange, trade_pair, granularity)
+                    start = max(since, checkpoint.get(key, since - 1) + 1)
+                    try:
+                        for page in self.iter_ohlcv_pages(
+                            exchange_obj, trade_pair, granularity, start, until
+                        ):
+                            if stop.is_set():
+                                return
+                            pages.put((key, page))
+                    except Exception as error:
+                        # keep going with the next market, the checkpoint
+                        # resumes this one on the next run
+                        logger.warning(f"{key}: {error}")
+        except Exception as error:
+            logger.exception(f"{exchange}: {error}")
+        finally:
+            pages.put((exchange, None))
+
+
+class BackfillCheckpoint:
+    """
+    last timestamp saved per (exchange, trade pair, granularity),
+    stored as json so an interrupted populate resumes where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = {}
+        if os.path.isfile(path):
+            with open(path) as file:
+                self.data = json.load(file)
+
+    @staticmethod
+    def _key(key):
+        return '|'.join(key)
+
+    def get(self, key, default=None):
+        return self.data.get(self._key(key), default)
+
+    def set(self, key, timestamp):
+        self.data[self._key(key)] = timestamp
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as file:
+            json.dump(self.data, file)
+        os.replace(tmp_path, self.path)
+
+
+class BackfillProgress:
+    """
+    counts the candles saved per exchange and reports the throughput
+    every POPULATE_REPORT_INTERVAL seconds.
+    """
+
+    def __init__(self, stdout):
+        self.stdout = stdout
+        self.started = time.monotonic()
+        self.reported = self.started
+        self.candles = {}
+
+    @property
+    def total(self):
+        return sum(self.candles.values())
+
+    def add(self, exchange, count):
+        self.candles[exchange] = self.candles.get(exchange, 0) + count
+        if time.monotonic() - self.reported >= POPULATE_REPORT_INTERVAL:
+            self.report()
+
+    def report(self, final=False):
+        now = time.monotonic()
+        self.reported = now
+        elapsed = max(now - self.started, 1e-9)
+        per_exchange = ', '.join(
+            f"{exchange}: {count}" for exchange, count in self.candles.items()
+        )
+        self.stdout.write(
+            f"{'done, ' if final else ''}{self.total} candles in "
+            f"{elapsed:.0f}s ({self.total / elapsed:.1f} candles/sec) "
+            f"[{per_exchange}]"
+        )
@@ -6,6 +6,7 @@ import requests
 import hashlib
 from binance.client import Client
 from .ccxt_api import GenericExchangeHandler
+from .markets import market_registry
 
 
 # need to be complete
@@ -123,14 +124,11 @@ class BinanceHandler(GenericExchangeHandler):
     @property
     def supported_markets(self):
         """
-        lists all supported exchanges for binance
-        :return:list
+        lists all supported exchanges for binance, the symbols of the
+        api (BTCUSDT) are the ids of the markets of ccxt
+        :return: dict id -> market, loaded once by market_registry
         """
-        exchanges = [
-            symbol["symbol"]
-            for symbol in self.handler.get_exchange_info()["symbols"]
-        ]
-        return exchanges
+        return market_registry.markets_by_id("binance")
 
     def serialize_data(self, **kwargs):
         """
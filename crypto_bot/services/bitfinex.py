@@ -167,7 +167,7 @@ class BitfinexHandler(GenericExchangeHandler):
     def api_status(self):
         status = 'DOWN'
         try:
-            response = requests.get(self.api_endpoints["api_status"]).json()[0]
+            response = self.session_pool.get(self.api_endpoints["api_status"]).json()[0]
             if response == 1:
                 status = 'ACTIVE'
 
@@ -185,7 +185,9 @@ class BitfinexHandler(GenericExchangeHandler):
         """
         result = None
         try:
-            response = requests.get(self.api_endpoints["available_exchanges"], timeout=900)
+            response = self.session_pool.get(
+                self.api_endpoints["available_exchanges"], timeout=900
+            )
             assert (
                 response.status_code == 200
             ), f"There was a error with the request.{response.json()}"
@@ -203,7 +205,7 @@ class BitfinexHandler(GenericExchangeHandler):
         lists all supported exchanges for bitfinex
         :return:
         """
-        response = requests.get(self.api_endpoints["available_currencies"])
+        response = self.session_pool.get(self.api_endpoints["available_currencies"])
         assert (
             response.status_code == 200
         ), f"There was a error with the request.{response.json()}"
@@ -215,7 +217,7 @@ class BitfinexHandler(GenericExchangeHandler):
         lists all supported exchanges for bitfinex
         :return:
         """
-        response = requests.get(
+        response = self.session_pool.get(
             self.api_endpoints["available_margins_trade_pairs"]
         )
         assert (
@@ -7,6 +7,9 @@ from binance.client import Client as binance_client
 from ccxt.base.errors import NotSupported, BadSymbol, BadRequest, BaseError
 from abc import abstractmethod
 
+from .http_pool import http_pool
+from .markets import market_registry
+
 
 class CCXTApiHandler(object):
     """
@@ -33,7 +36,11 @@ class CCXTApiHandler(object):
             exchange in self.supported_exchanges.keys()
         ), f"The exchange provided: {exchange} is not supported."
 
-        return self.supported_exchanges[exchange](config=exchange_config)
+        exchange_obj = self.supported_exchanges[exchange](
+            config=exchange_config
+        )
+        market_registry.attach(exchange_obj)
+        return exchange_obj
 
     def get_supported_markets(self, exchange_obj):
         """
@@ -95,13 +102,13 @@ class CCXTApiHandler(object):
         markets in the exchange
         :param exchange_obj: exchange object
         :param market_id: str identifier of the market
-        :param params: dict, params to get the market
+        :param params: dict, not used anymore, the markets come from
+        market_registry
         :return: dict
         """
-        markets = self.list_markets(exchange_obj, params)
-        for market in markets:
-            if market["id"] == market_id:
-                return market
+        market = market_registry.markets_by_id(exchange_obj.id).get(market_id)
+        if market is not None:
+            return market
         raise AttributeError(
             f"the specified market {market_id} doesn't exist"
         ) from None
@@ -251,8 +258,12 @@ class GenericExchangeHandler(object):
 
     symbol == trade pair in other exchanges
 
+    requests go through the shared http_pool so connections
+    to the exchange are kept alive between calls.
     """
 
+    session_pool = http_pool
+
     def __init__(self, config):
         self.config = config
         self.validate_config()
@@ -279,7 +290,7 @@ class GenericExchangeHandler(object):
         :param params: dict
         :return: dict
         """
-        return requests.post(url, headers=headers, data=request_body)
+        return self.session_pool.post(url, headers=headers, data=request_body)
 
     def _get(self, url, headers, params={}):
         """
@@ -289,7 +300,7 @@ class GenericExchangeHandler(object):
         :param params: dict
         :return: dict
         """
-        return requests.get(url, headers=headers, params=params)
+        return self.session_pool.get(url, headers=headers, params=params)
 
     def _delete(self, url, headers, request_body={}):
         """
@@ -299,7 +310,9 @@ class GenericExchangeHandler(object):
         :param request_body:
         :return: dict
         """
-        return requests.delete(url=url, headers=headers, data=request_body)
+        return self.session_pool.delete(
+            url, headers=headers, data=request_body
+        )
 
     def process_request(self, url, headers, method, request_body={}):
         """
@@ -1,6 +1,15 @@
 import json
+import logging
+import os
+import threading
+import time
+
 import requests as rq
 import pycoingecko as coingecko
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
 
 
 class CoinGeckoHandler(object):
@@ -9,12 +18,122 @@ class CoinGeckoHandler(object):
     which is only an implementation of
     the public API coingecko with the
     pythond sdk.
+
+    the coins and currencies supported are loaded on first use, not when
+    the handler is created, and persisted to COINGECKO_CACHE_FILE so the
+    next processes start from there. once they're older than
+    COINGECKO_TTL they're loaded again in the background.
     """
 
-    def __init__(self):
-        self.coin_manager = self.load_manager()
-        self.supported_currencies = self.load_supported_currencies()
-        self.supported_coins = [coin["id"] for coin in self.list_coins()]
+    def __init__(self, cache_file=None, ttl=None):
+        """
+        :param cache_file: str: COINGECKO_CACHE_FILE by default
+        :param ttl: float: seconds, COINGECKO_TTL by default
+        """
+        self._cache_file = cache_file
+        self._ttl = ttl
+        self._coin_manager = None
+        # {"timestamp": float, "coins": {id: coin}, "currencies": list}
+        self._universe = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    @property
+    def coin_manager(self):
+        if self._coin_manager is None:
+            self._coin_manager = self.load_manager()
+        return self._coin_manager
+
+    @property
+    def cache_file(self):
+        return str(self._cache_file or settings.COINGECKO_CACHE_FILE)
+
+    @property
+    def ttl(self):
+        return self._ttl or settings.COINGECKO_TTL
+
+    def _get_universe(self):
+        universe = self._universe
+        if universe is None:
+            with self._lock:
+                if self._universe is None:
+                    self._universe = (
+                        self._read_universe() or self._fetch_universe()
+                    )
+                universe = self._universe
+        if time.time() - universe["timestamp"] > self.ttl:
+            self._refresh()
+        return universe
+
+    def _read_universe(self):
+        try:
+            with open(self.cache_file) as file:
+                universe = json.load(file)
+            for key in ["timestamp", "coins", "currencies"]:
+                if key not in universe:
+                    raise KeyError(key)
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as error:
+            logger.warning(f"Ignoring the cached coingecko coins: {error}")
+            return None
+        return universe
+
+    def _fetch_universe(self):
+        universe = {
+            "timestamp": time.time(),
+            "coins": {coin["id"]: coin for coin in self.load_coins()},
+            "currencies": self.load_supported_currencies(),
+        }
+        try:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            temporary = f"{self.cache_file}.{os.getpid()}"
+            with open(temporary, "w") as file:
+                json.dump(universe, file)
+            os.replace(temporary, self.cache_file)
+        except OSError as error:
+            logger.warning(f"Couldn't persist the coingecko coins: {error}")
+        return universe
+
+    def _refresh(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._universe = self._fetch_universe()
+            except Exception as error:
+                logger.warning(
+                    f"Couldn't refresh the coingecko coins: {error}"
+                )
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="coingecko", daemon=True).start()
+
+    @property
+    def supported_currencies(self):
+        """
+        :return: list of str: e.g. usd
+        """
+        return self._get_universe()["currencies"]
+
+    @property
+    def supported_coins(self):
+        """
+        :return: list of str: ids of the coins, use is_supported_coin to
+        look one up
+        """
+        return list(self._get_universe()["coins"])
+
+    def is_supported_coin(self, coin_id):
+        """
+        :param coin_id: str
+        :return: bool
+        """
+        return coin_id in self._get_universe()["coins"]
 
     def load_supported_currencies(self):
         """
@@ -33,26 +152,33 @@ class CoinGeckoHandler(object):
         """
         return coingecko.CoinGeckoAPI()
 
+    def load_coins(self):
+        """
+        downloads the id, symbol and name of every coin of coingecko
+        :return: list of dict
+        """
+        return self.coin_manager.get_coins_list()
+
     def list_coins(self):
         """
         lists all coins supported by
         coingecko
-        :return: dict
+        :return: list of dict
         """
-        return self.coin_manager.get_coins()
+        return list(self._get_universe()["coins"].values())
 
     def get_coin(self, coin_id):
         """
         gets the details of the given coin provided
         :param coin_id: str
-        :return: dict
-        """
-        for coin in self.list_coins():
-            if coin["id"] == coin_id:
-                return coin
-        raise AttributeError(
-            f"The coin {coin_id} does not exist in coingecko."
-        )
+        :return: dict: id, symbol and name
+        """
+        coin = self._get_universe()["coins"].get(coin_id)
+        if coin is None:
+            raise AttributeError(
+                f"The coin {coin_id} does not exist in coingecko."
+            )
+        return coin
 
     def get_coins_prices(self, ids, currencies):
         """
@@ -0,0 +1,163 @@
+import logging
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HTTPSessionPool(object):
+    """
+    keeps one requests session per host so the TCP/TLS
+    connections are kept alive and reused between requests
+    instead of doing a new handshake on every call.
+
+    retries only apply to idempotent methods, a POST that
+    reached the exchange is never sent twice.
+
+    the arguments left to None are read from the HTTP_* settings
+    when they're used, the module level http_pool is created before
+    django is configured.
+    """
+
+    def __init__(
+        self,
+        pool_size=None,
+        timeout=None,
+        retries=None,
+        backoff_factor=None,
+        retry_statuses=DEFAULT_RETRY_STATUSES,
+    ):
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._retries = retries
+        self._backoff_factor = backoff_factor
+        self.retry_statuses = retry_statuses
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def pool_size(self):
+        return self._pool_size or settings.HTTP_POOL_SIZE
+
+    @property
+    def timeout(self):
+        return self._timeout or settings.HTTP_TIMEOUT
+
+    @property
+    def retries(self):
+        if self._retries is None:
+            return settings.HTTP_RETRIES
+        return self._retries
+
+    @property
+    def backoff_factor(self):
+        if self._backoff_factor is None:
+            return settings.HTTP_BACKOFF_FACTOR
+        return self._backoff_factor
+
+    def _build_session(self):
+        """
+        creates a session with a connection pool adapter
+        and the retry policy configured
+        :return: requests.Session
+        """
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def session(self, url):
+        """
+        gets the session shared by every request made to the host of the url
+        :param url: str
+        :return: requests.Session
+        """
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = self._build_session()
+                    self._sessions[host] = session
+        return session
+
+    def request(self, method, url, **kwargs):
+        """
+        sends a request through the pooled session of the host
+        :param method: str: get, post, delete...
+        :param url: str
+        :param kwargs: any keyword argument accepted by requests
+        :return: requests.Response
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session(url).request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    @property
+    def stats(self):
+        """
+        connection reuse statistics per host, reused is the
+        number of requests that didn't need a new connection.
+        :return: dict
+        """
+        stats = {}
+        for host, session in list(self._sessions.items()):
+            adapter = session.get_adapter(host)
+            pools = adapter.poolmanager.pools
+            requests_count = 0
+            connections = 0
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+            stats[host] = {
+                "requests": requests_count,
+                "connections": connections,
+                "reused": max(requests_count - connections, 0),
+            }
+        return stats
+
+    def close(self):
+        """
+        closes every session and its open connections
+        :return: None
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+
+http_pool = HTTPSessionPool()
@@ -0,0 +1,282 @@
+"""
+market metadata of the ccxt exchanges, loaded once and shared.
+
+load_markets is one of the heaviest calls of ccxt (thousands of markets
+for the big exchanges) and the markets barely change, yet every command
+and handler created its own exchange instance and loaded them again. the
+registry keeps one instance per exchange, indexes its markets by symbol
+and by id, persists them to MARKETS_CACHE_DIR and refreshes them in the
+background once they're older than MARKETS_TTL, the callers keep being
+answered from the previous markets meanwhile.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import ccxt
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_spot(market: dict) -> bool:
+    return market.get("spot", market.get("type", "spot") == "spot")
+
+
+class Markets:
+    def __init__(self, markets: list, currencies: dict, timestamp: float):
+        """
+        :param markets: list of dict: ccxt markets
+        :param currencies: dict: ccxt currencies, may be empty
+        :param timestamp: float: when they were loaded from the exchange
+        """
+        self.timestamp = timestamp
+        self.currencies = currencies
+        self.by_symbol: Dict[str, dict] = {
+            market["symbol"]: market for market in markets
+        }
+        # ids aren't unique (binance's spot BTC/USDT and swap
+        # BTC/USDT:USDT are both BTCUSDT), the spot market comes first
+        self.by_id: Dict[str, List[dict]] = {}
+        for market in markets:
+            self.by_id.setdefault(market["id"], []).append(market)
+        for same_id in self.by_id.values():
+            same_id.sort(key=lambda market: not _is_spot(market))
+        self.first_by_id: Dict[str, dict] = {
+            market_id: same_id[0] for market_id, same_id in self.by_id.items()
+        }
+
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+    def to_json(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "markets": list(self.by_symbol.values()),
+            "currencies": self.currencies,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Markets":
+        return cls(data["markets"], data["currencies"], data["timestamp"])
+
+
+class MarketRegistry:
+    def __init__(
+        self, path: Optional[str] = None, ttl: Optional[float] = None
+    ):
+        """
+        :param path: str: directory of the persisted markets,
+        MARKETS_CACHE_DIR by default
+        :param ttl: float: seconds until the markets are refreshed,
+        MARKETS_TTL by default
+        """
+        self._path = path
+        self._ttl = ttl
+        self._exchanges: Dict[str, ccxt.Exchange] = {}
+        self._markets: Dict[str, Markets] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        # one per exchange, a cold start loads every exchange only once
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def path(self) -> str:
+        return str(self._path or settings.MARKETS_CACHE_DIR)
+
+    @property
+    def ttl(self) -> float:
+        return self._ttl or settings.MARKETS_TTL
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, f"{name}.json")
+
+    def _load_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(name, threading.Lock())
+
+    def exchange(self, name: str) -> ccxt.Exchange:
+        """
+        the exchange instance shared by everyone, without credentials,
+        with its markets set so ccxt doesn't load them again
+        :param name: str: ccxt id, e.g. binance
+        :return: ccxt.Exchange
+        """
+        self.markets(name)
+        return self._exchange(name)
+
+    def _exchange(self, name: str) -> ccxt.Exchange:
+        with self._lock:
+            exchange = self._exchanges.get(name)
+            if exchange is None:
+                exchange = getattr(ccxt, name)({"enableRateLimit": True})
+                self._exchanges[name] = exchange
+            return exchange
+
+    def _get(self, name: str) -> Markets:
+        """
+        the markets in memory, then on disk, then from the exchange, the
+        stale ones are returned and refreshed in the background
+        """
+        markets = self._markets.get(name)
+        if markets is None:
+            if name not in ccxt.exchanges:
+                raise ValueError(f"{name} isn't a ccxt exchange.")
+            with self._load_lock(name):
+                markets = self._markets.get(name)
+                if markets is None:
+                    markets = self._read(name) or self._fetch(name)
+                    self._set(name, markets)
+        if markets.age() > self.ttl:
+            self.refresh(name, wait=False)
+        return markets
+
+    def _set(self, name: str, markets: Markets):
+        self._markets[name] = markets
+        self._exchange(name).set_markets(
+            list(markets.by_symbol.values()), markets.currencies or None
+        )
+
+    def _read(self, name: str) -> Optional[Markets]:
+        try:
+            with open(self._file(name)) as file:
+                return Markets.from_json(json.load(file))
+        except FileNotFoundError:
+            return None
+        except (ValueError, KeyError) as error:
+            logger.warning(f"Ignoring the cached markets of {name}: {error}")
+            return None
+
+    def _write(self, name: str, markets: Markets):
+        os.makedirs(self.path, exist_ok=True)
+        temporary = f"{self._file(name)}.{os.getpid()}"
+        with open(temporary, "w") as file:
+            json.dump(markets.to_json(), file)
+        # readers never see a half written file
+        os.replace(temporary, self._file(name))
+
+    def _fetch(self, name: str) -> Markets:
+        # an instance of its own, the shared one keeps serving meanwhile
+        exchange = getattr(ccxt, name)({"enableRateLimit": True})
+        exchange.load_markets()
+        markets = Markets(
+            list(exchange.markets.values()),
+            exchange.currencies or {},
+            time.time(),
+        )
+        try:
+            self._write(name, markets)
+        except OSError as error:
+            logger.warning(f"Couldn't persist the markets of {name}: {error}")
+        logger.info(f"Loaded {len(markets.by_symbol)} markets of {name}.")
+        return markets
+
+    def refresh(self, name: str, wait: bool = True):
+        """
+        loads the markets from the exchange again
+        :param name: str
+        :param wait: bool: False refreshes them in a background thread
+        :return: None
+        """
+        with self._lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        def run():
+            try:
+                self._set(name, self._fetch(name))
+            except Exception as error:
+                logger.warning(
+                    f"Couldn't refresh the markets of {name}: {error}"
+                )
+            finally:
+                with self._lock:
+                    self._refreshing.discard(name)
+
+        if wait:
+            run()
+        else:
+            threading.Thread(
+                target=run, name=f"markets-{name}", daemon=True
+            ).start()
+
+    def warm(self, *names: str, wait: bool = True):
+        """
+        loads the markets of the exchanges ahead, e.g. when a process
+        starts, so no caller waits for them
+        :param names: str: MARKETS_WARM by default
+        :param wait: bool: False loads them in a background thread
+        :return: None
+        """
+        names = names or settings.MARKETS_WARM
+
+        def run():
+            for name in names:
+                try:
+                    self._get(name)
+                except Exception as error:
+                    logger.warning(
+                        f"Couldn't load the markets of {name}: {error}"
+                    )
+
+        if wait:
+            run()
+        else:
+            threading.Thread(
+                target=run, name="markets-warm", daemon=True
+            ).start()
+
+    def attach(self, exchange: ccxt.Exchange):
+        """
+        sets the markets already loaded on an instance of the exchange,
+        e.g. one with credentials, so ccxt doesn't load them again
+        :param exchange: ccxt.Exchange
+        :return: None
+        """
+        markets = self._markets.get(exchange.id)
+        if markets is not None and not exchange.markets:
+            exchange.set_markets(
+                list(markets.by_symbol.values()), markets.currencies or None
+            )
+
+    def markets(self, name: str) -> Dict[str, dict]:
+        """
+        :param name: str: ccxt id
+        :return: dict symbol -> market
+        """
+        return self._get(name).by_symbol
+
+    def markets_by_id(self, name: str) -> Dict[str, dict]:
+        """
+        :param name: str: ccxt id
+        :return: dict id of the exchange (e.g. BTCUSDT) -> market, the
+        spot one when several markets share the id
+        """
+        return self._get(name).first_by_id
+
+    def market(self, name: str, key: str) -> Optional[dict]:
+        """
+        :param name: str: ccxt id
+        :param key: str: symbol (BTC/USDT) or id (BTCUSDT) of the market
+        :return: dict, None if the exchange has no such market
+        """
+        markets = self._get(name)
+        return markets.by_symbol.get(key) or markets.first_by_id.get(key)
+
+    def is_supported(self, name: str, key: str) -> bool:
+        """
+        answered from the loaded markets, only the first call of a
+        process which has no persisted markets goes to the exchange
+        :param name: str: ccxt id
+        :param key: str: symbol or id of the market
+        :return: bool
+        """
+        return self.market(name, key) is not None
+
+
+market_registry = MarketRegistry()
@@ -1,12 +1,24 @@
 import os, sys
 import datetime
+import io
 import pdb
 import math
 import random
+import tempfile
+import threading
+import time
 import unittest
-from django.test import TestCase
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import ccxt
+import requests
+from django.test import TestCase, override_settings
+from urllib3.util.retry import Retry
 from crypto_bot.services.ccxt_api import CCXTApiHandler
 from crypto_bot.services.coingecko import CoinGeckoHandler
+from crypto_bot.services.http_pool import HTTPSessionPool, http_pool
+from crypto_bot.services.markets import MarketRegistry, market_registry
 from crypto_bot.utils import get_timestamp
 #from crypto_bot.services.binance import BinanceHandler
 #from crypto_bot.services.bitfinex import BitfinexHandler
@@ -16,6 +28,8 @@ from crypto_bot.models import *
 #from redis.client import Redis as rd_obj
 import json
 
+import arbitrage.models
+
 
 # --------------------------------------------------------------------------
 # Test Services
@@ -140,6 +154,209 @@ class TestCcxtApiWrapper(unittest.TestCase):
         self.assertTrue(ohlcv, ohlcvs)
 
 
+class TestMarketRegistry(unittest.TestCase):
+    markets = [
+        {
+            "id": "BTCUSDT",
+            "symbol": "BTC/USDT",
+            "base": "BTC",
+            "quote": "USDT",
+            "type": "spot",
+            "spot": True,
+            "active": True,
+        }
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+        def load_markets(exchange, *args, **kwargs):
+            return exchange.set_markets(self.markets)
+
+        patcher = mock.patch.object(
+            ccxt.binance,
+            "load_markets",
+            autospec=True,
+            side_effect=load_markets,
+        )
+        self.load_markets = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_markets_are_loaded_once(self):
+        registry = MarketRegistry(self.directory.name, ttl=60)
+        self.assertIn("BTC/USDT", registry.markets("binance"))
+        self.assertEqual(registry.market("binance", "BTCUSDT")["base"], "BTC")
+        self.assertTrue(registry.is_supported("binance", "BTC/USDT"))
+        self.assertFalse(registry.is_supported("binance", "AUNTJEMIMA"))
+        self.assertIn("BTCUSDT", registry.exchange("binance").markets_by_id)
+        self.assertEqual(self.load_markets.call_count, 1)
+
+        # another process starts from the persisted markets
+        registry = MarketRegistry(self.directory.name, ttl=60)
+        self.assertTrue(registry.is_supported("binance", "BTCUSDT"))
+        self.assertEqual(self.load_markets.call_count, 1)
+
+        with self.assertRaises(ValueError):
+            registry.markets("xxxxxxx")
+
+    def test_spot_market_wins_a_shared_id(self):
+        swap = {
+            "id": "BTCUSDT",
+            "symbol": "BTC/USDT:USDT",
+            "base": "BTC",
+            "quote": "USDT",
+            "type": "swap",
+            "spot": False,
+            "active": True,
+        }
+        # loaded after the spot market, it used to replace it
+        self.markets = self.markets + [swap]
+        registry = MarketRegistry(self.directory.name, ttl=60)
+
+        self.assertEqual(
+            registry.markets_by_id("binance")["BTCUSDT"]["symbol"], "BTC/USDT"
+        )
+        self.assertEqual(registry.market("binance", "BTCUSDT")["type"], "spot")
+        self.assertEqual(
+            registry.market("binance", "BTC/USDT:USDT")["type"], "swap"
+        )
+        self.assertEqual(len(registry._markets["binance"].by_id["BTCUSDT"]), 2)
+
+    def test_warm_loads_the_configured_exchanges(self):
+        registry = MarketRegistry(self.directory.name, ttl=60)
+        with override_settings(MARKETS_WARM=["binance", "xxxxxxx"]):
+            # the unknown exchange is only logged
+            registry.warm()
+        self.assertEqual(list(registry._markets), ["binance"])
+        self.assertEqual(self.load_markets.call_count, 1)
+
+    def test_stale_markets_are_refreshed_in_the_background(self):
+        registry = MarketRegistry(self.directory.name, ttl=60)
+        registry.markets("binance")
+        registry._markets["binance"].timestamp -= 120
+
+        self.assertTrue(registry.is_supported("binance", "BTC/USDT"))
+        for _ in range(100):
+            if registry._markets["binance"].age() < 60:
+                break
+            time.sleep(0.05)
+        self.assertLess(registry._markets["binance"].age(), 60)
+        self.assertEqual(self.load_markets.call_count, 2)
+
+
+class TestCoinGeckoUniverse(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_file = os.path.join(directory.name, "coingecko.json")
+        self.manager = mock.Mock()
+        self.manager.get_coins_list.return_value = [
+            {"id": "bitcoin", "symbol": "btc", "name": "Bitcoin"}
+        ]
+        self.manager.get_supported_vs_currencies.return_value = ["usd"]
+        patcher = mock.patch.object(
+            CoinGeckoHandler, "load_manager", return_value=self.manager
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_coins_are_loaded_on_first_use(self):
+        client = CoinGeckoHandler(self.cache_file, ttl=60)
+        self.manager.get_coins_list.assert_not_called()
+
+        self.assertTrue(client.is_supported_coin("bitcoin"))
+        self.assertFalse(client.is_supported_coin("auntjemima"))
+        self.assertEqual(client.get_coin("bitcoin")["name"], "Bitcoin")
+        self.assertEqual(client.supported_currencies, ["usd"])
+        with self.assertRaises(AttributeError):
+            client.get_coin("auntjemima")
+        self.assertEqual(self.manager.get_coins_list.call_count, 1)
+
+        # another process starts from the persisted coins
+        client = CoinGeckoHandler(self.cache_file, ttl=60)
+        self.assertEqual(client.supported_coins, ["bitcoin"])
+        self.assertEqual(self.manager.get_coins_list.call_count, 1)
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"{}"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestHTTPSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.pool = HTTPSessionPool(
+            pool_size=5, timeout=(1, 2), retries=2, backoff_factor=0.5
+        )
+        self.addCleanup(self.pool.close)
+
+    def test_one_session_per_host(self):
+        session = self.pool.session("https://api.binance.com/api/v3/time")
+        self.assertIs(
+            self.pool.session("https://api.binance.com/api/v3/depth"), session
+        )
+        self.assertIsNot(self.pool.session("https://api.gdax.com/"), session)
+        self.assertIsNot(self.pool.session("http://api.binance.com/"), session)
+
+    def test_retry_is_mounted(self):
+        session = self.pool.session("https://api.binance.com/")
+        adapter = session.get_adapter("https://api.binance.com/")
+        self.assertIsInstance(adapter.max_retries, Retry)
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(adapter.max_retries.backoff_factor, 0.5)
+        self.assertIn(429, adapter.max_retries.status_forcelist)
+        # POST isn't idempotent, it's never retried
+        self.assertNotIn("POST", adapter.max_retries.allowed_methods)
+        self.assertEqual(adapter._pool_maxsize, 5)
+
+    def test_default_timeout(self):
+        with mock.patch.object(requests.Session, "request") as request:
+            self.pool.get("https://api.binance.com/api/v3/time")
+            self.pool.post("https://api.binance.com/api/v3/order", timeout=9)
+        self.assertEqual(request.call_args_list[0].kwargs["timeout"], (1, 2))
+        self.assertEqual(request.call_args_list[1].kwargs["timeout"], 9)
+
+    def test_stats_count_the_reused_connections(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+        host = f"http://127.0.0.1:{server.server_port}"
+
+        for _ in range(3):
+            self.assertEqual(self.pool.get(f"{host}/ticker").json(), {})
+        self.assertEqual(
+            self.pool.stats[host],
+            {"requests": 3, "connections": 1, "reused": 2},
+        )
+
+    def test_settings(self):
+        with override_settings(
+            HTTP_POOL_SIZE=7,
+            HTTP_TIMEOUT=(4, 5),
+            HTTP_RETRIES=0,
+            HTTP_BACKOFF_FACTOR=1,
+        ):
+            pool = HTTPSessionPool()
+            self.assertEqual(
+                (pool.pool_size, pool.timeout, pool.retries),
+                (7, (4, 5), 0),
+            )
+            self.assertEqual(http_pool.backoff_factor, 1)
+            # the arguments win over the settings
+            self.assertEqual(self.pool.pool_size, 5)
+
+
 class TestBitfinexService(TestCase):
     def setUp(self):
         self.api_config = {}
@@ -744,3 +961,202 @@ class TestHistoricalData(TestCase):
         passed, response_data = self.command_options[option](param)
         # print(option, passed, response_data)
         self.assertTrue(passed, f"{response_data}")
+
+
+class TestTickerIngestion(TestCase):
+    def setUp(self):
+        self.command_obj = C(stdout=io.StringIO())
+        self.candles = [
+            dict(
+                timestamp=1609459200 + hour * 3600,
+                open=1.0,
+                high=2.0,
+                low=0.5,
+                close=1.5,
+                volume=10.0,
+            )
+            for hour in range(5)
+        ]
+
+    def commit(self, candles):
+        return self.command_obj.commit_candles(
+            candles, exchange="binance", trade_pair="BTC/USDT", granularity="1h"
+        )
+
+    def test_commit_candles_is_idempotent(self):
+        self.commit(self.candles[:3])
+        # the page overlaps the candles already stored
+        self.commit(self.candles)
+
+        tickers = arbitrage.models.Ticker.objects.filter(exchange="binance")
+        self.assertEqual(tickers.count(), 5)
+        self.assertEqual(
+            list(tickers.values_list("timestamp", flat=True)),
+            [candle["timestamp"] for candle in self.candles],
+        )
+
+    def test_series_reads_arrays(self):
+        self.commit(self.candles)
+        self.command_obj.commit_candles(
+            self.candles, exchange="binance", trade_pair="ETH/USDT",
+            granularity="1h",
+        )
+
+        series = arbitrage.models.Ticker.objects.series(
+            "binance", "BTC/USDT", "1h",
+            since=self.candles[1]["timestamp"],
+            until=self.candles[4]["timestamp"],
+        )
+        chunks = list(series.iter_arrays(chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 1])
+
+        array = series.to_array()
+        self.assertEqual(
+            array["timestamp"].tolist(),
+            [candle["timestamp"] for candle in self.candles[1:4]],
+        )
+        self.assertEqual(array["close"].tolist(), [1.5] * 3)
+
+    def test_populate_resumes_from_checkpoint(self):
+        start = datetime.datetime(2021, 1, 1).timestamp()
+
+        def fetch_ohlcv(symbol, timeframe, since, limit, params):
+            step = 3600 if timeframe == "1h" else 86400
+            # candles are aligned to the granularity
+            first = start + math.ceil((since / 1000 - start) / step) * step
+            return [
+                [(first + step * i) * 1000, 1.0, 2.0, 0.5, 1.5, 10.0]
+                for i in range(3)
+            ]
+
+        exchange_objs = []
+
+        def load_exchange_manager(exchange):
+            exchange_obj = mock.Mock()
+            exchange_obj.fetch_ohlcv.side_effect = fetch_ohlcv
+            exchange_objs.append(exchange_obj)
+            return exchange_obj
+
+        markets = {
+            "BTC/USDT": {"symbol": "BTC/USDT", "base": "BTC", "quote": "USDT"}
+        }
+        with tempfile.TemporaryDirectory() as directory, mock.patch.object(
+            self.command_obj, "exchanges", ["binance", "kraken"]
+        ), mock.patch.object(
+            self.command_obj.obj_handler,
+            "load_exchange_manager",
+            side_effect=load_exchange_manager,
+        ), mock.patch.object(
+            market_registry, "markets", return_value=markets
+        ):
+            params = dict(
+                time_frame="01012021/02012021",
+                checkpoint=os.path.join(directory, "checkpoint.json"),
+            )
+            # 1d: 1 candle inside the range, 1h: 24 candles
+            self.assertEqual(self.command_obj.populate(params), 2 * 25)
+            self.assertEqual(self.command_obj.populate(params), 0)
+
+        self.assertEqual(arbitrage.models.Ticker.objects.count(), 2 * 25)
+        # the markets come from the registry
+        for exchange_obj in exchange_objs:
+            exchange_obj.load_markets.assert_not_called()
+
+    @override_settings(POPULATE_WORKERS=2)
+    def test_populate_stops_the_workers_when_saving_fails(self):
+        def fetch_ohlcv(symbol, timeframe, since, limit, params):
+            step = 3600 if timeframe == "1h" else 86400
+            return [
+                [since + step * 1000 * i, 1.0, 2.0, 0.5, 1.5, 10.0]
+                for i in range(3)
+            ]
+
+        def load_exchange_manager(exchange):
+            exchange_obj = mock.Mock()
+            exchange_obj.fetch_ohlcv.side_effect = fetch_ohlcv
+            return exchange_obj
+
+        markets = {
+            "BTC/USDT": {"symbol": "BTC/USDT", "base": "BTC", "quote": "USDT"}
+        }
+        with tempfile.TemporaryDirectory() as directory, mock.patch(
+            "crypto_bot.management.commands.feed_exchange_history."
+            "POPULATE_QUEUE_SIZE",
+            1,
+        ), mock.patch.object(
+            self.command_obj, "exchanges", ["binance", "kraken", "ftx"]
+        ), mock.patch.object(
+            self.command_obj.obj_handler,
+            "load_exchange_manager",
+            side_effect=load_exchange_manager,
+        ), mock.patch.object(
+            market_registry, "markets", return_value=markets
+        ), mock.patch.object(
+            self.command_obj,
+            "commit_candles",
+            side_effect=RuntimeError("database is gone"),
+        ):
+            params = dict(
+                time_frame="01012021/02012021",
+                checkpoint=os.path.join(directory, "checkpoint.json"),
+            )
+            # the workers are blocked on the full queue, it must not hang
+            done = []
+            thread = threading.Thread(
+                target=lambda: done.append(
+                    self.assertRaises(
+                        RuntimeError, self.command_obj.populate, params
+                    )
+                ),
+                daemon=True,
+            )
+            thread.start()
+            thread.join(10)
+            self.assertFalse(thread.is_alive())
+
+    def test_populate_without_exchanges(self):
+        with mock.patch.object(self.command_obj, "exchanges", []):
+            self.assertEqual(
+                self.command_obj.populate(
+                    dict(time_frame="01012021/02012021", checkpoint=None)
+                ),
+                0,
+            )
+
+    def test_missing_ranges(self):
+        # 0h, 1h, 4h and 5h are stored, 2h and 3h are missing
+        self.commit(self.candles[:2])
+        self.commit(
+            [
+                dict(self.candles[0], timestamp=1609459200 + hour * 3600)
+                for hour in (4, 5)
+            ]
+        )
+        since, until = 1609459200 - 3600, 1609459200 + 8 * 3600
+        ranges = self.command_obj.missing_ranges(
+            "binance", "BTC/USDT", "1h", since, until
+        )
+        self.assertEqual(
+            ranges,
+            [
+                (since, 1609459200),
+                (1609459200 + 3600 + 1, 1609459200 + 4 * 3600),
+                (1609459200 + 5 * 3600 + 1, until),
+            ],
+        )
+
+    def test_sync_fetches_from_the_last_candle(self):
+        self.commit(self.candles)
+        exchange_obj = mock.Mock()
+        exchange_obj.fetch_ohlcv.return_value = []
+
+        with mock.patch.object(
+            self.command_obj.obj_handler,
+            "load_exchange_manager",
+            return_value=exchange_obj,
+        ):
+            self.command_obj.sync(dict(exchange="binance"))
+
+        exchange_obj.fetch_ohlcv.assert_called_once()
+        since = exchange_obj.fetch_ohlcv.call_args.kwargs["since"]
+        self.assertEqual(since, (self.candles[-1]["timestamp"] + 1) * 1000)
@@ -0,0 +1,92 @@
+"""
+Cycle time of the pairwise SpreadDetection calculation against the
+vectorized SpreadMatrix for growing sets of (exchange, currency pair)
+entries.
+
+usage: python scripts/benchmark_spread_matrix.py [repeat]
+"""
+import itertools
+import os
+import random
+import sys
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+
+django.setup()
+
+from arbitrage.monitor.currency import CurrencyPair
+from arbitrage.monitor.exchange import Exchange
+from arbitrage.monitor.spread_detection.exchange import (
+    SpreadDetection,
+    SpreadDifferentCurrenciesError,
+)
+from arbitrage.monitor.spread_detection.matrix import SpreadMatrix
+
+
+SIZES = [10, 50, 200]
+CURRENCY_PAIRS = [
+    CurrencyPair.BTC_USD,
+    CurrencyPair.BTC_EUR,
+    CurrencyPair.ETH_USD,
+    CurrencyPair.ETH_EUR,
+    CurrencyPair.BCH_USD,
+]
+
+
+class BenchmarkExchange(Exchange):
+    pass
+
+
+def build_exchanges(size):
+    exchanges = []
+    for index in range(size):
+        currency_pair = CURRENCY_PAIRS[index % len(CURRENCY_PAIRS)]
+        exchange = BenchmarkExchange(currency_pair)
+        exchange.last_bid_price = random.uniform(1000, 1100)
+        exchange.last_ask_price = exchange.last_bid_price + random.uniform(1, 5)
+        exchanges.append(exchange)
+    return exchanges
+
+
+def pairwise(exchanges):
+    spreads = []
+    for one, two in itertools.combinations(exchanges, 2):
+        try:
+            spreads.append(
+                SpreadDetection(exchange_one=one, exchange_two=two)
+            )
+        except SpreadDifferentCurrenciesError:
+            continue
+    return spreads
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    print(
+        f"{'entries':>8} {'pairwise ms':>12} {'matrix ms':>10} "
+        f"{'speedup':>8}"
+    )
+    for size in SIZES:
+        exchanges = build_exchanges(size)
+        matrix = SpreadMatrix(exchanges)
+        pairwise_time = min(
+            timeit.repeat(
+                lambda: pairwise(exchanges), number=1, repeat=repeat
+            )
+        )
+        matrix_time = min(
+            timeit.repeat(matrix.best_spreads, number=1, repeat=repeat)
+        )
+        print(
+            f"{size:>8} {pairwise_time * 1000:>12.3f} "
+            f"{matrix_time * 1000:>10.3f} {pairwise_time / matrix_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
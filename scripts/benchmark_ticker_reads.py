@@ -0,0 +1,101 @@
+"""
+Range reads of one market out of a Ticker table of many rows: model
+instances against values_list and the NumPy reader of
+Ticker.objects.series, with the query plan of the range scan.
+
+The rows are written to a test database created for the run, the
+configured database isn't touched.
+
+usage: python scripts/benchmark_ticker_reads.py [rows] [repeat]
+"""
+import os
+import sys
+import timeit
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+
+import django
+
+django.setup()
+
+from django.db import connection, transaction
+
+from arbitrage.models import TICKER_FIELDS, Ticker
+
+
+MARKETS = [
+    (exchange, trade_pair)
+    for exchange in ["binance", "bitfinex", "kraken", "gdax", "bitstamp"]
+    for trade_pair in ["BTC/USD", "ETH/USD"]
+]
+GRANULARITY = "1m"
+START = 1577836800  # 2020-01-01
+STEP = 60
+BATCH_SIZE = 10_000
+# one month of 1m candles
+RANGE = 30 * 24 * 60
+
+
+def populate(rows):
+    per_market = rows // len(MARKETS)
+    for exchange, trade_pair in MARKETS:
+        for first in range(0, per_market, BATCH_SIZE):
+            with transaction.atomic():
+                Ticker.objects.bulk_create(
+                    [
+                        Ticker(
+                            timestamp=START + index * STEP,
+                            open=1.0,
+                            high=2.0,
+                            low=0.5,
+                            close=1.5,
+                            volume=10.0,
+                            exchange=exchange,
+                            trade_pair=trade_pair,
+                            granularity=GRANULARITY,
+                        )
+                        for index in range(
+                            first, min(first + BATCH_SIZE, per_market)
+                        )
+                    ]
+                )
+    return per_market
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        per_market = populate(rows)
+        exchange, trade_pair = MARKETS[len(MARKETS) // 2]
+        since = START + (per_market // 2) * STEP
+        until = since + min(RANGE, per_market // 2) * STEP
+        series = Ticker.objects.series(
+            exchange, trade_pair, GRANULARITY, since, until
+        )
+        print(f"{rows} rows, reading {series.count()} candles of one market")
+        print(series.values_list(*TICKER_FIELDS).explain())
+
+        readers = {
+            "model instances": lambda: [
+                tuple(getattr(ticker, field) for field in TICKER_FIELDS)
+                for ticker in series.all()
+            ],
+            "values_list": lambda: list(series.values_list(*TICKER_FIELDS)),
+            "numpy": lambda: series.to_array(),
+        }
+        print(f"{'reader':>16} {'ms':>10}")
+        for name, reader in readers.items():
+            elapsed = min(timeit.repeat(reader, number=1, repeat=repeat))
+            print(f"{name:>16} {elapsed * 1000:>10.3f}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == "__main__":
+    main()